@@ -27,7 +27,7 @@ print(f"📂 Services: {SERVICES_DIR}")
 # IMPORT MODULES
 # ============================================================================
 try:
-    from backend_api.models import db
+    from backend_api.models import db, province_registry
     from backend_api.controllers import register_blueprints
     print("✅ Import models và controllers thành công")
 except ImportError as e:
@@ -81,6 +81,9 @@ def create_app():
     # Khởi tạo database
     db.init_app(app)
     
+    # Danh mục tỉnh trong bộ nhớ (nạp một lần, tự làm mới khi bảng provinces đổi)
+    province_registry.init_app(app)
+    
     # Đăng ký các Blueprints (routes/controllers)
     register_blueprints(app)
     
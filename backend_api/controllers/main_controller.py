@@ -2,9 +2,8 @@
 # Xử lý các route cho trang Home và News.
 
 from flask import Blueprint, render_template, request, jsonify
-from ..models.weather_model import Provinces
-from datetime import datetime
-import requests
+from ..models import province_registry
+from services import openmeteo_cache
 
 # Tạo một Blueprint
 main_bp = Blueprint('main_bp', __name__)
@@ -28,7 +27,7 @@ def api_current_weather():
     if not province_name:
         return jsonify({"error": "Thiếu province"}), 400
 
-    province = Provinces.query.filter_by(name=province_name).first()
+    province = province_registry.find_province(province_name)
     if not province:
         return jsonify({"error": "Không tìm thấy tỉnh"}), 404
 
@@ -40,11 +39,9 @@ def api_current_weather():
             "longitude": province.longitude,
             "hourly": "temperature_2m,relative_humidity_2m,precipitation",
             "timezone": "Asia/Bangkok",
-            "start_date": datetime.now().strftime('%Y-%m-%d'),
-            "end_date": datetime.now().strftime('%Y-%m-%d')
+            "forecast_days": 1  # Hôm nay (giờ địa phương), cắt từ entry 16 ngày trong cache
         }
-        response = requests.get(url, params=params)
-        data = response.json()
+        data = openmeteo_cache.get_forecast(url, params)
         
         hourly = data.get("hourly", {})
         avg_temp = sum(hourly.get("temperature_2m", [])) / len(hourly.get("temperature_2m", [0])) if hourly.get("temperature_2m") else 0
@@ -0,0 +1,123 @@
+# backend_api/models/province_registry.py
+# Danh mục tỉnh trong bộ nhớ: nạp một lần khi khởi động app, chỉ dựng lại khi bảng provinces đổi.
+
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from types import MappingProxyType
+
+from .weather_model import Provinces
+
+# Chu kỳ (giây) kiểm tra bảng provinces có thay đổi không (0 = không kiểm tra)
+PROVINCE_REFRESH_INTERVAL = 300
+
+Province = namedtuple('Province', ['province_id', 'name', 'latitude', 'longitude'])
+
+_index = None
+_index_lock = threading.Lock()
+_watcher = None
+
+
+def normalize_name(name):
+    """'Thành phố  Hà Nội' -> 'thanh pho ha noi' (bỏ dấu, đ -> d, casefold, gộp khoảng trắng)."""
+    text = unicodedata.normalize('NFD', str(name).replace('đ', 'd').replace('Đ', 'D'))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.casefold().split())
+
+
+class ProvinceIndex:
+    """
+    Snapshot bất biến của bảng provinces.
+
+    Tra cứu O(1) theo id, tên chính xác và tên chuẩn hoá; json_body là body
+    /api/provinces đã serialize sẵn (thứ tự theo tên như truy vấn cũ).
+    """
+
+    def __init__(self, provinces):
+        self.provinces = tuple(provinces)
+        self.by_id = MappingProxyType({p.province_id: p for p in self.provinces})
+        self.by_name = MappingProxyType({p.name: p for p in self.provinces})
+        self.by_normalized = MappingProxyType({normalize_name(p.name): p for p in self.provinces})
+        self.json_body = json.dumps([p._asdict() for p in self.provinces], ensure_ascii=False).encode('utf-8')
+        self.etag = hashlib.sha1(self.json_body).hexdigest()
+
+    def __len__(self):
+        return len(self.provinces)
+
+    def get(self, province_id):
+        return self.by_id.get(province_id)
+
+    def find(self, name):
+        """Tỉnh theo tên: khớp chính xác trước, sau đó không phân biệt dấu / hoa thường."""
+        if not name:
+            return None
+        return self.by_name.get(name) or self.by_normalized.get(normalize_name(name))
+
+
+def load_rows():
+    """Các tỉnh từ DB theo thứ tự tên (cần app context)."""
+    return [
+        Province(p.province_id, p.name, p.latitude, p.longitude)
+        for p in Provinces.query.order_by(Provinces.name).all()
+    ]
+
+
+def refresh(loader=load_rows):
+    """
+    Đọc lại bảng provinces; chỉ thay snapshot khi dữ liệu khác.
+
+    Returns:
+        bool: True nếu snapshot được thay
+    """
+    global _index
+    rows = tuple(loader())
+    with _index_lock:
+        if _index is not None and _index.provinces == rows:
+            return False
+        # Một phép gán: request khác thấy hoặc snapshot cũ hoặc snapshot mới
+        _index = ProvinceIndex(rows)
+    print(f"🗺️  Danh mục tỉnh: {len(rows)} tỉnh")
+    return True
+
+
+def get_index():
+    """Snapshot hiện tại (nạp lần đầu nếu lúc khởi động chưa nạp được - cần app context)."""
+    if _index is None:
+        refresh()
+    return _index
+
+
+def find_province(name):
+    return get_index().find(name)
+
+
+def get_province(province_id):
+    return get_index().get(province_id)
+
+
+def _watch(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                refresh()
+        except Exception as e:
+            print(f"❌ Lỗi làm mới danh mục tỉnh: {e}")
+
+
+def init_app(app, interval=PROVINCE_REFRESH_INTERVAL):
+    """Nạp danh mục khi khởi động và bật thread kiểm tra thay đổi (một lần mỗi process)."""
+    global _watcher
+    try:
+        with app.app_context():
+            refresh()
+    except Exception as e:
+        # DB chưa sẵn sàng: nạp lại ở request đầu tiên
+        print(f"⚠️  Chưa nạp được danh mục tỉnh: {e}")
+    if _watcher is None and interval > 0:
+        _watcher = threading.Thread(target=_watch, args=(app, interval),
+                                    name='province-registry-watcher', daemon=True)
+        _watcher.start()
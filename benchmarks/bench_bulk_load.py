@@ -0,0 +1,136 @@
+# benchmarks/bench_bulk_load.py
+"""
+Đo thời gian / RSS đỉnh khi tải dữ liệu training: pd.read_sql vs COPY (bulk_loader).
+
+Mỗi phép đo chạy trong một process Python mới.
+
+Chạy:
+    python benchmarks/bench_bulk_load.py                 # giả lập phía client, 500.000 dòng
+    python benchmarks/bench_bulk_load.py --rows 100000
+    python benchmarks/bench_bulk_load.py --real          # DB thật theo DB_CONFIG
+
+Chế độ giả lập tái hiện phần việc phía client của từng cách:
+    read_sql - list tuple Python (datetime, int, float…) như cursor.fetchall() trả về,
+               rồi DataFrame.from_records như pd.read_sql
+    COPY     - bytes CSV ghi từng mẩu 8 KB vào CsvChunkParser như cursor.copy_expert
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+PROBE = r'''
+import json, sys, time
+def hwm_mb():
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024
+sys.path.insert(0, {root!r})
+import numpy as np, pandas as pd
+{setup}
+rss0 = hwm_mb()
+t0 = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - t0
+rss1 = hwm_mb()
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss1, "rss_delta_mb": rss1 - rss0,
+                  "frame_mb": df.memory_usage(deep=True).sum() / 2**20, "rows": len(df)}}))
+'''
+
+SYNTHETIC = {
+    'read_sql (tuples)': (
+        "arrays = dict(np.load({npz!r}))\n"
+        "columns = list(arrays)",
+        "rows = list(zip(arrays.pop('timestamp').astype('datetime64[us]').astype(object).tolist(),\n"
+        "                *[arrays.pop(c).tolist() for c in columns[1:]]))\n"
+        "df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)\n"
+        "del rows"
+    ),
+    'COPY (bulk_loader)': (
+        "from data_pipeline.bulk_loader import CsvChunkParser",
+        "parser = CsvChunkParser()\n"
+        "with open({csv!r}, 'rb') as f:\n"
+        "    for block in iter(lambda: f.read(8192), b''):\n"
+        "        parser.write(block)\n"
+        "df = parser.frame()"
+    ),
+}
+
+REAL = {
+    'read_sql': (
+        "from data_pipeline.data_storage import connect_to_db\n"
+        "from data_pipeline.bulk_loader import build_select\n"
+        "from services.forecast_ml.model_training import TRAINING_COLUMNS\n"
+        "conn = connect_to_db()\n"
+        "sql = build_select('weather_data', TRAINING_COLUMNS, order_by='\"timestamp\" DESC', limit={rows})",
+        "df = pd.read_sql(sql, conn, params=[{rows}])"
+    ),
+    'COPY (bulk_loader)': (
+        "from data_pipeline.data_storage import connect_to_db\n"
+        "from services.forecast_ml.model_training import load_data_for_training\n"
+        "conn = connect_to_db()",
+        "df = load_data_for_training(conn, limit={rows})"
+    ),
+}
+
+
+def build_synthetic(tmp_dir, rows):
+    """Tạo dữ liệu giống weather_data ở 2 dạng: mảng (.npz) và CSV của COPY."""
+    import numpy as np
+    import pandas as pd
+    from services.forecast_ml.model_training import TRAINING_COLUMNS
+
+    rng = np.random.default_rng(42)
+    data = {
+        'timestamp': np.datetime64('2020-01-01T00:00') + np.arange(rows).astype('timedelta64[h]'),
+        'province_id': rng.integers(1, 64, rows),
+    }
+    for col in TRAINING_COLUMNS[2:]:
+        data[col] = rng.normal(50, 20, rows).round(1)
+
+    npz = os.path.join(tmp_dir, 'weather.npz')
+    csv = os.path.join(tmp_dir, 'weather.csv')
+    np.savez(npz, **data)
+    pd.DataFrame(data).to_csv(csv, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    return npz, csv
+
+
+def run_case(setup, body, repeat):
+    results = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', PROBE.format(root=ROOT_DIR, setup=setup, body=body)],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1]
+        results.append(json.loads(out))
+    return min(results, key=lambda r: r['seconds'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tải dữ liệu training')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--real', action='store_true', help='Đo trên DB thật (DB_CONFIG)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.real:
+            cases, paths = REAL, {}
+        else:
+            npz, csv = build_synthetic(tmp_dir, args.rows)
+            cases, paths = SYNTHETIC, dict(npz=npz, csv=csv)
+
+        print(f"{'Trường hợp':<20} {'Số dòng':>9} {'Thời gian':>10} {'RSS đỉnh':>9} {'RSS tăng':>9} {'DataFrame':>10}")
+        for name, (setup, body) in cases.items():
+            fmt = dict(paths, rows=args.rows)
+            r = run_case(setup.format(**fmt), body.format(**fmt), args.repeat)
+            print(f"{name:<20} {r['rows']:>9} {r['seconds']:>9.2f}s {r['rss_mb']:>7.0f}MB "
+                  f"{r['rss_delta_mb']:>7.0f}MB {r['frame_mb']:>8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
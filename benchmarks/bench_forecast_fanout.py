@@ -0,0 +1,91 @@
+# benchmarks/bench_forecast_fanout.py
+"""
+p50 / p99 của /api/forecast: các bước tuần tự vs fan-out song song dưới deadline.
+
+Upstream được giả lập bằng sleep với phân phối log-normal (có đuôi dài, cắt ở
+timeout của từng bước như requests.get(timeout=…)); thời gian được thu nhỏ theo
+--scale để chạy nhanh, kết quả in ra đã đổi về thời gian thật.
+
+Chạy:
+    python benchmarks/bench_forecast_fanout.py
+    python benchmarks/bench_forecast_fanout.py --requests 500 --scale 0.01
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.fanout import Deadline, LatencyTracker, StageRecorder
+
+# bước: (trung vị ms, sigma log-normal, timeout ms)
+STAGES = {
+    'open_meteo': (350, 0.6, 10000),
+    'ml_cache': (15, 0.5, 10000),
+    'aqi': (450, 0.9, 5000),
+}
+CACHE_MISS_RATE = 0.05
+ML_FALLBACK = (900, 0.3, 10000)
+DEADLINE_MS = 10000
+
+
+def sample(rng, median, sigma, timeout):
+    return min(rng.lognormal(np.log(median), sigma), timeout)
+
+
+def draw(rng):
+    """Thời gian (ms) các bước của một request."""
+    times = {name: sample(rng, *spec) for name, spec in STAGES.items()}
+    times['ml_fallback'] = sample(rng, *ML_FALLBACK) if rng.random() < CACHE_MISS_RATE else 0.0
+    return times
+
+
+def sequential(times, scale):
+    start = time.perf_counter()
+    for name in ('open_meteo', 'ml_cache', 'ml_fallback', 'aqi'):
+        time.sleep(times[name] * scale / 1000)
+    return (time.perf_counter() - start) / scale
+
+
+def fanout(times, scale, pool, tracker):
+    deadline = Deadline(DEADLINE_MS * scale / 1000)
+    stages = StageRecorder(tracker)
+    futures = {name: stages.submit(pool, name, time.sleep, times[name] * scale / 1000) for name in STAGES}
+    stages.wait('open_meteo', futures['open_meteo'], deadline)
+    stages.wait('ml_cache', futures['ml_cache'], deadline, default=None)
+    if times['ml_fallback']:
+        f_ml = stages.submit(pool, 'ml_fallback', time.sleep, times['ml_fallback'] * scale / 1000)
+        stages.wait('ml_fallback', f_ml, deadline, default=None)
+    stages.wait('aqi', futures['aqi'], deadline, default=None)
+    return (time.perf_counter() - stages.started) / scale, bool(stages.partial)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fan-out /api/forecast')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--scale', type=float, default=0.02, help='Hệ số thu nhỏ thời gian sleep')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    draws = [draw(rng) for _ in range(args.requests)]
+    tracker = LatencyTracker(window=args.requests)
+
+    seq = np.array([sequential(t, args.scale) for t in draws]) * 1000
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = [fanout(t, args.scale, pool, tracker) for t in draws]
+    par = np.array([r[0] for r in results]) * 1000
+    partial = sum(r[1] for r in results)
+
+    print(f"{'Cách chạy':<12} {'p50':>9} {'p99':>9} {'max':>9}")
+    for name, ms in (('tuần tự', seq), ('fan-out', par)):
+        print(f"{name:<12} {np.percentile(ms, 50):>7.0f}ms {np.percentile(ms, 99):>7.0f}ms {ms.max():>7.0f}ms")
+    print(f"Request thiếu bước tuỳ chọn: {partial}/{args.requests}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_inference.py
+"""
+So sánh độ trễ mỗi lần predict: MultiOutputRegressor (sklearn) vs NativeEnsemble.
+
+Chạy:
+    python benchmarks/bench_inference.py                 # mô hình giả lập
+    python benchmarks/bench_inference.py --real          # mô hình thật trong models/
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml.native_inference import NativeEnsemble
+
+
+def synthetic_model(n_features=76, n_estimators=300, max_depth=8):
+    """Train nhanh một MultiOutputRegressor 6 target có kích thước gần giống thật."""
+    from sklearn.multioutput import MultiOutputRegressor
+    from xgboost import XGBRegressor
+
+    rng = np.random.default_rng(42)
+    cols = [f'f{i}' for i in range(n_features)]
+    X = pd.DataFrame(rng.normal(size=(5000, n_features)), columns=cols)
+    y = pd.DataFrame(rng.normal(size=(5000, 6)))
+    model = MultiOutputRegressor(XGBRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, tree_method='hist',
+        n_jobs=-1, verbosity=0
+    ))
+    model.fit(X, y)
+    return model, cols
+
+
+def real_model():
+    import joblib
+    from services.forecast_ml.predictor import MODEL_PATH, FEATURE_COLS_PATH
+    return joblib.load(MODEL_PATH), joblib.load(FEATURE_COLS_PATH)
+
+
+def time_calls(fn, repeat):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suy luận XGBoost')
+    parser.add_argument('--real', action='store_true', help='Dùng mô hình trong services/forecast_ml/models')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    model, feature_cols = real_model() if args.real else synthetic_model()
+    native = NativeEnsemble.from_sklearn(model, feature_cols)
+    rng = np.random.default_rng(0)
+
+    print(f"{'Batch':>6} {'sklearn p50':>12} {'sklearn p99':>12} {'native p50':>11} {'native p99':>11} {'speedup':>8}")
+    for n_rows in [1, 63]:
+        # Đường cũ: DataFrame có thêm cột thừa, chọn feature_row[feature_cols] rồi predict
+        extra = {'timestamp': pd.Timestamp('2024-01-01'), 'weather_code': 1}
+        frame = pd.DataFrame(rng.normal(size=(n_rows, len(feature_cols))), columns=feature_cols).assign(**extra)
+        matrix = frame[feature_cols].to_numpy(dtype=np.float32)
+
+        def sklearn_call():
+            return model.predict(frame[feature_cols])
+
+        def native_call():
+            buf = native.input_buffer(n_rows)
+            buf[...] = matrix
+            return native.predict(buf)
+
+        np.testing.assert_allclose(sklearn_call(), native_call(), rtol=1e-5, atol=1e-5)
+        s50, s99 = time_calls(sklearn_call, args.repeat)
+        n50, n99 = time_calls(native_call, args.repeat)
+        print(f"{n_rows:>6} {s50:>10.3f}ms {s99:>10.3f}ms {n50:>9.3f}ms {n99:>9.3f}ms {s50 / n50:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
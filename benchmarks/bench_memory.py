@@ -0,0 +1,105 @@
+# benchmarks/bench_memory.py
+"""
+Đo RSS đỉnh / kích thước DataFrame của đường dữ liệu training:
+kiểu mặc định (float64 / int64) vs chính sách kiểu của data_pipeline/schema.py.
+
+Mỗi phép đo chạy trong một process Python mới:
+    dữ liệu thô -> compute_features -> make_training_set (X, y)
+
+Chạy:
+    python benchmarks/bench_memory.py                  # 1.000.000 dòng, 63 tỉnh
+    python benchmarks/bench_memory.py --rows 300000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+PROBE = r'''
+import contextlib, io, json, sys, time
+def hwm_mb():
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024
+sys.path.insert(0, {root!r})
+import numpy as np, pandas as pd
+from data_pipeline.schema import apply_schema
+from services.forecast_ml.feature_store import compute_features
+from services.forecast_ml.model_training import make_training_set
+df = pd.DataFrame(dict(np.load({npz!r})))
+rss0 = hwm_mb()
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{body}
+    raw_mb = df.memory_usage(deep=True).sum() / 2**20
+    features = compute_features(df{features_args})
+    del df
+    features_mb = features.memory_usage(deep=True).sum() / 2**20
+    X, y, _ = make_training_set(features)
+elapsed = time.perf_counter() - t0
+rss1 = hwm_mb()
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss1, "rss_delta_mb": rss1 - rss0,
+                  "raw_mb": raw_mb, "features_mb": features_mb,
+                  "xy_mb": (X.memory_usage(deep=True).sum() + y.memory_usage(deep=True).sum()) / 2**20,
+                  "rows": len(X)}}))
+'''
+
+CASES = {
+    'float64 / int64': ("    pass", ", dtype=np.float64"),
+    'schema (float32)': ("    df = apply_schema(df)", ""),
+}
+
+
+def build_synthetic(tmp_dir, rows, provinces=63):
+    """Dữ liệu giống weather_data: các chuỗi giờ liên tục cho từng tỉnh (.npz)."""
+    import numpy as np
+    from services.forecast_ml.feature_spec import HISTORY_COLUMNS
+
+    rng = np.random.default_rng(42)
+    per_province = rows // provinces
+    hours = np.arange(per_province).astype('timedelta64[h]')
+    data = {
+        'timestamp': np.tile(np.datetime64('2020-01-01T00:00') + hours, provinces),
+        'province_id': np.repeat(np.arange(1, provinces + 1), per_province),
+    }
+    n = per_province * provinces
+    for col in HISTORY_COLUMNS:
+        data[col] = rng.normal(50, 20, n).round(1)
+    data['weather_code'] = rng.integers(0, 100, n).astype(float)
+
+    npz = os.path.join(tmp_dir, 'weather.npz')
+    np.savez(npz, **data)
+    return npz
+
+
+def run_case(npz, body, features_args):
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE.format(root=ROOT_DIR, npz=npz, body=body, features_args=features_args)],
+        check=True, capture_output=True, text=True
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bộ nhớ theo chính sách kiểu dữ liệu')
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        npz = build_synthetic(tmp_dir, args.rows)
+
+        print(f"{'Trường hợp':<18} {'Số dòng':>9} {'Thời gian':>10} {'RSS đỉnh':>9} {'RSS tăng':>9} "
+              f"{'Thô':>7} {'Features':>9} {'X + y':>7}")
+        for name, (body, features_args) in CASES.items():
+            r = run_case(npz, body, features_args)
+            print(f"{name:<18} {r['rows']:>9} {r['seconds']:>9.2f}s {r['rss_mb']:>7.0f}MB "
+                  f"{r['rss_delta_mb']:>7.0f}MB {r['raw_mb']:>5.0f}MB {r['features_mb']:>7.0f}MB "
+                  f"{r['xy_mb']:>5.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
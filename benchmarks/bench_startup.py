@@ -0,0 +1,109 @@
+# benchmarks/bench_startup.py
+"""
+Đo thời gian khởi động / bộ nhớ khi tải mô hình: joblib (.pkl) vs native (UBJSON).
+
+Mỗi phép đo chạy trong một process Python mới để giống worker vừa boot.
+
+Chạy:
+    python benchmarks/bench_startup.py            # mô hình giả lập (lưu vào thư mục tạm)
+    python benchmarks/bench_startup.py --real     # mô hình thật trong services/forecast_ml/models
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+# VmHWM (RSS đỉnh) đọc từ /proc vì ru_maxrss được giữ lại qua fork/exec trên Linux
+PROBE = r'''
+import json, sys, time
+def hwm_mb():
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024
+sys.path.insert(0, {root!r})
+rss0 = hwm_mb()
+t0 = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - t0
+rss1 = hwm_mb()
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss1, "rss_delta_mb": rss1 - rss0}}))
+'''
+
+CASES = {
+    'import predictor': "from services.forecast_ml import predictor",
+    'import xgboost': "import xgboost",
+    'load .pkl (joblib)': (
+        "import joblib\n"
+        "from services.forecast_ml.native_inference import NativeEnsemble\n"
+        "m = joblib.load({pkl!r}); cols = joblib.load({cols!r})\n"
+        "NativeEnsemble.from_sklearn(m, cols)"
+    ),
+    'load native (ubj)': (
+        "from services.forecast_ml.model_io import load_model_native\n"
+        "load_model_native({native!r})"
+    ),
+}
+
+
+def build_synthetic(tmp_dir):
+    """Tạo mô hình giả lập và lưu ở cả 2 định dạng."""
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.multioutput import MultiOutputRegressor
+    from xgboost import XGBRegressor
+    from services.forecast_ml.model_io import save_model_native
+
+    rng = np.random.default_rng(42)
+    cols = [f'f{i}' for i in range(76)]
+    X = pd.DataFrame(rng.normal(size=(5000, len(cols))), columns=cols)
+    y = pd.DataFrame(rng.normal(size=(5000, 6)))
+    model = MultiOutputRegressor(XGBRegressor(n_estimators=300, max_depth=8, tree_method='hist', verbosity=0))
+    model.fit(X, y)
+
+    pkl = os.path.join(tmp_dir, 'model.pkl')
+    cols_path = os.path.join(tmp_dir, 'feature_cols.pkl')
+    native = os.path.join(tmp_dir, 'model')
+    joblib.dump(model, pkl)
+    joblib.dump(cols, cols_path)
+    save_model_native(model, cols, native)
+    return pkl, cols_path, native
+
+
+def run_case(body, repeat):
+    results = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', PROBE.format(root=ROOT_DIR, body=body)],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1]
+        results.append(json.loads(out))
+    return min(results, key=lambda r: r['seconds'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark thời gian khởi động mô hình')
+    parser.add_argument('--real', action='store_true', help='Dùng mô hình trong services/forecast_ml/models')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.real:
+            from services.forecast_ml.predictor import MODEL_PATH, FEATURE_COLS_PATH, NATIVE_MODEL_DIR
+            paths = dict(pkl=MODEL_PATH, cols=FEATURE_COLS_PATH, native=NATIVE_MODEL_DIR)
+        else:
+            pkl, cols, native = build_synthetic(tmp_dir)
+            paths = dict(pkl=pkl, cols=cols, native=native)
+
+        print(f"{'Trường hợp':<22} {'Thời gian':>10} {'RSS đỉnh':>10} {'RSS tăng':>10}")
+        for name, body in CASES.items():
+            r = run_case(body.format(**paths), args.repeat)
+            print(f"{name:<22} {r['seconds'] * 1000:>8.0f}ms {r['rss_mb']:>8.0f}MB {r['rss_delta_mb']:>8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
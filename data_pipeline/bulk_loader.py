@@ -0,0 +1,174 @@
+# data_pipeline/bulk_loader.py
+"""
+Tải dữ liệu lớn từ PostgreSQL bằng COPY (SELECT …) TO STDOUT thay cho pd.read_sql.
+
+pd.read_sql trên kết nối psycopg2 dựng một tuple Python cho mỗi dòng (500.000 dòng
+× 21 cột là hơn 10 triệu object) trước khi pandas chuyển sang cột float64. Ở đây
+server stream CSV, từng khối vài MB được parse thẳng thành cột NumPy có kiểu
+theo schema.LOAD_DTYPES (float32 cho các đại lượng đo, int16 cho province_id,
+datetime64 cho timestamp); load_table() áp thêm schema.apply_schema (province_id
+thành category, weather_code không NULL thành int16).
+Các cột không có trong COLUMN_DTYPES để pandas tự suy kiểu.
+
+Dữ liệu CSV không được chứa xuống dòng trong giá trị (đúng với các bảng số liệu).
+"""
+
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.schema import LOAD_DTYPES, apply_schema
+
+# Kích thước khối CSV (bytes) parse một lần
+CHUNK_BYTES = 8 * 1024 * 1024
+
+# Kiểu dữ liệu khi tải bảng weather_data. Cột có thể NULL phải là float
+# (weather_code NULL được điền 1 sau khi tải nên giữ float32)
+COLUMN_DTYPES = LOAD_DTYPES
+DATETIME_COLUMNS = ['timestamp']
+
+
+class CsvChunkParser:
+    """
+    File-like đích cho cursor.copy_expert: gom bytes và parse từng khối dòng
+    hoàn chỉnh thành cột NumPy có kiểu.
+
+    Args:
+        dtypes: {cột: dtype} (mặc định COLUMN_DTYPES)
+        chunk_bytes: Số bytes tối thiểu trước khi parse một khối
+    """
+
+    def __init__(self, dtypes=None, chunk_bytes=CHUNK_BYTES):
+        self.dtypes = COLUMN_DTYPES if dtypes is None else dtypes
+        self.chunk_bytes = chunk_bytes
+        self.columns = None
+        self._pending = bytearray()
+        self._parts = []   # list dict {cột: mảng}
+        self.rows = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._pending += data
+        if len(self._pending) >= self.chunk_bytes:
+            cut = self._pending.rfind(b'\n') + 1
+            if cut:
+                self._parse(bytes(self._pending[:cut]))
+                del self._pending[:cut]
+        return len(data)
+
+    def _parse(self, block):
+        if self.columns is None:
+            # Dòng đầu là header (COPY … HEADER)
+            end = block.index(b'\n')
+            self.columns = block[:end].decode('utf-8').rstrip('\r').split(',')
+            block = block[end + 1:]
+            if not block:
+                return
+        dtypes = {c: self.dtypes[c] for c in self.columns if c in self.dtypes}
+        dtypes.update({c: str for c in DATETIME_COLUMNS if c in self.columns})
+        chunk = pd.read_csv(
+            io.BytesIO(block), header=None, names=self.columns, dtype=dtypes,
+            keep_default_na=False, na_values=[''], engine='c'
+        )
+        part = {}
+        for col in self.columns:
+            if col in DATETIME_COLUMNS:
+                # Giữ Series để không mất múi giờ nếu cột là timestamptz
+                part[col] = pd.to_datetime(chunk[col], format='ISO8601')
+            else:
+                part[col] = chunk[col].to_numpy()
+        self._parts.append(part)
+        self.rows += len(chunk)
+
+    def frame(self):
+        """Parse phần còn lại và ghép các khối thành một DataFrame."""
+        if self._pending:
+            block = bytes(self._pending)
+            self._pending.clear()
+            self._parse(block if block.endswith(b'\n') else block + b'\n')
+        if self.columns is None:
+            return pd.DataFrame()
+        if not self._parts:
+            return pd.DataFrame({
+                c: np.empty(0, dtype=self.dtypes.get(c, 'datetime64[ns]' if c in DATETIME_COLUMNS else float))
+                for c in self.columns
+            })
+        data = {}
+        for col in self.columns:
+            pieces = [part.pop(col) for part in self._parts]
+            if col in DATETIME_COLUMNS:
+                data[col] = pd.concat(pieces, ignore_index=True)
+            else:
+                data[col] = np.concatenate(pieces)
+        self._parts = []
+        return pd.DataFrame(data, copy=False)
+
+
+def copy_query(conn, sql, params=None, dtypes=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Chạy SELECT qua COPY … TO STDOUT (CSV) và trả về DataFrame có kiểu.
+
+    Args:
+        conn: Kết nối psycopg2
+        sql: Câu SELECT (có thể có %s)
+        params: Tham số cho sql (được mogrify phía client vì COPY không nhận tham số)
+        dtypes: {cột: dtype} (mặc định COLUMN_DTYPES)
+
+    Returns:
+        DataFrame
+    """
+    parser = CsvChunkParser(dtypes, chunk_bytes)
+    with conn.cursor() as cur:
+        select = cur.mogrify(sql, params).decode('utf-8') if params else sql
+        cur.copy_expert(f"COPY ({select.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER true)", parser)
+    return parser.frame()
+
+
+def build_select(table, columns=None, where=None, order_by=None, limit=None):
+    """
+    Câu SELECT với projection cột tuỳ chọn.
+
+    Args:
+        table: Tên bảng
+        columns: Danh sách cột (None = tất cả cột trong COLUMN_DTYPES + timestamp)
+        where: Điều kiện (chuỗi SQL, có thể có %s)
+        order_by: Chuỗi ORDER BY
+        limit: Giới hạn số dòng (thêm một tham số %s)
+    """
+    columns = columns or (DATETIME_COLUMNS + list(COLUMN_DTYPES))
+    cols_sql = ', '.join(f'"{c}"' if c == 'timestamp' else c for c in columns)
+    sql = f"SELECT {cols_sql} FROM {table}"
+    if where:
+        sql += f" WHERE {where}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit is not None:
+        sql += " LIMIT %s"
+    return sql
+
+
+def load_table(conn, table, columns=None, where=None, params=None, order_by=None,
+               limit=None, dtypes=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Tải bảng (hoặc một phần) thành DataFrame có kiểu (đã apply_schema).
+
+    Returns:
+        DataFrame, hoặc None nếu lỗi
+    """
+    sql = build_select(table, columns, where, order_by, limit)
+    params = list(params or [])
+    if limit is not None:
+        params.append(limit)
+    start = time.perf_counter()
+    try:
+        df = apply_schema(copy_query(conn, sql, params or None, dtypes, chunk_bytes))
+    except Exception as e:
+        print(f"LỖI khi tải dữ liệu bằng COPY từ {table}: {e}")
+        conn.rollback()
+        return None
+    print(f"✅ COPY {table}: {len(df)} dòng, {df.memory_usage(deep=False).sum() / 1e6:.1f} MB "
+          f"trong {time.perf_counter() - start:.2f}s")
+    return df
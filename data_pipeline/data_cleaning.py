@@ -3,6 +3,8 @@
 
 import pandas as pd
 
+from data_pipeline.schema import apply_schema
+
 HOURLY_PARAMS = [
     "temperature_2m", "relative_humidity_2m", "precipitation",
     "rain", "showers", "weather_code", "pressure_msl",
@@ -37,9 +39,9 @@ def clean_api_data(data_json, province_id, province_name):
             print(f"  Không có dữ liệu hợp lệ (sau khi lọc NaN) cho {province_name}.")
             return None
 
-        # Sắp xếp lại cột cho đúng thứ tự
+        # Sắp xếp lại cột cho đúng thứ tự, ép kiểu theo schema (float32, int16…)
         columns = ["province_id", "timestamp"] + HOURLY_PARAMS
-        df = df[columns]
+        df = apply_schema(df[columns])
         
         return df
         
@@ -1,4 +1,4 @@
-import requests
+from services import http_client
 
 def fetch_weather_api(lat, lon, start_date, end_date):
     """
@@ -15,11 +15,6 @@ def fetch_weather_api(lat, lon, start_date, end_date):
         "timezone": "Asia/Bangkok"
     }
     
-    response = requests.get(BASE_URL, params=params)
-    
-    # Dòng này sẽ tự động "văng" lỗi (raise Exception) 
-    # cho các mã trạng thái 4xx (như 429) hoặc 5xx.
-    response.raise_for_status() 
-    
-    # Nếu không có lỗi, trả về JSON
-    return response.json()
\ No newline at end of file
+    # Kết nối keep-alive dùng chung, không retry trong client: main_pipeline đã có vòng
+    # chờ 429 riêng (RETRY_DELAY_START, nhân đôi). Lỗi 4xx (như 429) / 5xx "văng" ra ngay.
+    return http_client.get_json(BASE_URL, params=params, retries=0)
\ No newline at end of file
@@ -4,6 +4,8 @@ import pandas as pd
 from io import StringIO
 import traceback
 
+from data_pipeline.schema import db_values
+
 # --- CẤU HÌNH DATABASE ---
 # Cần được thay đổi cho phù hợp
 DB_CONFIG = {
@@ -124,7 +126,7 @@ def insert_weather_data(conn, df):
         extras.execute_values(
             cursor,
             sql_insert,
-            df.values,
+            db_values(df),  # float32 / category -> kiểu Python cho psycopg2
             page_size=1000
         )
         conn.commit()
@@ -179,7 +181,7 @@ def insert_air_quality_data(conn, df):
         extras.execute_values(
             cursor,
             sql_insert,
-            df.values,
+            db_values(df),  # float32 / category -> kiểu Python cho psycopg2
             page_size=1000
         )
         conn.commit()
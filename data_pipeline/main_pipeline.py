@@ -26,6 +26,7 @@ try:
     from data_pipeline.data_loader import fetch_weather_api
     from data_pipeline.data_cleaning import clean_api_data
     from data_pipeline.data_storage import connect_to_db, get_last_timestamp, insert_weather_data, get_provinces_from_db
+    from services.forecast_ml.feature_store import update_feature_store
     print("✅ Import modules thành công!")
 except ImportError as e:
     print(f"❌ LỖI IMPORT: {e}")
@@ -129,6 +130,13 @@ def run_pipeline():
         if PROVINCE_DELAY_SECONDS > 0:
             time.sleep(PROVINCE_DELAY_SECONDS)
 
+    # Tính features cho các dòng mới (chỉ kèm 24 dòng ngữ cảnh mỗi tỉnh)
+    try:
+        update_feature_store(conn, province_ids=[p[0] for p in provinces])
+    except Exception as e:
+        print(f"❌ Lỗi khi cập nhật feature store: {e}")
+        conn.rollback()
+
     print("\n✅ HOÀN TẤT TOÀN BỘ QUÁ TRÌNH.")
     conn.close()
 
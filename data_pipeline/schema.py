@@ -0,0 +1,118 @@
+# data_pipeline/schema.py
+"""
+Chính sách kiểu dữ liệu dùng chung cho pipeline dữ liệu và ML.
+
+    Đại lượng đo (nhiệt độ, mưa, gió…)   float32   (~7 chữ số, dư cho dữ liệu 1-2 số lẻ)
+    Features dẫn xuất (lag, rolling…)     float32   (XGBoost vốn làm việc trên float32)
+    Mã thời tiết (không NULL)             int16
+    Trường lịch (giờ, thứ, tháng, mùa…)   int8
+    province_id                           category  (mã int8; int16 khi parse CSV)
+    timestamp                             datetime64
+
+Cột có thể NULL (ví dụ weather_code trong weather_data) giữ float32 cho tới khi
+được điền; apply_schema() chỉ ép sang int khi cột không còn NaN.
+
+Ở ranh giới ghi DB, db_values() đổi ngược về kiểu Python để psycopg2 chuyển được.
+"""
+
+import numpy as np
+import pandas as pd
+
+MEASUREMENT_DTYPE = np.float32
+FEATURE_DTYPE = np.float32
+PROVINCE_DTYPE = 'category'
+# Kiểu của province_id khi parse CSV / COPY (category được dựng sau khi ghép các khối)
+PROVINCE_WIRE_DTYPE = np.int16
+
+MEASUREMENT_COLUMNS = [
+    'temperature_2m',
+    'apparent_temperature',
+    'relative_humidity_2m',
+    'precipitation',
+    'rain',
+    'showers',
+    'cloud_cover',
+    'cloud_cover_low',
+    'cloud_cover_mid',
+    'cloud_cover_high',
+    'wind_speed_10m',
+    'wind_direction_10m',
+    'wind_gusts_10m',
+    'pressure_msl',
+    'shortwave_radiation',
+    'direct_radiation',
+    'uv_index',
+    'sunshine_duration',
+]
+
+# Mã phân loại (int khi không NULL)
+CODE_DTYPES = {
+    'weather_code': np.int16,
+}
+
+CALENDAR_DTYPES = {
+    'hour': np.int8,
+    'dayofweek': np.int8,
+    'month': np.int8,
+    'day': np.int8,
+    'is_weekend': np.int8,
+    'season': np.int8,
+    'time_of_day': np.int8,
+}
+
+# Kiểu khi parse dữ liệu tải từ DB (mọi cột có thể NULL là float)
+LOAD_DTYPES = {
+    'province_id': PROVINCE_WIRE_DTYPE,
+    **{c: MEASUREMENT_DTYPE for c in MEASUREMENT_COLUMNS},
+    **{c: MEASUREMENT_DTYPE for c in CODE_DTYPES},
+}
+
+
+def apply_schema(df):
+    """
+    Ép các cột của df theo chính sách (cột không biết: float64 -> FEATURE_DTYPE).
+
+    Returns:
+        DataFrame mới (dùng chung bộ nhớ với df cho các cột đã đúng kiểu)
+    """
+    casts = {}
+    for col, dtype in df.dtypes.items():
+        if col == 'province_id':
+            if not isinstance(dtype, pd.CategoricalDtype):
+                casts[col] = PROVINCE_DTYPE
+        elif col in CODE_DTYPES:
+            if dtype != CODE_DTYPES[col] and not df[col].isna().any():
+                casts[col] = CODE_DTYPES[col]
+            elif dtype == np.float64:
+                casts[col] = MEASUREMENT_DTYPE
+        elif col in CALENDAR_DTYPES:
+            if dtype != CALENDAR_DTYPES[col]:
+                casts[col] = CALENDAR_DTYPES[col]
+        elif col in MEASUREMENT_COLUMNS:
+            if dtype != MEASUREMENT_DTYPE:
+                casts[col] = MEASUREMENT_DTYPE
+        elif dtype == np.float64:
+            casts[col] = FEATURE_DTYPE
+    if not casts:
+        return df
+    # Dựng lại từ các cột (không copy cột đã đúng kiểu)
+    return pd.DataFrame({col: df[col].astype(casts[col]) if col in casts else df[col]
+                         for col in df.columns}, index=df.index, copy=False)
+
+
+def db_values(df):
+    """
+    Mảng object các giá trị kiểu Python để ghi DB (execute_values).
+
+    float32 được đổi qua chuỗi ngắn nhất ('25.3', không phải 25.299999237060547);
+    category / int nhỏ về int Python.
+    """
+    columns = {}
+    for col, dtype in df.dtypes.items():
+        s = df[col]
+        if isinstance(dtype, pd.CategoricalDtype):
+            s = s.astype(s.cat.categories.dtype)
+        if s.dtype == np.float32:
+            s = s.astype(str).astype(np.float64).astype(object).where(s.notna(), None)
+        columns[col] = s.astype(object)
+    return pd.DataFrame(columns, index=df.index).to_numpy()
@@ -0,0 +1,246 @@
+# services/aqi_store.py
+"""
+Chỉ số chất lượng không khí (WAQI) cho mọi tỉnh, làm mới nền theo lịch.
+
+Request /api/forecast chỉ đọc snapshot trong bộ nhớ (get_aqi) - không gọi ra ngoài.
+Thread nền (khởi động ở lần get_aqi đầu tiên) mỗi AQI_REFRESH_INTERVAL giây:
+    AQI_SOURCE=db    - chỉ đọc bản ghi mới nhất của từng tỉnh từ air_quality_data
+                       (mặc định: mọi worker web chỉ đọc, một process duy nhất
+                       chạy `python services/aqi_store.py --loop` gọi WAQI và ghi DB)
+    AQI_SOURCE=waqi  - gọi api.waqi.info cho toàn bộ tỉnh, tối đa AQI_CONCURRENCY
+                       lời gọi cùng lúc, ghi bảng air_quality_data
+                       (insert_air_quality_data) rồi thay snapshot; chỉ dùng khi
+                       chạy một process web duy nhất, không có process ghi riêng
+Khi khởi động, snapshot được nạp từ DB trước để không trống sau khi restart.
+
+Thành phần (pm2_5, pm10, o3, no2, so2, co) là chỉ số AQI thành phần WAQI trả về.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_pipeline.data_storage import connect_to_db, get_provinces_from_db, insert_air_quality_data
+from data_pipeline.schema import apply_schema
+from services import http_client
+
+WAQI_URL = "https://api.waqi.info/feed/geo:{lat};{lon}/"
+WAQI_TOKEN = os.environ.get('WAQI_TOKEN', 'demo')
+AQI_SOURCE = os.environ.get('AQI_SOURCE', 'db')   # 'waqi': process web tự gọi WAQI (chỉ khi 1 process)
+AQI_REFRESH_INTERVAL = int(os.environ.get('AQI_REFRESH_INTERVAL', 1800))  # 0 = không chạy nền
+AQI_CONCURRENCY = 4
+
+# Khoá iaqi của WAQI -> cột air_quality_data
+COMPONENTS = {
+    'pm25': 'pm2_5',
+    'pm10': 'pm10',
+    'o3': 'o3',
+    'no2': 'no2',
+    'so2': 'so2',
+    'co': 'co',
+}
+AQI_COLUMNS = ['province_id', 'timestamp', 'aqi'] + list(COMPONENTS.values())
+
+_snapshot = {}   # province_id -> reading
+_snapshot_lock = threading.Lock()
+_refresher = None
+_refresher_lock = threading.Lock()
+_last_refresh = {'at': None, 'ok': 0, 'failed': 0, 'seconds': None}
+
+
+def parse_reading(payload):
+    """
+    JSON của WAQI -> reading {'index', 'components', 'time', 'station'}.
+
+    Returns:
+        dict, hoặc None nếu trạm không có số liệu
+    """
+    if payload.get('status') != 'ok':
+        return None
+    data = payload.get('data') or {}
+    try:
+        index = int(data.get('aqi'))
+    except (TypeError, ValueError):   # WAQI trả '-' khi trạm mất số liệu
+        return None
+    components = {}
+    for key, column in COMPONENTS.items():
+        value = (data.get('iaqi') or {}).get(key, {}).get('v')
+        if isinstance(value, (int, float)):
+            components[column] = value
+    station_time = (data.get('time') or {}).get('s')
+    try:
+        ts = pd.Timestamp(station_time).floor('h')
+    except (TypeError, ValueError):
+        ts = pd.Timestamp(datetime.now()).floor('h')
+    return {
+        'index': index,
+        'components': components,
+        'time': ts.isoformat(),
+        'station': (data.get('city') or {}).get('name'),
+    }
+
+
+def fetch_reading(latitude, longitude):
+    """Reading của trạm gần (latitude, longitude) nhất (raise nếu lỗi kết nối)."""
+    payload = http_client.get_json(WAQI_URL.format(lat=latitude, lon=longitude),
+                                   params={'token': WAQI_TOKEN})
+    return parse_reading(payload)
+
+
+def to_frame(readings):
+    """{province_id: reading} -> DataFrame theo AQI_COLUMNS cho insert_air_quality_data."""
+    rows = [
+        dict({'province_id': pid, 'timestamp': pd.Timestamp(r['time']), 'aqi': r['index']}, **r['components'])
+        for pid, r in readings.items()
+    ]
+    return apply_schema(pd.DataFrame(rows, columns=AQI_COLUMNS).astype({'aqi': float}))
+
+
+def refresh(conn, provinces=None, concurrency=AQI_CONCURRENCY, fetch=fetch_reading):
+    """
+    Gọi WAQI cho các tỉnh (tối đa `concurrency` lời gọi cùng lúc), ghi DB và cập nhật snapshot.
+
+    Args:
+        conn: Kết nối psycopg2 (None = chỉ cập nhật snapshot)
+        provinces: list (province_id, name, lat, lon) (None = mọi tỉnh trong DB)
+
+    Returns:
+        {province_id: reading} của các tỉnh lấy được số liệu
+    """
+    start = time.perf_counter()
+    if provinces is None:
+        provinces = get_provinces_from_db(conn)
+
+    def one(province):
+        pid, name, lat, lon = province
+        try:
+            return pid, fetch(lat, lon)
+        except Exception as e:
+            print(f"⚠️  AQI {name}: {e}")
+            return pid, None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='aqi-refresh') as pool:
+        results = dict(pool.map(one, provinces))
+    readings = {pid: r for pid, r in results.items() if r is not None}
+
+    if conn is not None and readings:
+        insert_air_quality_data(conn, to_frame(readings))
+    with _snapshot_lock:
+        _snapshot.update(readings)
+    _last_refresh.update(at=datetime.now().isoformat(timespec='seconds'), ok=len(readings),
+                         failed=len(provinces) - len(readings), seconds=round(time.perf_counter() - start, 2))
+    print(f"✅ AQI: {len(readings)}/{len(provinces)} tỉnh trong {time.perf_counter() - start:.1f}s")
+    return readings
+
+
+def load_latest(conn):
+    """Nạp bản ghi mới nhất của từng tỉnh từ air_quality_data vào snapshot."""
+    cols = ', '.join(f'"{c}"' for c in AQI_COLUMNS)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT DISTINCT ON (province_id) {cols}
+                FROM air_quality_data
+                ORDER BY province_id, "timestamp" DESC
+            """)
+            rows = cur.fetchall()
+    except Exception as e:
+        print(f"⚠️  Không đọc được air_quality_data: {e}")
+        conn.rollback()
+        return 0
+    readings = {}
+    for row in rows:
+        record = dict(zip(AQI_COLUMNS, row))
+        if record['aqi'] is None:
+            continue
+        readings[record['province_id']] = {
+            'index': int(record['aqi']),
+            'components': {c: float(record[c]) for c in COMPONENTS.values() if record[c] is not None},
+            'time': pd.Timestamp(record['timestamp']).isoformat(),
+            'station': None,
+        }
+    with _snapshot_lock:
+        _snapshot.update(readings)
+    return len(readings)
+
+
+def _refresh_once(source):
+    conn = connect_to_db()
+    if conn is None:
+        return
+    try:
+        if source == 'waqi':
+            refresh(conn)
+        else:
+            load_latest(conn)
+    finally:
+        conn.close()
+
+
+def _refresh_loop(interval, source):
+    loaded = 0
+    conn = connect_to_db()
+    if conn is not None:
+        try:
+            loaded = load_latest(conn)
+        finally:
+            conn.close()
+    if loaded:
+        # Đã có số liệu từ DB: lệch pha ngẫu nhiên để các worker không cùng gọi WAQI
+        time.sleep(random.uniform(0, interval))
+    while True:
+        try:
+            _refresh_once(source)
+        except Exception as e:
+            print(f"❌ Lỗi làm mới AQI: {e}")
+        time.sleep(interval)
+
+
+def start_refresher(interval=None, source=None):
+    """Khởi động thread làm mới nền (một lần mỗi process)."""
+    global _refresher
+    interval = AQI_REFRESH_INTERVAL if interval is None else interval
+    if _refresher is not None or interval <= 0:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, args=(interval, source or AQI_SOURCE),
+                                          name='aqi-refresher', daemon=True)
+            _refresher.start()
+
+
+def get_aqi(province_id):
+    """Reading mới nhất của tỉnh trong bộ nhớ (None nếu chưa có) - không gọi ra ngoài."""
+    start_refresher()
+    with _snapshot_lock:
+        reading = _snapshot.get(province_id)
+    return None if reading is None else dict(reading, components=dict(reading['components']))
+
+
+def status():
+    """Số tỉnh có số liệu và kết quả lần làm mới gần nhất."""
+    with _snapshot_lock:
+        provinces = len(_snapshot)
+    return dict(_last_refresh, provinces=provinces, source=AQI_SOURCE, interval=AQI_REFRESH_INTERVAL)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Làm mới AQI cho mọi tỉnh từ WAQI')
+    parser.add_argument('--loop', action='store_true', help='Chạy mãi, mỗi AQI_REFRESH_INTERVAL giây')
+    args = parser.parse_args()
+
+    while True:
+        _refresh_once('waqi')
+        if not args.loop:
+            break
+        print(f"💤 Ngủ {AQI_REFRESH_INTERVAL}s...")
+        time.sleep(AQI_REFRESH_INTERVAL)
@@ -0,0 +1,194 @@
+# services/fanout.py
+"""
+Chạy song song các bước độc lập của một request dưới một deadline chung.
+
+    deadline = Deadline(FORECAST_DEADLINE)
+    stages = StageRecorder()
+    f_api = stages.submit(EXECUTOR, 'open_meteo', fetch, ...)
+    f_aqi = stages.submit(EXECUTOR, 'aqi', fetch_aqi, ...)
+    api = stages.wait('open_meteo', f_api, deadline)                  # bắt buộc: lỗi / quá hạn -> raise
+    aqi = stages.wait('aqi', f_aqi, deadline, default=None)           # tuỳ chọn: quá hạn -> default
+    response.headers['Server-Timing'] = stages.server_timing()
+
+Thời gian từng bước được ghi vào LatencyTracker (cửa sổ trượt) để xem p50 / p99.
+Bước quá hạn vẫn chạy nốt trong thread pool (giới hạn bởi timeout riêng của nó),
+thời gian thực của nó vẫn được ghi khi xong. Bước nặng CPU nên chạy trên
+BoundedExecutor riêng: pool đầy thì từ chối ngay (ExecutorSaturated) thay vì
+xếp hàng chiếm thread của các bước I/O.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+# Số mẫu gần nhất giữ cho mỗi bước
+LATENCY_WINDOW = 1000
+
+_MISSING = object()
+
+
+class DeadlineExceeded(Exception):
+    """Bước bắt buộc không xong trước deadline."""
+
+
+class ExecutorSaturated(Exception):
+    """BoundedExecutor đã đủ việc đang chạy / chờ, không nhận thêm."""
+
+
+class BoundedExecutor:
+    """
+    ThreadPoolExecutor giới hạn số việc chưa xong (đang chạy + đang chờ).
+
+    Args:
+        max_workers: Số thread
+        max_pending: Số việc được chờ thêm khi mọi thread bận (0 = không xếp hàng)
+    """
+
+    def __init__(self, max_workers, max_pending=0, thread_name_prefix=''):
+        self.max_workers = max_workers
+        self.limit = max_workers + max_pending
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+    def submit(self, fn, *args, **kwargs):
+        """Như ThreadPoolExecutor.submit, raise ExecutorSaturated nếu đã đủ `limit` việc chưa xong."""
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturated(f"đã có {self.limit} việc chưa xong")
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+class Deadline:
+    """Ngân sách thời gian end-to-end của một request."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self, cap=None):
+        """Số giây còn lại (>= 0), không vượt quá cap."""
+        left = max(0.0, self.expires - time.monotonic())
+        return left if cap is None else min(left, cap)
+
+    def expired(self):
+        return self.remaining() == 0.0
+
+
+class LatencyTracker:
+    """Cửa sổ trượt thời gian (giây) theo từng bước, thread-safe."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def percentiles(self):
+        """{bước: {'count', 'p50_ms', 'p99_ms', 'max_ms'}}"""
+        with self._lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self._samples.items()}
+        return {
+            stage: {
+                'count': int(len(ms)),
+                'p50_ms': round(float(np.percentile(ms, 50)), 1),
+                'p99_ms': round(float(np.percentile(ms, 99)), 1),
+                'max_ms': round(float(ms.max()), 1),
+            }
+            for stage, ms in samples.items() if len(ms)
+        }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+class StageRecorder:
+    """
+    Thời gian các bước của một request.
+
+    Args:
+        tracker: LatencyTracker nhận thời gian mỗi bước khi bước đó xong (None = không ghi)
+    """
+
+    def __init__(self, tracker=None):
+        self.tracker = tracker
+        self.started = time.perf_counter()
+        self.durations = {}   # bước -> giây (bước quá hạn: thời gian đã chờ)
+        self.partial = []     # các bước tuỳ chọn bị bỏ vì quá hạn / lỗi
+        self._lock = threading.Lock()
+
+    def run(self, name, fn, *args, **kwargs):
+        """Chạy fn ngay trong thread hiện tại và ghi thời gian."""
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._done(name, time.perf_counter() - start)
+
+    def submit(self, executor, name, fn, *args, **kwargs):
+        """Chạy fn trong executor; thời gian tính từ lúc bắt đầu chạy."""
+        return executor.submit(self.run, name, fn, *args, **kwargs)
+
+    def skip(self, name, reason):
+        """Bỏ bước tuỳ chọn không chạy được (ví dụ pool đầy): ghi vào partial."""
+        print(f"⚠️  Bỏ bước {name}: {reason}")
+        with self._lock:
+            self.partial.append(name)
+
+    def _done(self, name, seconds):
+        with self._lock:
+            self.durations.setdefault(name, seconds)
+        if self.tracker is not None:
+            self.tracker.record(name, seconds)
+
+    def wait(self, name, future, deadline, default=_MISSING):
+        """
+        Kết quả của future trong thời gian còn lại của deadline.
+
+        Không có default: lỗi của bước được raise lại, quá hạn -> DeadlineExceeded.
+        Có default: lỗi / quá hạn -> trả về default và ghi bước vào partial.
+        """
+        start = time.perf_counter()
+        try:
+            return future.result(timeout=deadline.remaining())
+        except FutureTimeout:
+            with self._lock:
+                self.durations.setdefault(name, time.perf_counter() - start)
+                if default is not _MISSING:
+                    self.partial.append(name)
+            if default is _MISSING:
+                raise DeadlineExceeded(f"{name} quá {deadline.seconds}s")
+            return default
+        except Exception as e:
+            if default is _MISSING:
+                raise
+            print(f"⚠️  Bước {name} lỗi: {e}")
+            with self._lock:
+                self.partial.append(name)
+            return default
+
+    def server_timing(self):
+        """Giá trị header Server-Timing (ms), kèm tổng thời gian request."""
+        total = time.perf_counter() - self.started
+        with self._lock:
+            items = [
+                f"{name};dur={seconds * 1000:.1f}" + (';desc="partial"' if name in self.partial else '')
+                for name, seconds in self.durations.items()
+            ]
+        items.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(items)
@@ -14,7 +14,7 @@ sys.path.append(project_root)
 
 # Import hàm dự báo từ project
 try:
-    from services.forecast_ml.predictor import predict_storm
+    from services.forecast_ml.predictor import predict_storms
 except ImportError as e:
     print(f"❌ Lỗi Import: {e}")
     print("Vui lòng đảm bảo bạn đang chạy file từ thư mục gốc của dự án hoặc cấu trúc thư mục đúng.")
@@ -52,14 +52,19 @@ def update_all_forecasts():
             print(f"❌ Lỗi truy vấn danh sách tỉnh: {e}")
             return
 
-    # Tính toán cho từng tỉnh
+    # Tính toán đồng thời cho tất cả tỉnh (mỗi giờ dự đoán chỉ 1 lần model.predict)
+    print(f"   ⏳ Đang tính toán {len(provinces)} tỉnh...", flush=True)
+    started = time.time()
+    ml_results = predict_storms([p_id for p_id, _ in provinces])
+    print(f"   ⏱️  Dự báo xong sau {time.time() - started:.1f}s")
+
+    # Lưu kết quả cho từng tỉnh
     count_success = 0
     for p_id, p_name in provinces:
         try:
-            print(f"   ⏳ Đang tính toán: {p_name}...", end="", flush=True)
+            print(f"   💾 {p_name}...", end="", flush=True)
             
-            # Gọi hàm dự báo AI
-            ml_result = predict_storm(province_id=p_id)
+            ml_result = ml_results[p_id]
             
             if "error" in ml_result:
                 print(f" ⚠️ Lỗi model: {ml_result['error']}")
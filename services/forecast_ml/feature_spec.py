@@ -0,0 +1,161 @@
+# services/forecast_ml/feature_spec.py
+"""
+Đặc tả features duy nhất cho cả training và serving.
+
+Mọi feature được khai báo một lần ở đây rồi "biên dịch" thành ba đường tính:
+    build_features()  - batch theo cột (NumPy) cho training / backtest,
+                        mỗi dòng t là mốc (anchor) dự đoán t+1 (hoặc t+h)
+    FeatureState      - vector cấp phát sẵn cho inference online (feature_state.py),
+                        anchor là dòng mới nhất trong ring buffer
+    feature_query()   - SELECT với window function để PostgreSQL tính features cho
+                        training trên toàn bộ lịch sử (sql_features.py)
+
+Ngữ nghĩa chung tại anchor t (cùng một tỉnh, dữ liệu theo giờ):
+    {col}_lag{k}      - giá trị của dòng t-k
+    {prefix}_{w}      - phép gộp trên w dòng t-w+1 … t (bỏ qua NaN, min_periods=1)
+    time features     - lấy từ timestamp của dòng t
+    time_of_day       - 0: [0h, 6h], 1: (6h, 12h], 2: (12h, 18h], 3: (18h, 24h)
+                        (giống pd.cut(bins=[0, 6, 12, 18, 24], include_lowest=True))
+    interaction       - từ giá trị thô của dòng t
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.schema import CALENDAR_DTYPES, FEATURE_DTYPE
+from services.forecast_ml.rolling_engine import add_lag_rolling_features
+
+# Các cột lịch sử (cùng thứ tự với load_historical_data)
+HISTORY_COLUMNS = [
+    'temperature_2m',
+    'apparent_temperature',
+    'relative_humidity_2m',
+    'precipitation',
+    'rain',
+    'showers',
+    'cloud_cover',
+    'cloud_cover_low',
+    'cloud_cover_mid',
+    'cloud_cover_high',
+    'weather_code',
+    'wind_speed_10m',
+    'wind_direction_10m',
+    'wind_gusts_10m',
+    'pressure_msl',
+    'shortwave_radiation',
+    'direct_radiation',
+    'uv_index',
+    'sunshine_duration'
+]
+
+LAGS = [1, 2, 3, 6, 12, 24]
+LAG_COLS = [
+    'temperature_2m',
+    'relative_humidity_2m',
+    'wind_speed_10m',
+    'pressure_msl',
+    'precipitation',
+    'cloud_cover'
+]
+
+ROLLING_WINDOWS = [3, 6, 24]
+# (tiền tố tên feature, cột nguồn, phép gộp)
+ROLLING_FEATURES = [
+    ('temp_roll_mean', 'temperature_2m', 'mean'),
+    ('temp_roll_std', 'temperature_2m', 'std'),
+    ('temp_roll_min', 'temperature_2m', 'min'),
+    ('temp_roll_max', 'temperature_2m', 'max'),
+    ('precip_roll_sum', 'precipitation', 'sum'),
+    ('humidity_roll_mean', 'relative_humidity_2m', 'mean'),
+    ('pressure_roll_mean', 'pressure_msl', 'mean'),
+    ('wind_roll_mean', 'wind_speed_10m', 'mean'),
+    ('wind_roll_max', 'wind_speed_10m', 'max'),
+]
+
+# Số dòng cần có tới anchor để mọi lag/cửa sổ đều có dữ liệu (training bỏ các
+# dòng có lag NaN nên mô hình chưa từng thấy lịch sử ngắn hơn)
+MIN_HISTORY = max(max(LAGS) + 1, max(ROLLING_WINDOWS))
+
+SEASON_MAP = {
+    12: 0, 1: 0, 2: 0,  # Đông
+    3: 1, 4: 1, 5: 1,   # Xuân
+    6: 2, 7: 2, 8: 2,   # Hè
+    9: 3, 10: 3, 11: 3  # Thu
+}
+# Bảng tra theo tháng (chỉ số 1..12) dùng được cho cả số và mảng
+_SEASON_TABLE = np.array([0] + [SEASON_MAP[m] for m in range(1, 13)])
+
+# Cận trên (tính cả) của từng buổi: Đêm, Sáng, Chiều; còn lại là Tối
+TIME_OF_DAY_EDGES = np.array([6, 12, 18])
+
+TIME_FEATURES = ['hour', 'dayofweek', 'month', 'day', 'is_weekend', 'season', 'time_of_day']
+
+# (tên, cột nguồn, phép tính, số chia)
+INTERACTION_FEATURES = [
+    ('temp_humidity_interaction', ('temperature_2m', 'relative_humidity_2m'), 'product', 100),  # Oi bức
+    ('temp_wind_interaction', ('temperature_2m', 'wind_speed_10m'), 'product', 1),              # Lạnh do gió
+    ('pressure_humidity_interaction', ('pressure_msl', 'relative_humidity_2m'), 'product', 100),  # Khả năng mưa
+    ('cloud_cover_total', ('cloud_cover_low', 'cloud_cover_mid', 'cloud_cover_high'), 'sum', 1),
+]
+
+# Tên mọi feature theo thứ tự build_features tạo ra (khi có đủ HISTORY_COLUMNS)
+FEATURE_NAMES = (
+    [f'{col}_lag{k}' for k in LAGS for col in LAG_COLS]
+    + [f'{prefix}_{w}' for w in ROLLING_WINDOWS for prefix, _, _ in ROLLING_FEATURES]
+    + TIME_FEATURES
+    + [name for name, _, _, _ in INTERACTION_FEATURES]
+)
+
+
+def time_values(hour, dayofweek, month, day):
+    """
+    Time features từ các thành phần thời gian của anchor.
+
+    Nhận số (online) hoặc mảng int (batch), trả về dict theo thứ tự TIME_FEATURES.
+    """
+    return {
+        'hour': hour,
+        'dayofweek': dayofweek,
+        'month': month,
+        'day': day,
+        'is_weekend': (dayofweek >= 5) * 1,
+        'season': _SEASON_TABLE[month],
+        'time_of_day': np.searchsorted(TIME_OF_DAY_EDGES, hour),
+    }
+
+
+def interaction_value(op, values, divisor):
+    """Giá trị một interaction feature từ các cột nguồn (số hoặc mảng)."""
+    if op == 'product':
+        result = values[0]
+        for v in values[1:]:
+            result = result * v
+    else:
+        result = values[0]
+        for v in values[1:]:
+            result = result + v
+    return result / divisor if divisor != 1 else result
+
+
+def build_features(df, group_col='province_id', dtype=FEATURE_DTYPE):
+    """
+    Đường batch: thêm toàn bộ features vào DataFrame đã sort theo (group_col, timestamp).
+
+    Thứ tự cột: lag, rolling, time, interaction (interaction thiếu cột nguồn bị bỏ qua).
+    Lag / rolling / interaction có kiểu `dtype`, time features theo schema.CALENDAR_DTYPES.
+
+    Returns:
+        DataFrame mới có thêm các cột feature
+    """
+    df = add_lag_rolling_features(df, LAGS, LAG_COLS, ROLLING_WINDOWS, ROLLING_FEATURES, group_col, dtype)
+
+    ts = pd.to_datetime(df['timestamp']).dt
+    new = time_values(
+        ts.hour.to_numpy(), ts.dayofweek.to_numpy(), ts.month.to_numpy(), ts.day.to_numpy()
+    )
+    new = {name: np.asarray(values).astype(CALENDAR_DTYPES[name], copy=False) for name, values in new.items()}
+    for name, cols, op, divisor in INTERACTION_FEATURES:
+        if all(c in df.columns for c in cols):
+            values = interaction_value(op, [df[c].to_numpy(dtype=float) for c in cols], divisor)
+            new[name] = values.astype(dtype, copy=False)
+    return pd.concat([df, pd.DataFrame(new, index=df.index)], axis=1)
@@ -0,0 +1,245 @@
+# services/forecast_ml/feature_state.py
+"""
+Trạng thái lịch sử kích thước cố định (ring buffer) cho vòng lặp dự báo tự hồi quy.
+
+Đây là đường online của feature_spec: mỗi giờ dự đoán chỉ cần push() một dòng
+(O(1)) và features() ghi vector theo đúng thứ tự feature_cols vào mảng cấp phát
+sẵn, không qua pandas. Anchor là dòng mới nhất, giống từng dòng của
+feature_spec.build_features() lúc training. Các tổng trượt (sum/mean/std) được
+cập nhật tăng dần, min/max dùng hàng đợi đơn điệu nên cũng O(1) (khấu hao).
+"""
+
+from collections import deque
+import math
+
+import numpy as np
+import pandas as pd
+
+from services.forecast_ml.feature_spec import (
+    HISTORY_COLUMNS, LAGS, LAG_COLS, ROLLING_WINDOWS, ROLLING_FEATURES, MIN_HISTORY,
+    TIME_FEATURES, INTERACTION_FEATURES, time_values, interaction_value
+)
+
+
+class _MonotonicWindow:
+    """Min/max trượt trên w phần tử cuối bằng hàng đợi đơn điệu (bỏ qua NaN)."""
+
+    __slots__ = ('window', 'is_max', 'items')
+
+    def __init__(self, window, is_max):
+        self.window = window
+        self.is_max = is_max
+        self.items = deque()  # (seq, value)
+
+    def push(self, seq, value):
+        items = self.items
+        if value == value:  # bỏ qua NaN giống pandas
+            if self.is_max:
+                while items and items[-1][1] <= value:
+                    items.pop()
+            else:
+                while items and items[-1][1] >= value:
+                    items.pop()
+            items.append((seq, value))
+        while items and items[0][0] <= seq - self.window:
+            items.popleft()
+
+    def value(self):
+        return self.items[0][1] if self.items else np.nan
+
+
+class FeatureState:
+    """
+    Lịch sử thời tiết của một tỉnh dạng ring buffer NumPy.
+
+    Args:
+        feature_cols: Danh sách features theo thứ tự mô hình cần
+        capacity: Số dòng giữ lại (mặc định đủ cho lag/rolling lớn nhất tính cả anchor)
+    """
+
+    def __init__(self, feature_cols, capacity=None):
+        self.columns = list(HISTORY_COLUMNS)
+        self._col_index = {c: i for i, c in enumerate(self.columns)}
+        self.capacity = capacity or MIN_HISTORY
+        self._buf = np.full((self.capacity, len(self.columns)), np.nan)
+        self._count = 0      # tổng số dòng đã push
+        self._latest = None  # dòng mới nhất (view vào buffer)
+        self.last_timestamp = None
+
+        # --- Các slot tổng trượt: (cột, cửa sổ) cho sum/mean/std ---
+        sum_slots = []
+        self._extremes = {}
+        for w in ROLLING_WINDOWS:
+            for _, col, agg in ROLLING_FEATURES:
+                if agg in ('sum', 'mean', 'std') and (col, w) not in sum_slots:
+                    sum_slots.append((col, w))
+                elif agg in ('min', 'max') and (col, w, agg) not in self._extremes:
+                    self._extremes[(col, w, agg)] = _MonotonicWindow(w, agg == 'max')
+        self._sum_slots = {key: i for i, key in enumerate(sum_slots)}
+        self._slot_var = np.array([self._col_index[c] for c, _ in sum_slots], dtype=np.intp)
+        self._slot_win = np.array([w for _, w in sum_slots], dtype=np.intp)
+        self._sums = np.zeros(len(sum_slots))
+        self._sumsq = np.zeros(len(sum_slots))
+        self._counts = np.zeros(len(sum_slots), dtype=np.intp)
+
+        self._compile(list(feature_cols))
+
+    # ------------------------------------------------------------------
+    # Biên dịch feature_cols -> chỉ số để emit vector nhanh
+    # ------------------------------------------------------------------
+    def _compile(self, feature_cols):
+        self.feature_cols = feature_cols
+        raw_pos, raw_var = [], []
+        lag_pos, lag_var, lag_k = [], [], []
+        self._rolling = []   # (vị trí, phép gộp, key)
+        self._time = []      # (vị trí, tên)
+        self._interactions = []  # (vị trí, phép tính, chỉ số cột nguồn, số chia)
+
+        lag_names = {f'{col}_lag{lag}': (col, lag) for lag in LAGS for col in LAG_COLS}
+        roll_names = {
+            f'{prefix}_{w}': (col, w, agg)
+            for w in ROLLING_WINDOWS for prefix, col, agg in ROLLING_FEATURES
+        }
+        interactions = {spec[0]: spec for spec in INTERACTION_FEATURES}
+
+        for pos, name in enumerate(feature_cols):
+            if name in lag_names:
+                col, lag = lag_names[name]
+                lag_pos.append(pos)
+                lag_var.append(self._col_index[col])
+                lag_k.append(lag)
+            elif name in roll_names:
+                col, w, agg = roll_names[name]
+                if agg in ('min', 'max'):
+                    self._rolling.append((pos, agg, (col, w, agg)))
+                else:
+                    self._rolling.append((pos, agg, self._sum_slots[(col, w)]))
+            elif name in self._col_index:
+                raw_pos.append(pos)
+                raw_var.append(self._col_index[name])
+            elif name in TIME_FEATURES:
+                self._time.append((pos, name))
+            elif name in interactions:
+                _, cols, op, divisor = interactions[name]
+                self._interactions.append((pos, op, [self._col_index[c] for c in cols], divisor))
+            else:
+                raise KeyError(f"Feature không được hỗ trợ: {name}")
+
+        self._raw_pos = np.array(raw_pos, dtype=np.intp)
+        self._raw_var = np.array(raw_var, dtype=np.intp)
+        self._lag_pos = np.array(lag_pos, dtype=np.intp)
+        self._lag_var = np.array(lag_var, dtype=np.intp)
+        self._lag_k = np.array(lag_k, dtype=np.intp)
+
+    # ------------------------------------------------------------------
+    # Cập nhật
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df, feature_cols):
+        """Khởi tạo state từ DataFrame lịch sử (đã sort theo timestamp)."""
+        state = cls(feature_cols)
+        tail = df.tail(state.capacity)
+        values = np.column_stack([
+            tail[c].to_numpy(dtype=float) if c in tail.columns else np.full(len(tail), np.nan)
+            for c in state.columns
+        ]) if len(tail) else np.empty((0, len(state.columns)))
+        timestamps = tail['timestamp'].tolist() if 'timestamp' in tail.columns else [None] * len(tail)
+        for ts, row in zip(timestamps, values):
+            state.push_array(row, ts)
+        return state
+
+    @classmethod
+    def from_arrays(cls, values, timestamps, feature_cols):
+        """Khởi tạo state từ mảng (n, len(HISTORY_COLUMNS)) và timestamps tương ứng."""
+        state = cls(feature_cols)
+        tail = np.asarray(values[-state.capacity:], dtype=float)
+        for ts, row in zip(pd.to_datetime(timestamps[-state.capacity:]), tail):
+            state.push_array(row, ts)
+        return state
+
+    def push(self, row, timestamp=None):
+        """Thêm một dòng dạng dict {cột: giá trị}; cột thiếu được coi là NaN."""
+        self.push_array(
+            np.array([row.get(c, np.nan) for c in self.columns], dtype=float),
+            timestamp if timestamp is not None else row.get('timestamp')
+        )
+
+    def push_array(self, values, timestamp=None):
+        """Thêm một dòng đã sắp theo thứ tự self.columns."""
+        seq = self._count
+        pos = seq % self.capacity
+
+        # Tổng trượt: cộng giá trị mới, trừ giá trị rời khỏi cửa sổ
+        new = values[self._slot_var]
+        new_ok = ~np.isnan(new)
+        new = np.where(new_ok, new, 0.0)
+        full = seq >= self._slot_win
+        old = self._buf[(seq - self._slot_win) % self.capacity, self._slot_var]
+        old_ok = full & ~np.isnan(old)
+        old = np.where(old_ok, old, 0.0)
+        self._sums += new - old
+        self._sumsq += new * new - old * old
+        self._counts += new_ok.astype(np.intp) - old_ok.astype(np.intp)
+
+        self._buf[pos] = values
+        self._latest = self._buf[pos]
+        self._count += 1
+        self.last_timestamp = timestamp
+
+        for (col, _, _), window in self._extremes.items():
+            window.push(seq, float(values[self._col_index[col]]))
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    # ------------------------------------------------------------------
+    # Emit features
+    # ------------------------------------------------------------------
+    def _rolling_value(self, agg, key):
+        if agg in ('min', 'max'):
+            return self._extremes[key].value()
+        n = self._counts[key]
+        if agg == 'sum':
+            return self._sums[key]
+        if n == 0:
+            return np.nan
+        if agg == 'mean':
+            return self._sums[key] / n
+        # std (ddof=1) như pandas
+        if n < 2:
+            return np.nan
+        var = (self._sumsq[key] - self._sums[key] ** 2 / n) / (n - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+    def features(self, anchor_time=None, out=None):
+        """
+        Tạo vector features tại anchor là dòng mới nhất (dự đoán giờ kế tiếp).
+
+        Args:
+            anchor_time: Thời điểm của dòng mới nhất (mặc định last_timestamp)
+            out: Mảng 1 chiều dùng lại (tuỳ chọn)
+
+        Returns:
+            np.ndarray theo thứ tự feature_cols, hoặc None nếu chưa đủ lịch sử
+        """
+        if self._count < MIN_HISTORY:
+            return None
+        if out is None:
+            out = np.empty(len(self.feature_cols))
+        if anchor_time is None:
+            anchor_time = self.last_timestamp
+
+        latest = self._latest
+        out[self._raw_pos] = latest[self._raw_var]
+        # lag k = dòng anchor - k (anchor là dòng thứ _count - 1)
+        out[self._lag_pos] = self._buf[(self._count - 1 - self._lag_k) % self.capacity, self._lag_var]
+        for pos, agg, key in self._rolling:
+            out[pos] = self._rolling_value(agg, key)
+
+        if self._time:
+            values = time_values(anchor_time.hour, anchor_time.weekday(), anchor_time.month, anchor_time.day)
+            for pos, name in self._time:
+                out[pos] = values[name]
+        for pos, op, cols, divisor in self._interactions:
+            out[pos] = interaction_value(op, [latest[c] for c in cols], divisor)
+        return out
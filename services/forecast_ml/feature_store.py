@@ -0,0 +1,244 @@
+# services/forecast_ml/feature_store.py
+"""
+Feature store: features đã tính sẵn cho từng (province_id, timestamp) trong bảng
+weather_features của PostgreSQL.
+
+Sau mỗi lần data_pipeline.main_pipeline.run_pipeline, update_feature_store() chỉ
+tính các dòng mới hơn dòng cuối cùng đã lưu của từng tỉnh, kèm CONTEXT_ROWS dòng
+liền trước làm ngữ cảnh cho lag/rolling (lag 24 và cửa sổ 24 không cần xa hơn).
+Training / evaluation đọc thẳng ma trận features bằng load_feature_matrix() thay
+vì tải lại dữ liệu thô và tính lại toàn bộ lag/rolling.
+
+Bảng lưu cột thô (HISTORY_COLUMNS, cần cho target) và FEATURE_NAMES dạng REAL:
+XGBoost vốn làm việc trên float32 nên không mất thông tin.
+"""
+
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from data_pipeline.bulk_loader import COLUMN_DTYPES, copy_query, load_table
+from data_pipeline.data_storage import connect_to_db, get_provinces_from_db
+from data_pipeline.schema import FEATURE_DTYPE
+from services.forecast_ml.feature_spec import FEATURE_NAMES, HISTORY_COLUMNS, MIN_HISTORY, build_features
+
+TABLE = 'weather_features'
+KEY_COLUMNS = ['province_id', 'timestamp']
+STORE_COLUMNS = HISTORY_COLUMNS + FEATURE_NAMES
+STORE_DTYPES = {**COLUMN_DTYPES, **{c: np.float32 for c in FEATURE_NAMES}, 'context_row': np.int8}
+
+# Số dòng trước dòng mới đầu tiên cần để tính lại lag/rolling
+CONTEXT_ROWS = MIN_HISTORY - 1
+# Cùng điều kiện lọc với load_data_for_training
+RAW_FILTER = 'temperature_2m IS NOT NULL AND pressure_msl IS NOT NULL'
+# Giá trị điền cho cột thô bị thiếu trước khi tính features
+# (chuỗi = lấy giá trị cột đó cùng dòng)
+FILL_VALUES = {
+    'apparent_temperature': 'temperature_2m',  # Nếu thiếu thì dùng temp thường
+    'precipitation': 0,
+    'rain': 0,
+    'showers': 0,
+    'cloud_cover': 50,
+    'cloud_cover_low': 0,
+    'cloud_cover_mid': 0,
+    'cloud_cover_high': 0,
+    'wind_gusts_10m': 'wind_speed_10m',  # Nếu thiếu gust thì dùng wind speed
+    'shortwave_radiation': 0,
+    'direct_radiation': 0,
+    'uv_index': 0,
+    'sunshine_duration': 0,
+    'weather_code': 1
+}
+# Số tỉnh xử lý mỗi lượt (giới hạn bộ nhớ khi dựng lại từ đầu)
+PROVINCE_BATCH = 8
+
+
+def _q(column):
+    return f'"{column}"'
+
+
+def compute_features(df, dtype=FEATURE_DTYPE):
+    """
+    Dữ liệu thô -> dòng của feature store: sort, điền giá trị thiếu, build_features.
+
+    Args:
+        df: DataFrame thô (province_id, timestamp, HISTORY_COLUMNS)
+        dtype: Kiểu của các cột feature
+
+    Returns:
+        DataFrame đã sort theo (province_id, timestamp) có thêm FEATURE_NAMES
+    """
+    df = df.sort_values(['province_id', 'timestamp'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+    # Fill missing values với giá trị hợp lý
+    for col, default_val in FILL_VALUES.items():
+        if col in df.columns:
+            if isinstance(default_val, str):
+                default_val = df[default_val]
+            df[col] = df[col].fillna(default_val)
+
+    return build_features(df, dtype=dtype)
+
+
+# ----------------------------------------------------------------------------
+# Ghi
+# ----------------------------------------------------------------------------
+
+def ensure_table(conn):
+    """Tạo bảng nếu chưa có; thêm cột cho feature mới của feature_spec."""
+    columns = ',\n        '.join(f'{_q(c)} REAL' for c in STORE_COLUMNS)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABLE} (
+                province_id SMALLINT NOT NULL,
+                "timestamp" TIMESTAMP NOT NULL,
+                {columns},
+                PRIMARY KEY (province_id, "timestamp")
+            )
+        """)
+        for c in STORE_COLUMNS:
+            cur.execute(f'ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS {_q(c)} REAL')
+    conn.commit()
+
+
+def _raw_query():
+    """
+    Dữ liệu thô cần tính cho một nhóm tỉnh (%s = mảng province_id):
+    CONTEXT_ROWS dòng cuối đã có trong store (context_row = 1) và mọi dòng mới hơn.
+    """
+    cols = ', '.join(_q(c) for c in KEY_COLUMNS + HISTORY_COLUMNS)
+    w_cols = ', '.join(f'w.{_q(c)}' for c in KEY_COLUMNS + HISTORY_COLUMNS)
+    return f"""
+        WITH last AS (
+            SELECT p.province_id, MAX(f."timestamp") AS last_ts
+            FROM unnest(%s::int[]) AS p(province_id)
+            LEFT JOIN {TABLE} f ON f.province_id = p.province_id
+            GROUP BY p.province_id
+        )
+        SELECT c.*, 1 AS context_row
+        FROM last l CROSS JOIN LATERAL (
+            SELECT {cols} FROM weather_data w
+            WHERE w.province_id = l.province_id AND {RAW_FILTER}
+              AND w."timestamp" <= l.last_ts
+            ORDER BY w."timestamp" DESC
+            LIMIT {CONTEXT_ROWS}
+        ) c
+        UNION ALL
+        SELECT {w_cols}, 0 AS context_row
+        FROM weather_data w JOIN last l ON w.province_id = l.province_id
+        WHERE {RAW_FILTER} AND (l.last_ts IS NULL OR w."timestamp" > l.last_ts)
+    """
+
+
+def _write(conn, df):
+    """Upsert các dòng vào bảng qua bảng tạm + COPY FROM STDIN."""
+    columns = KEY_COLUMNS + STORE_COLUMNS
+    buffer = io.StringIO()
+    out = df[columns].copy()
+    out[FEATURE_NAMES] = out[FEATURE_NAMES].astype(np.float32)
+    out.to_csv(buffer, index=False, header=False, na_rep='', date_format='%Y-%m-%d %H:%M:%S')
+    buffer.seek(0)
+
+    cols_sql = ', '.join(_q(c) for c in columns)
+    updates = ', '.join(f'{_q(c)} = EXCLUDED.{_q(c)}' for c in STORE_COLUMNS)
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE _features_stage (LIKE {TABLE}) ON COMMIT DROP")
+        cur.copy_expert(f"COPY _features_stage ({cols_sql}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(f"""
+            INSERT INTO {TABLE} ({cols_sql})
+            SELECT {cols_sql} FROM _features_stage
+            ON CONFLICT (province_id, "timestamp") DO UPDATE SET {updates}
+        """)
+    conn.commit()
+
+
+def update_feature_store(conn, province_ids=None, rebuild=False):
+    """
+    Cập nhật tăng dần feature store.
+
+    Args:
+        conn: Kết nối psycopg2
+        province_ids: Danh sách tỉnh (None = mọi tỉnh trong bảng provinces)
+        rebuild: Xoá toàn bộ và tính lại từ đầu (sau khi đổi feature_spec)
+
+    Returns:
+        int: Số dòng đã ghi
+    """
+    start = time.perf_counter()
+    ensure_table(conn)
+    if rebuild:
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {TABLE}")
+        conn.commit()
+    if province_ids is None:
+        province_ids = [p[0] for p in get_provinces_from_db(conn)]
+
+    written = 0
+    for i in range(0, len(province_ids), PROVINCE_BATCH):
+        batch = [int(p) for p in province_ids[i:i + PROVINCE_BATCH]]
+        raw = copy_query(conn, _raw_query(), [batch], dtypes=STORE_DTYPES)
+        if raw.empty or not (raw['context_row'] == 0).any():
+            continue
+        features = compute_features(raw)
+        features = features[features['context_row'] == 0]
+        _write(conn, features)
+        written += len(features)
+
+    print(f"✅ Feature store: ghi {written} dòng trong {time.perf_counter() - start:.1f}s")
+    return written
+
+
+# ----------------------------------------------------------------------------
+# Đọc
+# ----------------------------------------------------------------------------
+
+def load_feature_matrix(conn, province_id=None, limit=None, since=None):
+    """
+    Đọc dòng đã tính sẵn từ feature store.
+
+    Args:
+        conn: Kết nối psycopg2
+        province_id: Chỉ lấy một tỉnh (None = tất cả)
+        limit: Số dòng mới nhất tối đa
+        since: Chỉ lấy dòng có timestamp > since
+
+    Returns:
+        DataFrame sort theo (province_id, timestamp) gồm cột thô và FEATURE_NAMES,
+        hoặc None nếu store trống / chưa tạo
+    """
+    conditions, params = [], []
+    if province_id:
+        conditions.append("province_id = %s")
+        params.append(province_id)
+    if since is not None:
+        conditions.append('"timestamp" > %s')
+        params.append(since)
+    where = ' AND '.join(conditions) or None
+    df = load_table(conn, TABLE, columns=KEY_COLUMNS + STORE_COLUMNS, where=where, params=params,
+                    order_by='"timestamp" DESC', limit=limit, dtypes=STORE_DTYPES)
+    if df is None or df.empty:
+        return None
+    return df.sort_values(['province_id', 'timestamp'], ignore_index=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Cập nhật feature store')
+    parser.add_argument('--rebuild', action='store_true', help='Xoá và tính lại toàn bộ')
+    parser.add_argument('--province-id', type=int, action='append', help='Chỉ cập nhật tỉnh này')
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    if conn is None:
+        sys.exit(1)
+    try:
+        update_feature_store(conn, province_ids=args.province_id, rebuild=args.rebuild)
+    finally:
+        conn.close()
@@ -0,0 +1,336 @@
+# services/forecast_ml/hyperparameter_search.py
+"""
+Tìm hyperparameter XGBoost bằng successive halving trên số cây.
+
+- Ma trận train / validation được tải và cache MỘT lần ra file .npy float32
+  (SEARCH_DIR/cache); chạy lại với --reuse-cache không cần query DB. Worker mở
+  bằng mmap và dựng QuantileDMatrix một lần cho mọi cấu hình nó chạy.
+- Các cấu hình ngẫu nhiên từ SEARCH_SPACE chạy song song (workers × nthread ≤ số CPU).
+  Mỗi vòng (rung) train thêm cây cho các cấu hình còn lại (warm start từ booster của
+  rung trước) rồi chỉ giữ 1/ETA cấu hình tốt nhất.
+- Mỗi điểm (cấu hình, số cây) được đo sai số validation và độ trễ predict 1 dòng
+  (1 luồng, như serving), báo cáo cấu hình chính xác nhất, hiệu quả nhất
+  (độ chính xác / ms) và biên Pareto.
+
+Validation là phần cuối theo thời gian của tập train trong train() (tập test của
+train() không bị dùng để chọn tham số).
+
+Chạy:
+    python services/forecast_ml/hyperparameter_search.py --configs 27 --max-trees 1000
+    python services/forecast_ml/hyperparameter_search.py --reuse-cache --workers 2
+"""
+
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from data_pipeline.data_storage import connect_to_db
+from services.forecast_ml.model_training import (
+    MODEL_DIR, TARGET_COLS, XGB_PARAMS, feature_engineering, load_training_frame,
+    make_training_set, native_params
+)
+from services.forecast_ml.native_inference import NativeEnsemble
+from services.forecast_ml.training_farm import _limit_threads, plan_threads
+
+SEARCH_DIR = os.path.join(MODEL_DIR, 'search')
+CACHE_DIR = os.path.join(SEARCH_DIR, 'cache')
+
+# Không gian tìm kiếm (tham số theo tên của XGB_PARAMS)
+SEARCH_SPACE = {
+    'max_depth': [4, 6, 8, 10],
+    'learning_rate': [0.03, 0.05, 0.1, 0.2],
+    'min_child_weight': [1, 3, 10],
+    'subsample': [0.7, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'reg_lambda': [0.5, 1.0, 5.0],
+}
+# Mỗi rung giữ 1/ETA cấu hình, số cây nhân ETA
+ETA = 3
+# Tỷ lệ validation (phần cuối tập train của train())
+VALID_FRACTION = 0.2
+# Số lần đo độ trễ predict
+LATENCY_REPEAT = 50
+
+
+# ----------------------------------------------------------------------------
+# Dữ liệu
+# ----------------------------------------------------------------------------
+
+def build_cache(cache_dir=CACHE_DIR, province_id=None, use_feature_store=True):
+    """
+    Tải dữ liệu, tạo X / y và ghi {X,y}_{train,valid}.npy + meta.json vào cache_dir.
+
+    Returns:
+        dict meta (feature_cols, số dòng), hoặc None nếu không đủ dữ liệu
+    """
+    conn = connect_to_db()
+    if conn is None:
+        return None
+    try:
+        df, has_features = load_training_frame(conn, province_id=province_id,
+                                               use_feature_store=use_feature_store)
+    finally:
+        conn.close()
+    if df is None or len(df) < 1000:
+        print("❌ Không đủ dữ liệu để tìm hyperparameter")
+        return None
+
+    X, y, feature_cols = (make_training_set if has_features else feature_engineering)(df)
+    # Cùng phép chia với train(): bỏ 20% cuối (tập test), validation là phần cuối còn lại
+    n_train = int(len(X) * 0.8)
+    split = int(n_train * (1 - VALID_FRACTION))
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, part in (('X_train', X.iloc[:split]), ('y_train', y.iloc[:split]),
+                       ('X_valid', X.iloc[split:n_train]), ('y_valid', y.iloc[split:n_train])):
+        np.save(os.path.join(cache_dir, f'{name}.npy'), part.to_numpy(dtype=np.float32))
+
+    meta = {
+        'feature_cols': feature_cols,
+        'n_train': split,
+        'n_valid': n_train - split,
+        'created_at': datetime.now().isoformat(),
+    }
+    with open(os.path.join(cache_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+def read_cache(cache_dir=CACHE_DIR):
+    """meta.json của cache, hoặc None nếu chưa có."""
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def sample_configs(n, seed=42):
+    """n cấu hình khác nhau lấy ngẫu nhiên từ SEARCH_SPACE (cấu hình hiện tại luôn có mặt)."""
+    rng = np.random.default_rng(seed)
+    current = {k: XGB_PARAMS[k] for k in SEARCH_SPACE}
+    configs, seen = [current], {tuple(current.values())}
+    total = math.prod(len(v) for v in SEARCH_SPACE.values())
+    while len(configs) < min(n, total):
+        config = {k: v[rng.integers(len(v))] for k, v in SEARCH_SPACE.items()}
+        key = tuple(config.values())
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def rung_budgets(max_trees, n_configs, eta=ETA):
+    """Số cây mỗi rung: ..., max_trees/eta², max_trees/eta, max_trees."""
+    n_rungs = 1
+    while eta ** n_rungs <= n_configs:
+        n_rungs += 1
+    return [max(1, round(max_trees / eta ** (n_rungs - 1 - i))) for i in range(n_rungs)]
+
+
+# ----------------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------------
+
+# Ma trận đã lượng tử hoá, dựng một lần cho mỗi worker
+_matrices = {}
+
+
+def _load_matrices(cache_dir):
+    if cache_dir not in _matrices:
+        import xgboost as xgb
+
+        arrays = {name: np.load(os.path.join(cache_dir, f'{name}.npy'), mmap_mode='r')
+                  for name in ('X_train', 'y_train', 'X_valid', 'y_valid')}
+        # Chỉ đổi label giữa các target / cấu hình, quantile dựng một lần
+        _matrices[cache_dir] = (xgb.QuantileDMatrix(arrays['X_train'], arrays['y_train'][:, 0]), arrays)
+    return _matrices[cache_dir]
+
+
+def _latency_ms(boosters, row, repeat=LATENCY_REPEAT):
+    """Độ trễ trung vị (ms) khi predict 1 dòng bằng NativeEnsemble 1 luồng."""
+    ensemble = NativeEnsemble(boosters, [f'f{i}' for i in range(row.shape[1])], nthread=1)
+    ensemble.predict(row)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ensemble.predict(row)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def run_trial(trial):
+    """
+    Train một cấu hình tới trial['n_trees'] cây (warm start từ trial['boosters'] nếu có).
+
+    Returns:
+        dict: config_id, n_trees, score (MAE chuẩn hoá), metrics, latency_ms, seconds, boosters
+    """
+    import xgboost as xgb
+
+    dtrain, arrays = _load_matrices(trial['cache_dir'])
+    y_train, y_valid = arrays['y_train'], arrays['y_valid']
+    params = native_params(n_jobs=trial['nthread'])
+    params.update(trial['config'])
+
+    start = time.perf_counter()
+    boosters, metrics = [], {}
+    for i, col in enumerate(TARGET_COLS):
+        dtrain.set_label(y_train[:, i])
+        init = trial['boosters'][i] if trial['boosters'] else None
+        if init is not None:
+            init = xgb.Booster(model_file=bytearray(init))
+        booster = xgb.train(params, dtrain, num_boost_round=trial['n_trees'] - trial['done_trees'],
+                            xgb_model=init, verbose_eval=False)
+        pred = booster.inplace_predict(arrays['X_valid'])
+        mae = float(np.mean(np.abs(pred - y_valid[:, i])))
+        # MAE chuẩn hoá theo độ lệch chuẩn của target để cộng được các đơn vị khác nhau
+        metrics[col] = {'mae': mae, 'nmae': mae / (float(np.std(y_valid[:, i])) or 1.0)}
+        boosters.append(booster)
+    seconds = time.perf_counter() - start
+
+    return {
+        'config_id': trial['config_id'],
+        'n_trees': trial['n_trees'],
+        'score': float(np.mean([m['nmae'] for m in metrics.values()])),
+        'metrics': metrics,
+        'latency_ms': _latency_ms(boosters, np.ascontiguousarray(arrays['X_valid'][:1])),
+        'seconds': round(seconds, 2),
+        'boosters': [bytes(b.save_raw('ubj')) for b in boosters],
+    }
+
+
+# ----------------------------------------------------------------------------
+# Điều phối
+# ----------------------------------------------------------------------------
+
+def pareto_front(results):
+    """Các điểm không bị điểm nào khác vừa chính xác hơn vừa nhanh hơn (sort theo độ trễ)."""
+    front, best_score = [], float('inf')
+    for r in sorted(results, key=lambda r: (r['latency_ms'], r['score'])):
+        if r['score'] < best_score:
+            front.append(r)
+            best_score = r['score']
+    return front
+
+
+def successive_halving(configs, max_trees, cache_dir=CACHE_DIR, workers=None, eta=ETA):
+    """
+    Chạy successive halving trên process pool.
+
+    Returns:
+        (list kết quả mọi (cấu hình, số cây) đã đánh giá, workers, nthread)
+    """
+    budgets = rung_budgets(max_trees, len(configs), eta)
+    workers, nthread = plan_threads(workers, len(configs))
+    print(f"🚀 {len(configs)} cấu hình, rung {budgets} cây, {workers} worker × {nthread} luồng")
+
+    alive = {i: {'done_trees': 0, 'boosters': None} for i in range(len(configs))}
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads,
+                             initargs=(nthread,)) as pool:
+        for rung, n_trees in enumerate(budgets):
+            trials = [{
+                'config_id': i, 'config': configs[i], 'n_trees': n_trees, 'cache_dir': cache_dir,
+                'nthread': nthread, **state,
+            } for i, state in alive.items()]
+            rung_results = list(pool.map(run_trial, trials))
+            for r in rung_results:
+                alive[r['config_id']] = {'done_trees': n_trees, 'boosters': r.pop('boosters')}
+                r['rung'] = rung
+            results.extend(rung_results)
+
+            keep = max(1, len(rung_results) // eta)
+            ranked = sorted(rung_results, key=lambda r: r['score'])
+            print(f"   ✅ Rung {rung} ({n_trees} cây): tốt nhất {ranked[0]['score']:.4f} "
+                  f"(cấu hình {ranked[0]['config_id']}), giữ {keep}/{len(ranked)}")
+            alive = {r['config_id']: alive[r['config_id']] for r in ranked[:keep]}
+    return results, workers, nthread
+
+
+def search(n_configs=27, max_trees=None, workers=None, reuse_cache=False, cache_dir=CACHE_DIR,
+           province_id=None, use_feature_store=True, seed=42):
+    """
+    Tìm hyperparameter và ghi báo cáo SEARCH_DIR/search-*.json.
+
+    Returns:
+        dict báo cáo, hoặc None nếu không có dữ liệu
+    """
+    started = time.perf_counter()
+    max_trees = max_trees or XGB_PARAMS['n_estimators']
+    meta = read_cache(cache_dir) if reuse_cache else None
+    if meta is None:
+        print("📥 Đang tạo cache ma trận train / validation...")
+        meta = build_cache(cache_dir, province_id, use_feature_store)
+        if meta is None:
+            return None
+    print(f"✅ Cache: {meta['n_train']:,} dòng train, {meta['n_valid']:,} dòng validation, "
+          f"{len(meta['feature_cols'])} features")
+
+    configs = sample_configs(n_configs, seed)
+    results, workers, nthread = successive_halving(configs, max_trees, cache_dir, workers)
+    for r in results:
+        r['config'] = configs[r['config_id']]
+        r['accuracy'] = max(0.0, 1 - r['score'])
+        r['accuracy_per_ms'] = r['accuracy'] / max(r['latency_ms'], 1e-6)
+
+    most_accurate = min(results, key=lambda r: r['score'])
+    most_efficient = max(results, key=lambda r: r['accuracy_per_ms'])
+    front = pareto_front(results)
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'workers': workers,
+        'nthread': nthread,
+        'data': meta,
+        'search_space': SEARCH_SPACE,
+        'most_accurate': most_accurate,
+        'most_efficient': most_efficient,
+        'pareto_front': front,
+        'trials': results,
+    }
+    os.makedirs(SEARCH_DIR, exist_ok=True)
+    path = os.path.join(SEARCH_DIR, f"search-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 80)
+    print("📈 BIÊN PARETO (sai số chuẩn hoá ↔ độ trễ predict 1 dòng)")
+    print("=" * 80)
+    print(f"{'Cấu hình':>8} {'Số cây':>7} {'nMAE':>8} {'ms':>8} {'acc/ms':>8}  Tham số")
+    for r in front:
+        params = ', '.join(f'{k}={v}' for k, v in r['config'].items())
+        print(f"{r['config_id']:>8} {r['n_trees']:>7} {r['score']:>8.4f} {r['latency_ms']:>8.3f} "
+              f"{r['accuracy_per_ms']:>8.1f}  {params}")
+    print(f"\n🎯 Chính xác nhất: cấu hình {most_accurate['config_id']} × {most_accurate['n_trees']} cây "
+          f"(nMAE {most_accurate['score']:.4f}, {most_accurate['latency_ms']:.3f} ms)")
+    print(f"⚡ Hiệu quả nhất:  cấu hình {most_efficient['config_id']} × {most_efficient['n_trees']} cây "
+          f"(nMAE {most_efficient['score']:.4f}, {most_efficient['latency_ms']:.3f} ms)")
+    print(f"\n✅ Xong trong {report['wall_seconds']:.1f}s — báo cáo: {path}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Tìm hyperparameter XGBoost (successive halving)')
+    parser.add_argument('--configs', type=int, default=27, help='Số cấu hình ban đầu')
+    parser.add_argument('--max-trees', type=int, help='Số cây ở rung cuối (mặc định XGB_PARAMS)')
+    parser.add_argument('--workers', type=int, help='Số process (mặc định = số CPU)')
+    parser.add_argument('--reuse-cache', action='store_true', help='Dùng lại ma trận đã cache')
+    parser.add_argument('--province_id', type=int, help='Chỉ dùng dữ liệu một tỉnh')
+    parser.add_argument('--from-raw', action='store_true', help='Tính features từ dữ liệu thô')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    report = search(n_configs=args.configs, max_trees=args.max_trees, workers=args.workers,
+                    reuse_cache=args.reuse_cache, province_id=args.province_id,
+                    use_feature_store=not args.from_raw, seed=args.seed)
+    sys.exit(0 if report else 1)
@@ -8,11 +8,13 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import matplotlib.pyplot as plt
 import numpy as np
 
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from machine_learning.model_training import (
-    load_data_for_training, 
+from data_pipeline.data_storage import connect_to_db
+from services.forecast_ml.model_training import (
+    load_training_frame,
+    make_training_set,
     feature_engineering, 
     MODEL_PATH
 )
@@ -40,13 +42,20 @@ def evaluate():
     
     # 3. Tải và xử lý dữ liệu
     print("📊 Đang tải dữ liệu để đánh giá...")
-    df = load_data_for_training()
+    conn = connect_to_db()
+    if conn is None:
+        return False
+    try:
+        # Ưu tiên ma trận features đã tính sẵn trong feature store
+        df, has_features = load_training_frame(conn)
+    finally:
+        conn.close()
     
-    if df.empty:
+    if df is None or df.empty:
         print("❌ Không có dữ liệu để đánh giá")
         return False
     
-    X, y = feature_engineering(df)
+    X, y, _ = make_training_set(df) if has_features else feature_engineering(df)
     
     if X.empty:
         print("❌ Không có features để đánh giá")
@@ -0,0 +1,125 @@
+# services/forecast_ml/model_io.py
+"""
+Lưu / tải mô hình ở định dạng native của XGBoost (UBJSON hoặc JSON).
+
+Một thư mục mô hình native gồm:
+    booster_0.ubj, booster_1.ubj, ...   - mỗi target 1 booster (hoặc 1 booster multi-output)
+    metadata.json                       - feature_cols, số target, thông tin bổ sung
+
+Tải theo cách này không cần unpickle sklearn/joblib, nhanh và nhẹ hơn nhiều so
+với joblib.load() file .pkl.
+"""
+
+import json
+import os
+import sys
+
+METADATA_FILE = 'metadata.json'
+
+
+def boosters_of(model):
+    """Lấy danh sách Booster từ MultiOutputRegressor / XGBRegressor / NativeEnsemble."""
+    if hasattr(model, 'boosters'):
+        return list(model.boosters)
+    if hasattr(model, 'estimators_'):
+        return [est.get_booster() for est in model.estimators_]
+    return [model.get_booster()]
+
+
+def save_model_native(model, feature_cols, model_dir, extra=None, fmt='ubj'):
+    """
+    Lưu mô hình dạng native.
+
+    Args:
+        model: MultiOutputRegressor(XGBRegressor), XGBRegressor hoặc NativeEnsemble
+        feature_cols: Danh sách features
+        model_dir: Thư mục đích (tạo nếu chưa có)
+        extra: Dict thông tin thêm ghi vào metadata (horizons, target_cols, ...)
+        fmt: 'ubj' (nhị phân, mặc định) hoặc 'json'
+
+    Returns:
+        str: Đường dẫn file metadata
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    boosters = boosters_of(model)
+
+    files = []
+    for i, booster in enumerate(boosters):
+        name = f'booster_{i}.{fmt}'
+        booster.save_model(os.path.join(model_dir, name))
+        files.append(name)
+
+    n_targets = len(boosters)
+    if len(boosters) == 1:
+        config = json.loads(boosters[0].save_config())
+        n_targets = int(config['learner']['learner_model_param'].get('num_target', 1))
+
+    metadata = {
+        'format': fmt,
+        'boosters': files,
+        'n_targets': n_targets,
+        'feature_cols': list(feature_cols),
+    }
+    metadata.update(extra or {})
+
+    # Ghi metadata sau cùng: có metadata nghĩa là các booster đã ghi xong
+    path = os.path.join(model_dir, METADATA_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def has_native_model(model_dir):
+    """Thư mục có chứa mô hình native hoàn chỉnh hay không."""
+    return os.path.exists(os.path.join(model_dir, METADATA_FILE))
+
+
+def read_metadata(model_dir):
+    with open(os.path.join(model_dir, METADATA_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_model_native(model_dir, nthread=None):
+    """
+    Tải mô hình native thành NativeEnsemble.
+
+    Returns:
+        (NativeEnsemble, metadata dict)
+    """
+    import xgboost as xgb
+    from services.forecast_ml.native_inference import NativeEnsemble
+
+    metadata = read_metadata(model_dir)
+    boosters = [xgb.Booster(model_file=os.path.join(model_dir, name)) for name in metadata['boosters']]
+    ensemble = NativeEnsemble(
+        boosters, metadata['feature_cols'],
+        n_targets=metadata.get('n_targets'), nthread=nthread
+    )
+    return ensemble, metadata
+
+
+if __name__ == "__main__":
+    import argparse
+    import joblib
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+    parser = argparse.ArgumentParser(description='Chuyển mô hình .pkl sang định dạng native XGBoost')
+    parser.add_argument('pkl_path', help='File mô hình .pkl (joblib)')
+    parser.add_argument('out_dir', help='Thư mục đích')
+    parser.add_argument('--feature-cols', help='File feature_cols.pkl (bỏ qua nếu .pkl là bundle direct)')
+    parser.add_argument('--format', choices=['ubj', 'json'], default='ubj')
+    args = parser.parse_args()
+
+    obj = joblib.load(args.pkl_path)
+    extra = {}
+    if isinstance(obj, dict):
+        # Bundle của chế độ direct
+        model, cols = obj['model'], obj['feature_cols']
+        extra = {k: v for k, v in obj.items() if k not in ('model', 'feature_cols')}
+    else:
+        model, cols = obj, joblib.load(args.feature_cols)
+
+    print(f"✅ Đã lưu: {save_model_native(model, cols, args.out_dir, extra=extra, fmt=args.format)}")
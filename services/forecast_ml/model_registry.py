@@ -0,0 +1,188 @@
+# services/forecast_ml/model_registry.py
+"""
+Registry mô hình có phiên bản.
+
+Cấu trúc thư mục:
+    models/registry/
+        versions/<version>/     - mô hình native (booster_*.ubj) + metadata.json (manifest)
+        active.json             - con trỏ {"recursive": "<version>", "direct": "<version>"}
+
+Mỗi lần train tạo một version mới: ghi vào thư mục tạm rồi rename (atomic), sau
+đó mới đổi con trỏ active.json (cũng bằng os.replace). Tiến trình đang chạy không
+bao giờ đọc phải mô hình ghi dở.
+"""
+
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:   # Windows: không khoá liên tiến trình
+    fcntl = None
+
+from services.forecast_ml.model_io import (
+    has_native_model, load_model_native, read_metadata, save_model_native
+)
+
+REGISTRY_DIR = os.environ.get(
+    'FORECAST_MODEL_REGISTRY',
+    os.path.join(os.path.dirname(__file__), 'models', 'registry')
+)
+ACTIVE_FILE = 'active.json'
+LOCK_FILE = 'active.json.lock'
+
+
+def _versions_dir(registry_dir=None):
+    return os.path.join(registry_dir or REGISTRY_DIR, 'versions')
+
+
+def version_dir(version, registry_dir=None):
+    return os.path.join(_versions_dir(registry_dir), version)
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _active_lock(registry_dir=None):
+    """Khoá độc quyền (flock) quanh đọc-sửa-ghi active.json giữa các tiến trình publish."""
+    root = registry_dir or REGISTRY_DIR
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, LOCK_FILE), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def read_active(registry_dir=None):
+    """Đọc con trỏ active: {mode: version}. Trả về {} nếu chưa có."""
+    path = os.path.join(registry_dir or REGISTRY_DIR, ACTIVE_FILE)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def get_active(mode, registry_dir=None):
+    """Version đang active cho mode ('recursive' / 'direct'), hoặc None."""
+    version = read_active(registry_dir).get(mode)
+    if version and has_native_model(version_dir(version, registry_dir)):
+        return version
+    return None
+
+
+def set_active(mode, version, registry_dir=None):
+    """Chuyển con trỏ active của mode sang version (atomic, giữ nguyên con trỏ của mode khác)."""
+    if not has_native_model(version_dir(version, registry_dir)):
+        raise FileNotFoundError(f"Không tìm thấy version {version}")
+    with _active_lock(registry_dir):
+        active = read_active(registry_dir)
+        active[mode] = version
+        _write_json_atomic(os.path.join(registry_dir or REGISTRY_DIR, ACTIVE_FILE), active)
+
+
+def list_versions(mode=None, registry_dir=None):
+    """Danh sách manifest các version (mới nhất trước)."""
+    root = _versions_dir(registry_dir)
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith('.') or not has_native_model(path):
+            continue
+        manifest = read_metadata(path)
+        if mode is None or manifest.get('mode') == mode:
+            manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m['version'], reverse=True)
+
+
+def publish_version(model, feature_cols, mode, manifest=None, activate=True, registry_dir=None):
+    """
+    Lưu mô hình thành một version mới trong registry.
+
+    Args:
+        model: Mô hình đã train (MultiOutputRegressor / XGBRegressor / NativeEnsemble)
+        feature_cols: Danh sách features
+        mode: 'recursive' hoặc 'direct'
+        manifest: Thông tin thêm (training_range, metrics, horizons, ...)
+        activate: Đổi con trỏ active sang version mới ngay
+
+    Returns:
+        str: Tên version
+    """
+    version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{mode}-{uuid.uuid4().hex[:6]}"
+    versions = _versions_dir(registry_dir)
+    os.makedirs(versions, exist_ok=True)
+
+    extra = dict(manifest or {})
+    extra.update({'version': version, 'mode': mode, 'created_at': datetime.now().isoformat()})
+
+    # Ghi vào thư mục tạm rồi rename: version chỉ xuất hiện khi đã ghi xong
+    tmp_dir = os.path.join(versions, f'.tmp-{version}')
+    try:
+        save_model_native(model, feature_cols, tmp_dir, extra=extra)
+        os.rename(tmp_dir, os.path.join(versions, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if activate:
+        set_active(mode, version, registry_dir)
+    return version
+
+
+def load_version(version, registry_dir=None):
+    """
+    Tải một version.
+
+    Returns:
+        (NativeEnsemble, manifest dict)
+    """
+    return load_model_native(version_dir(version, registry_dir))
+
+
+def active_signature(registry_dir=None):
+    """Dấu hiệu thay đổi rẻ của con trỏ active (mtime_ns, size) để watcher so sánh."""
+    try:
+        st = os.stat(os.path.join(registry_dir or REGISTRY_DIR, ACTIVE_FILE))
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Quản lý registry mô hình dự báo')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='Liệt kê các version')
+    activate_parser = sub.add_parser('activate', help='Đổi version active (rollback/rollout)')
+    activate_parser.add_argument('mode', choices=['recursive', 'direct'])
+    activate_parser.add_argument('version')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        active = read_active()
+        for m in list_versions():
+            mark = '*' if active.get(m['mode']) == m['version'] else ' '
+            rng = m.get('training_range', {})
+            print(f"{mark} {m['version']:<40} {m['mode']:<10} {rng.get('start', '?')} → {rng.get('end', '?')}")
+    else:
+        set_active(args.mode, args.version)
+        print(f"✅ {args.mode} → {args.version}")
@@ -12,7 +12,8 @@ import pandas as pd
 import joblib
 import os
 import sys
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from xgboost import XGBRegressor
 from sklearn.multioutput import MultiOutputRegressor
 from sklearn.model_selection import train_test_split
@@ -20,16 +21,93 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import numpy as np
 
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from data_pipeline.data_forecast.data_storage import connect_to_db
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from data_pipeline.data_storage import connect_to_db
+from data_pipeline.bulk_loader import load_table
+from services.forecast_ml.model_io import save_model_native
+from services.forecast_ml.native_inference import NativeEnsemble
+from services.forecast_ml.model_registry import get_active, load_version, publish_version
+from services.forecast_ml.feature_spec import HISTORY_COLUMNS, MIN_HISTORY
+from services.forecast_ml.feature_store import RAW_FILTER, compute_features, load_feature_matrix
+from services.forecast_ml.sql_features import load_sql_features
 
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'models')
 MODEL_PATH = os.path.join(MODEL_DIR, 'weather_xgboost_multi.pkl')
+DIRECT_MODEL_PATH = os.path.join(MODEL_DIR, 'weather_xgboost_direct.pkl')
+
+# Các horizon (giờ) cho chế độ dự báo trực tiếp: +1…+24, rồi mỗi 12h tới +168
+DIRECT_HORIZONS = list(range(1, 25)) + list(range(36, 169, 12))
+
+TARGET_COLS = [
+    'temperature_2m',           # Nhiệt độ
+    'relative_humidity_2m',     # Độ ẩm
+    'precipitation',            # Lượng mưa
+    'wind_speed_10m',           # Tốc độ gió
+    'pressure_msl',             # Áp suất
+    'cloud_cover'               # Độ phủ mây (thay vì visibility)
+]
+
+# Các cột tải từ weather_data để training
+TRAINING_COLUMNS = ['timestamp', 'province_id'] + HISTORY_COLUMNS
+
+# Các cột không dùng làm feature (ngoài target)
+NON_FEATURE_COLUMNS = [
+    'timestamp', 'province_id', 'weather_code', 
+    'apparent_temperature',  # Đã có temp_humidity_interaction
+    'rain', 'showers',  # Đã có precipitation
+    'wind_direction_10m',  # Direction không quan trọng bằng speed
+    'wind_gusts_10m',  # Đã có wind_roll_max
+    'shortwave_radiation', 'direct_radiation',  # Tương quan cao với sunshine_duration
+    'sunshine_duration',  # Có thể bỏ nếu không cần thiết
+    'uv_index',  # UV có thể tính từ hour và month
+]
+# Cột thô cần cho make_training_set (target + feature thô) khi features tính trên server
+SQL_FEATURE_COLUMNS = [c for c in HISTORY_COLUMNS if c not in NON_FEATURE_COLUMNS]
+
+XGB_PARAMS = dict(
+    n_estimators=1000,          # Số cây quyết định
+    learning_rate=0.05,         # Tốc độ học
+    max_depth=10,               # Độ sâu tối đa của cây
+    subsample=0.8,              # Tỷ lệ mẫu con
+    colsample_bytree=0.8,       # Tỷ lệ feature cho mỗi cây
+    random_state=42,
+    n_jobs=-1,                  # Sử dụng tất cả CPU
+    tree_method='hist',         # Faster training
+    min_child_weight=3,         # Regularization
+    gamma=0.1,                  # Regularization
+    reg_alpha=0.1,              # L1 regularization
+    reg_lambda=1.0,             # L2 regularization
+    verbosity=0,                 # Tắt log của XGBoost
+    enable_categorical=True
+)
+
+# Trainer native: phần cuối tập train (theo thời gian) làm validation cho early stopping
+VALID_FRACTION = 0.1
+EARLY_STOPPING_ROUNDS = 50
+
+# Train tăng dần (incremental_update) từ mô hình active
+INCREMENTAL_TREES = 100     # Số vòng boosting tối đa thêm vào mỗi lần cập nhật
+MIN_NEW_ROWS = 500          # Ít dòng mới hơn thì bỏ qua lần cập nhật
+FULL_RETRAIN_DAYS = 7       # Lần train đầy đủ gần nhất cũ hơn thì train lại từ đầu
+DRIFT_THRESHOLD = 0.25      # MAE trên dữ liệu mới vượt MAE lúc train đầy đủ quá 25% -> train lại
+
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-def load_data_for_training(conn, province_id=None, limit=200000):
+def load_data_for_training(conn, province_id=None, limit=200000, columns=None, since=None,
+                           features=False):
     """
-    Load dữ liệu từ database để training – tối ưu tránh timeout.
+    Load dữ liệu từ database để training – stream bằng COPY vào cột float32/int16.
+    
+    Args:
+        conn: Kết nối psycopg2
+        province_id: Chỉ lấy một tỉnh (None = tất cả)
+        limit: Số bản ghi mới nhất tối đa (None = toàn bộ lịch sử)
+        columns: Danh sách cột cần tải (None = TRAINING_COLUMNS)
+        since: Chỉ lấy bản ghi có timestamp >= since
+        features: True = tính luôn lag/rolling/time/interaction trong PostgreSQL
+                  (sql_features, window function); trả về các cột thô
+                  SQL_FEATURE_COLUMNS (hoặc columns) + FEATURE_NAMES, dùng
+                  thẳng cho make_training_set
     """
 
     # Tắt statement_timeout để tránh query bị kill
@@ -39,47 +117,34 @@ def load_data_for_training(conn, province_id=None, limit=200000):
     except Exception as e:
         print("⚠️ Không thể set statement_timeout:", e)
 
-    # Query (đã tối ưu: không ORDER BY nếu không cần thiết)
-    base_query = """
-        SELECT 
-            timestamp,
-            province_id,
-            temperature_2m,
-            apparent_temperature,
-            relative_humidity_2m,
-            precipitation,
-            rain,
-            showers,
-            cloud_cover,
-            cloud_cover_low,
-            cloud_cover_mid,
-            cloud_cover_high,
-            weather_code,
-            wind_speed_10m,
-            wind_direction_10m,
-            wind_gusts_10m,
-            pressure_msl,
-            shortwave_radiation,
-            direct_radiation,
-            uv_index,
-            sunshine_duration
-        FROM weather_data
-        WHERE temperature_2m IS NOT NULL
-        AND pressure_msl IS NOT NULL
-    """
-
     # Điều kiện lọc
+    where = RAW_FILTER
     params = []
     if province_id:
-        base_query += " AND province_id = %s"
+        where += " AND province_id = %s"
         params.append(province_id)
+    if since is not None:
+        where += ' AND "timestamp" >= %s'
+        params.append(since)
 
     # Order theo timestamp DESC để lấy dữ liệu mới nhất
-    final_query = base_query + " ORDER BY timestamp DESC LIMIT %s"
-    params.append(limit)
-
     print("⏳ Đang chạy query, vui lòng đợi...")
-    df = pd.read_sql(final_query, conn, params=params)
+    if features:
+        start = time.perf_counter()
+        try:
+            df = load_sql_features(conn, columns or SQL_FEATURE_COLUMNS, where=where,
+                                   params=params, limit=limit)
+        except Exception as e:
+            print(f"LỖI khi tính features trong PostgreSQL: {e}")
+            conn.rollback()
+            return None
+        print(f"✅ Features (window function): {df.shape[1]} cột, "
+              f"{df.memory_usage(deep=False).sum() / 1e6:.1f} MB trong {time.perf_counter() - start:.2f}s")
+    else:
+        df = load_table(conn, 'weather_data', columns=columns or TRAINING_COLUMNS, where=where,
+                        params=params, order_by='"timestamp" DESC', limit=limit)
+    if df is None:
+        return None
 
     print(f"✅ Đã tải {len(df)} bản ghi.")
 
@@ -92,13 +157,15 @@ def load_data_for_training(conn, province_id=None, limit=200000):
     return df
 
 
-def feature_engineering(df):
+def feature_engineering(df, horizons=None):
     """
     Tạo features cho model
     Bao gồm: lag features, rolling features, time features
     
     Args:
         df: DataFrame từ database
+        horizons: None = target 1 giờ tới ({col}_next);
+                  list giờ = target trực tiếp {col}_h{h} cho từng horizon
     
     Returns:
         X: Features
@@ -107,158 +174,53 @@ def feature_engineering(df):
     """
     print("\n🔧 Đang tạo features...")
     
-    df = df.sort_values(['province_id', 'timestamp'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
-    # Fill missing values với giá trị hợp lý
-    fill_values = {
-        'apparent_temperature': df['temperature_2m'],  # Nếu thiếu thì dùng temp thường
-        'precipitation': 0,
-        'rain': 0,
-        'showers': 0,
-        'cloud_cover': 50,
-        'cloud_cover_low': 0,
-        'cloud_cover_mid': 0,
-        'cloud_cover_high': 0,
-        'wind_gusts_10m': df['wind_speed_10m'],  # Nếu thiếu gust thì dùng wind speed
-        'shortwave_radiation': 0,
-        'direct_radiation': 0,
-        'uv_index': 0,
-        'sunshine_duration': 0,
-        'weather_code': 1
-    }
-    
-    for col, default_val in fill_values.items():
-        if col in df.columns:
-            df[col].fillna(default_val, inplace=True)
-    
-    # =========================================================================
-    # LAG FEATURES - Dữ liệu từ các giờ trước
-    # =========================================================================
-    print("   📌 Tạo lag features...")
-    lags = [1, 2, 3, 6, 12, 24]  # 1h, 2h, 3h, 6h, 12h, 24h trước
-    
-    lag_cols = [
-        'temperature_2m',
-        'relative_humidity_2m', 
-        'wind_speed_10m',
-        'pressure_msl',
-        'precipitation',
-        'cloud_cover'
-    ]
-    
-    for lag in lags:
-        for col in lag_cols:
-            if col in df.columns:
-                df[f'{col}_lag{lag}'] = df.groupby('province_id')[col].shift(lag)
-    
-    # =========================================================================
-    # ROLLING FEATURES - Trung bình trượt
-    # =========================================================================
-    print("   📌 Tạo rolling features...")
-    rolls = [3, 6, 24]  # 3h, 6h, 24h
-    
-    for w in rolls:
-        # Temperature
-        df[f'temp_roll_mean_{w}'] = df.groupby('province_id')['temperature_2m'].transform(
-            lambda x: x.rolling(w, min_periods=1).mean()
-        )
-        df[f'temp_roll_std_{w}'] = df.groupby('province_id')['temperature_2m'].transform(
-            lambda x: x.rolling(w, min_periods=1).std()
-        )
-        df[f'temp_roll_min_{w}'] = df.groupby('province_id')['temperature_2m'].transform(
-            lambda x: x.rolling(w, min_periods=1).min()
-        )
-        df[f'temp_roll_max_{w}'] = df.groupby('province_id')['temperature_2m'].transform(
-            lambda x: x.rolling(w, min_periods=1).max()
-        )
-        
-        # Precipitation - Tổng lượng mưa
-        df[f'precip_roll_sum_{w}'] = df.groupby('province_id')['precipitation'].transform(
-            lambda x: x.rolling(w, min_periods=1).sum()
-        )
-        
-        # Humidity
-        df[f'humidity_roll_mean_{w}'] = df.groupby('province_id')['relative_humidity_2m'].transform(
-            lambda x: x.rolling(w, min_periods=1).mean()
-        )
-        
-        # Pressure
-        df[f'pressure_roll_mean_{w}'] = df.groupby('province_id')['pressure_msl'].transform(
-            lambda x: x.rolling(w, min_periods=1).mean()
-        )
-        
-        # Wind
-        df[f'wind_roll_mean_{w}'] = df.groupby('province_id')['wind_speed_10m'].transform(
-            lambda x: x.rolling(w, min_periods=1).mean()
-        )
-        df[f'wind_roll_max_{w}'] = df.groupby('province_id')['wind_speed_10m'].transform(
-            lambda x: x.rolling(w, min_periods=1).max()
-        )
-    
     # =========================================================================
-    # TIME FEATURES - Đặc trưng thời gian
+    # FEATURES - lag, rolling, time, interaction theo feature_spec
     # =========================================================================
-    print("   📌 Tạo time features...")
-    df['hour'] = df['timestamp'].dt.hour
-    df['dayofweek'] = df['timestamp'].dt.dayofweek
-    df['month'] = df['timestamp'].dt.month
-    df['day'] = df['timestamp'].dt.day
-    df['is_weekend'] = (df['dayofweek'] >= 5).astype(int)
-    
-    # Season (mùa)
-    df['season'] = df['month'].map({
-        12: 0, 1: 0, 2: 0,  # Đông
-        3: 1, 4: 1, 5: 1,   # Xuân
-        6: 2, 7: 2, 8: 2,   # Hè
-        9: 3, 10: 3, 11: 3  # Thu
-    })
+    # Cùng đặc tả với FeatureState lúc serving và với các dòng trong feature
+    # store: mỗi dòng là anchor t, lag k là dòng t-k, cửa sổ rolling kết thúc
+    # tại t, time features lấy từ timestamp t
+    print("   📌 Tạo lag + rolling + time + interaction features...")
+    df = compute_features(df)
     
-    # Time of day (buổi trong ngày)
-    df['time_of_day'] = pd.cut(
-        df['hour'],
-        bins=[0, 6, 12, 18, 24],
-        labels=[0, 1, 2, 3],
-        include_lowest=True
-    ).astype(int)   
+    return make_training_set(df, horizons)
 
+def make_training_set(df, horizons=None):
+    """
+    Tạo target, bỏ dòng thiếu và tách X / y từ các dòng đã có features
+    (kết quả compute_features hoặc load_feature_matrix)
     
-    # =========================================================================
-    # INTERACTION FEATURES - Tương tác giữa các biến
-    # =========================================================================
-    print("   📌 Tạo interaction features...")
-    
-    # Nhiệt độ x Độ ẩm (cảm giác oi bức)
-    df['temp_humidity_interaction'] = df['temperature_2m'] * df['relative_humidity_2m'] / 100
-    
-    # Nhiệt độ x Gió (cảm giác lạnh do gió)
-    df['temp_wind_interaction'] = df['temperature_2m'] * df['wind_speed_10m']
-    
-    # Áp suất x Độ ẩm (khả năng mưa)
-    df['pressure_humidity_interaction'] = df['pressure_msl'] * df['relative_humidity_2m'] / 100
-    
-    # Cloud cover total (tổng độ che phủ mây)
-    if all(col in df.columns for col in ['cloud_cover_low', 'cloud_cover_mid', 'cloud_cover_high']):
-        df['cloud_cover_total'] = df['cloud_cover_low'] + df['cloud_cover_mid'] + df['cloud_cover_high']
+    Args:
+        df: DataFrame đã sort theo (province_id, timestamp) có đủ features
+        horizons: None = target 1 giờ tới ({col}_next);
+                  list giờ = target trực tiếp {col}_h{h} cho từng horizon
     
+    Returns:
+        X, y, feature_cols
+    """
     # =========================================================================
-    # TARGET VARIABLES - Dự đoán 1 giờ tới
+    # TARGET VARIABLES - Dự đoán 1 giờ tới (hoặc nhiều horizon)
     # =========================================================================
     print("   📌 Tạo target variables...")
     
-    target_cols = [
-        'temperature_2m',           # Nhiệt độ
-        'relative_humidity_2m',     # Độ ẩm
-        'precipitation',            # Lượng mưa
-        'wind_speed_10m',           # Tốc độ gió
-        'pressure_msl',             # Áp suất
-        'cloud_cover'               # Độ phủ mây (thay vì visibility)
-    ]
+    target_cols = TARGET_COLS
     
-    # Tạo target cho 1 giờ tới
-    for col in target_cols:
-        if col in df.columns:
-            df[f'{col}_next'] = df.groupby('province_id')[col].shift(-1)
+    if horizons is None:
+        # Tạo target cho 1 giờ tới
+        target_cols_next = [f'{c}_next' for c in target_cols]
+        grouped = df.groupby('province_id', observed=True)
+        df = pd.concat([df, pd.DataFrame({
+            f'{col}_next': grouped[col].shift(-1)
+            for col in target_cols if col in df.columns
+        }, index=df.index)], axis=1)
+    else:
+        # Target trực tiếp cho từng horizon, thứ tự [h][target]
+        target_cols_next = [f'{c}_h{h}' for h in horizons for c in target_cols]
+        grouped = df.groupby('province_id', observed=True)
+        df = pd.concat([df, pd.DataFrame({
+            f'{col}_h{h}': grouped[col].shift(-h)
+            for h in horizons for col in target_cols
+        }, index=df.index)], axis=1)
     
     # =========================================================================
     # DROP ROWS WITH MISSING VALUES
@@ -273,19 +235,9 @@ def feature_engineering(df):
     # SELECT FEATURES AND TARGETS
     # =========================================================================
     # Các cột không dùng làm feature
-    exclude_cols = [
-        'timestamp', 'province_id', 'weather_code', 
-        'apparent_temperature',  # Đã có temp_humidity_interaction
-        'rain', 'showers',  # Đã có precipitation
-        'wind_direction_10m',  # Direction không quan trọng bằng speed
-        'wind_gusts_10m',  # Đã có wind_roll_max
-        'shortwave_radiation', 'direct_radiation',  # Tương quan cao với sunshine_duration
-        'sunshine_duration',  # Có thể bỏ nếu không cần thiết
-        'uv_index',  # UV có thể tính từ hour và month
-    ] + target_cols + [f'{c}_next' for c in target_cols]
+    exclude_cols = NON_FEATURE_COLUMNS + target_cols + target_cols_next
     
     feature_cols = [col for col in df.columns if col not in exclude_cols]
-    target_cols_next = [f'{c}_next' for c in target_cols]
     
     X = df[feature_cols]
     y = df[target_cols_next]
@@ -297,19 +249,212 @@ def feature_engineering(df):
     
     return X, y, feature_cols
 
-def train(province_id=None, save_path=MODEL_PATH):
+def load_training_frame(conn, province_id=None, limit=500000, use_feature_store=True, since=None,
+                        sql_features=False):
+    """
+    Dữ liệu cho training / evaluation: ưu tiên ma trận features trong feature
+    store, fallback về dữ liệu thô
+    
+    Args:
+        since: Chỉ cần các anchor có timestamp > since (dữ liệu thô được tải thêm
+               MIN_HISTORY giờ trước đó làm ngữ cảnh cho lag/rolling)
+        sql_features: Khi không đọc feature store, tính features bằng window
+               function trong PostgreSQL thay vì tải dữ liệu thô về pandas
+    
+    Returns:
+        (DataFrame hoặc None, True nếu DataFrame đã có features)
+    """
+    if use_feature_store:
+        df = load_feature_matrix(conn, province_id=province_id, limit=limit, since=since)
+        if df is not None:
+            print(f"✅ Đã tải {len(df)} dòng features từ feature store.")
+            return df, True
+        print("⚠️  Feature store trống, tính features từ dữ liệu thô")
+    if since is not None:
+        since = pd.Timestamp(since) - timedelta(hours=MIN_HISTORY)
+    df = load_data_for_training(conn, province_id=province_id, limit=limit, since=since,
+                                features=sql_features)
+    return df, sql_features and df is not None
+
+def _dump_atomic(obj, path):
+    """joblib.dump vào file tạm rồi os.replace: tiến trình khác không đọc phải file ghi dở"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def build_model(direct=False, n_jobs=None):
+    """
+    Mô hình XGBoost chưa train với XGB_PARAMS
+    
+    Args:
+        direct: True = 1 booster multi-output cho mọi horizon
+        n_jobs: Số luồng XGBoost (mặc định theo XGB_PARAMS: mọi CPU)
+    """
+    params = dict(XGB_PARAMS)
+    if n_jobs is not None:
+        params['n_jobs'] = n_jobs
+    if direct:
+        # 1 booster với lá multi-output cho 6 × len(horizons) target:
+        # serving chỉ cần 1 lần predict thay vì 168 bước lặp
+        return XGBRegressor(multi_strategy='multi_output_tree', **params)
+    return MultiOutputRegressor(XGBRegressor(**params))
+
+def native_params(direct=False, n_jobs=None):
+    """XGB_PARAMS theo tên tham số của xgb.train (bỏ các tham số chỉ có ở sklearn)"""
+    params = {k: v for k, v in XGB_PARAMS.items()
+              if k not in ('n_estimators', 'random_state', 'n_jobs', 'enable_categorical')}
+    params.update(
+        objective='reg:squarederror',
+        seed=XGB_PARAMS['random_state'],
+        nthread=XGB_PARAMS['n_jobs'] if n_jobs is None else n_jobs
+    )
+    if direct:
+        params['multi_strategy'] = 'multi_output_tree'
+    return params
+
+def train_native(X_train, y_train, direct=False, n_jobs=None, valid_fraction=VALID_FRACTION,
+                 early_stopping_rounds=EARLY_STOPPING_ROUNDS, init_boosters=None, num_rounds=None):
+    """
+    Train bằng xgb.train trên QuantileDMatrix dựng MỘT lần từ X_train
+    (MultiOutputRegressor dựng lại histogram cho từng XGBRegressor).
+    
+    - direct: 1 booster lá multi-output cho mọi cột target
+    - recursive: mỗi target 1 booster, dùng chung ma trận đã lượng tử hoá (chỉ đổi
+      label), early stopping riêng: nhiệt độ cần nhiều vòng hơn lượng mưa
+    
+    Early stopping trên VALID_FRACTION dòng cuối của tập train (giữ thứ tự thời
+    gian, tập test không bị nhìn thấy); booster được cắt còn số vòng tốt nhất.
+    
+    Args:
+        X_train: DataFrame features (đã sort theo thời gian)
+        y_train: DataFrame / mảng target (n, n_targets)
+        direct: True = lá multi-output (mode direct)
+        n_jobs: Số luồng (mặc định theo XGB_PARAMS)
+        init_boosters: Booster hiện có để train tiếp (warm start, cùng thứ tự target)
+        num_rounds: Số vòng boosting tối đa (thêm vào) — mặc định XGB_PARAMS['n_estimators']
+    
+    Returns:
+        (NativeEnsemble, list tổng số vòng boosting giữ lại của từng booster)
+    """
+    import xgboost as xgb
+    
+    y_train = np.asarray(y_train, dtype=np.float32)
+    n_valid = int(len(X_train) * valid_fraction)
+    split = len(X_train) - n_valid
+    num_rounds = num_rounds or XGB_PARAMS['n_estimators']
+    
+    labels = [y_train] if direct else [y_train[:, i] for i in range(y_train.shape[1])]
+    
+    dtrain = xgb.QuantileDMatrix(X_train.iloc[:split], labels[0][:split], enable_categorical=True)
+    dvalid = None
+    if n_valid > 0:
+        dvalid = xgb.QuantileDMatrix(X_train.iloc[split:], labels[0][split:], ref=dtrain,
+                                     enable_categorical=True)
+    
+    params = native_params(direct, n_jobs)
+    boosters, rounds = [], []
+    for i, label in enumerate(labels):
+        dtrain.set_label(label[:split])
+        evals, stopping = [], None
+        if dvalid is not None:
+            dvalid.set_label(label[split:])
+            evals, stopping = [(dvalid, 'valid')], early_stopping_rounds
+        booster = xgb.train(params, dtrain, num_boost_round=num_rounds, evals=evals,
+                            early_stopping_rounds=stopping, verbose_eval=False,
+                            xgb_model=init_boosters[i] if init_boosters else None)
+        # best_iteration tính cả các vòng của booster ban đầu
+        n_rounds = booster.best_iteration + 1 if stopping else booster.num_boosted_rounds()
+        boosters.append(booster[:n_rounds])
+        rounds.append(n_rounds)
+    
+    return NativeEnsemble(boosters, list(X_train.columns), n_targets=y_train.shape[1]), rounds
+
+def peak_rss_mb():
+    """RSS đỉnh của process (MB)"""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def target_metrics(y_test, pred):
+    """MAE / RMSE / R² cho 6 target (với mode direct: 6 cột đầu = horizon +1h)"""
+    y_test = np.asarray(y_test)
+    pred = np.asarray(pred)
+    metrics = {}
+    for i, col in enumerate(TARGET_COLS):
+        metrics[col] = {
+            'mae': float(mean_absolute_error(y_test[:, i], pred[:, i])),
+            'rmse': float(np.sqrt(mean_squared_error(y_test[:, i], pred[:, i]))),
+            'r2': float(r2_score(y_test[:, i], pred[:, i])),
+        }
+    return metrics
+
+def save_model_files(model, feature_cols, save_path, mode='recursive', horizons=None, model_format='both'):
+    """
+    Lưu mô hình ra save_path (.pkl) và/hoặc thư mục native cùng tên
+    
+    Args:
+        model_format: 'pickle', 'native' hoặc 'both'
+    """
+    direct = mode == 'direct'
+    if model_format in ('pickle', 'both'):
+        if direct:
+            # Lưu kèm horizon để predictor biết cách giải mã output
+            _dump_atomic({
+                'model': model,
+                'horizons': horizons,
+                'target_cols': TARGET_COLS,
+                'feature_cols': feature_cols
+            }, save_path)
+        else:
+            _dump_atomic(model, save_path)
+        _dump_atomic(feature_cols, os.path.join(MODEL_DIR, 'feature_cols.pkl'))
+        print(f"✅ Đã lưu mô hình tại: {save_path}")
+        print(f"✅ Đã lưu feature columns tại: {os.path.join(MODEL_DIR, 'feature_cols.pkl')}")
+    
+    if model_format in ('native', 'both'):
+        # Định dạng native: predictor tải không cần joblib/sklearn
+        native_dir = os.path.splitext(save_path)[0]
+        extra = {'target_cols': TARGET_COLS, 'mode': mode}
+        if direct:
+            extra['horizons'] = horizons
+        save_model_native(model, feature_cols, native_dir, extra=extra)
+        print(f"✅ Đã lưu mô hình native tại: {native_dir}/")
+
+def train(province_id=None, save_path=None, mode='recursive', model_format='both', publish=None,
+          use_feature_store=True, trainer='sklearn', sql_features=False, limit=500000):
     """
     Huấn luyện mô hình XGBoost Multi-Output
     
     Args:
         province_id: Nếu None thì train cho tất cả tỉnh, nếu có giá trị thì chỉ train cho tỉnh đó
-        save_path: Đường dẫn lưu model
+        save_path: Đường dẫn lưu model (mặc định theo mode)
+        mode: 'recursive' - dự đoán 1 giờ tới, serving lặp 168 bước;
+              'direct'    - dự đoán trực tiếp các horizon DIRECT_HORIZONS
+        model_format: 'pickle' (.pkl joblib), 'native' (UBJSON + metadata.json
+              trong thư mục cùng tên với save_path) hoặc 'both'
+        publish: Đăng version mới lên registry và đổi con trỏ active (server đang
+              chạy tự hoán đổi). Mặc định chỉ khi train mô hình chung (toàn bộ tỉnh)
+        use_feature_store: Đọc features đã tính sẵn từ feature store (fallback
+              về dữ liệu thô nếu store trống)
+        trainer: 'sklearn' - XGBRegressor qua MultiOutputRegressor, đủ n_estimators cây;
+                 'native'  - xgb.train trên QuantileDMatrix + early stopping (train_native)
+        sql_features: Tính features trong PostgreSQL (window function) khi không
+              đọc feature store
+        limit: Số bản ghi mới nhất dùng để train (None = toàn bộ lịch sử)
     
     Returns:
         bool: True nếu thành công, False nếu thất bại
     """
+    direct = mode == 'direct'
+    horizons = DIRECT_HORIZONS if direct else None
+    if publish is None:
+        publish = province_id is None and save_path is None
+    if save_path is None:
+        save_path = DIRECT_MODEL_PATH if direct else MODEL_PATH
+    
     print("\n" + "="*80)
     print("🚀 BẮT ĐẦU HUẤN LUYỆN MÔ HÌNH XGBOOST MULTI-OUTPUT")
+    if direct:
+        print(f"   Chế độ: DIRECT ({len(horizons)} horizon: +{horizons[0]}h … +{horizons[-1]}h)")
     print("="*80)
     
     # =========================================================================
@@ -317,8 +462,14 @@ def train(province_id=None, save_path=MODEL_PATH):
     # =========================================================================
     print("\n[BƯỚC 1/5] 📥 Đang tải dữ liệu từ database...")
     conn = connect_to_db() 
-    df = load_data_for_training(conn, province_id=province_id, limit=500000)
-    conn.close()
+    if conn is None:
+        return False
+    try:
+        df, has_features = load_training_frame(conn, province_id=province_id, limit=limit,
+                                               use_feature_store=use_feature_store,
+                                               sql_features=sql_features)
+    finally:
+        conn.close()
     if df is None or len(df) < 1000:
         print("\n❌ THẤT BẠI: Không đủ dữ liệu để huấn luyện (cần ít nhất 1000 bản ghi)")
         print("💡 Vui lòng chạy data collection để thu thập dữ liệu:")
@@ -330,7 +481,10 @@ def train(province_id=None, save_path=MODEL_PATH):
     # =========================================================================
     print("\n[BƯỚC 2/5] 🔧 Đang xử lý và tạo features...")
     try:
-        X, y, feature_cols = feature_engineering(df)
+        if has_features:
+            X, y, feature_cols = make_training_set(df, horizons=horizons)
+        else:
+            X, y, feature_cols = feature_engineering(df, horizons=horizons)
     except Exception as e:
         print(f"\n❌ THẤT BẠI: Lỗi khi tạo features: {e}")
         import traceback
@@ -362,27 +516,19 @@ def train(province_id=None, save_path=MODEL_PATH):
     print("\n[BƯỚC 4/5] 🤖 Đang huấn luyện mô hình XGBoost...")
     print("   ⏳ Quá trình này có thể mất vài phút...")
     
-    model = MultiOutputRegressor(
-        XGBRegressor(
-            n_estimators=1000,          # Số cây quyết định
-            learning_rate=0.05,         # Tốc độ học
-            max_depth=10,               # Độ sâu tối đa của cây
-            subsample=0.8,              # Tỷ lệ mẫu con
-            colsample_bytree=0.8,       # Tỷ lệ feature cho mỗi cây
-            random_state=42,
-            n_jobs=-1,                  # Sử dụng tất cả CPU
-            tree_method='hist',         # Faster training
-            min_child_weight=3,         # Regularization
-            gamma=0.1,                  # Regularization
-            reg_alpha=0.1,              # L1 regularization
-            reg_lambda=1.0,             # L2 regularization
-            verbosity=0,                 # Tắt log của XGBoost
-            enable_categorical=True
-        )
-    )
+    native = trainer == 'native'
+    xgb_params = native_params(direct) if native else dict(XGB_PARAMS)
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
     
     try:
-        model.fit(X_train, y_train)
+        if native:
+            model, n_rounds = train_native(X_train, y_train, direct)
+            print(f"   ✅ Early stopping: số vòng boosting {n_rounds} (tối đa {XGB_PARAMS['n_estimators']})")
+        else:
+            model = build_model(direct)
+            model.fit(X_train, y_train)
+            n_rounds = [XGB_PARAMS['n_estimators']] * (1 if direct else len(TARGET_COLS))
         print("   ✅ Hoàn thành huấn luyện!")
     except Exception as e:
         print(f"\n❌ THẤT BẠI: Lỗi khi train model: {e}")
@@ -390,6 +536,15 @@ def train(province_id=None, save_path=MODEL_PATH):
         traceback.print_exc()
         return False
     
+    training = {
+        'trainer': trainer,
+        'seconds': round(time.perf_counter() - start, 2),
+        'n_rounds': n_rounds,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    print(f"   ⏱️  Thời gian train: {training['seconds']:.1f}s")
+    print(f"   🧠 RSS đỉnh: {training['peak_rss_mb']:.0f}MB (trước khi train: {rss_before:.0f}MB)")
+    
     # =========================================================================
     # 5. EVALUATE MODEL
     # =========================================================================
@@ -412,15 +567,15 @@ def train(province_id=None, save_path=MODEL_PATH):
     
     print("\n" + "="*80)
     print("📈 KẾT QUẢ ĐÁNH GIÁ MÔ HÌNH (Dự đoán 1 giờ tới)")
+    # Với mode direct, 6 cột đầu tiên là horizon +1h
     print("="*80)
     
     overall_score = 0
     scores = []
+    metrics = target_metrics(y_test, pred)
     
     for i, name in enumerate(target_names):
-        mae = mean_absolute_error(y_test.iloc[:, i], pred[:, i])
-        rmse = np.sqrt(mean_squared_error(y_test.iloc[:, i], pred[:, i]))
-        r2 = r2_score(y_test.iloc[:, i], pred[:, i])
+        mae, rmse, r2 = (metrics[TARGET_COLS[i]][k] for k in ('mae', 'rmse', 'r2'))
         
         print(f"\n{name}:")
         print(f"   • MAE:  {mae:.3f}")
@@ -443,6 +598,16 @@ def train(province_id=None, save_path=MODEL_PATH):
     
     overall_score = np.mean(scores)
     
+    if direct:
+        # Sai số nhiệt độ theo horizon (thấy rõ sai số tăng dần theo thời gian)
+        print("\n🌡️  MAE nhiệt độ theo horizon:")
+        y_true = y_test.to_numpy().reshape(len(y_test), len(horizons), len(TARGET_COLS))
+        y_pred = np.asarray(pred).reshape(y_true.shape)
+        for hi, h in enumerate(horizons):
+            if h in (1, 6, 12, 24, 48, 72, 120, 168):
+                mae = mean_absolute_error(y_true[:, hi, 0], y_pred[:, hi, 0])
+                print(f"   • +{h:>3}h: {mae:.3f}")
+    
     # =========================================================================
     # 6. SAVE MODEL
     # =========================================================================
@@ -450,10 +615,29 @@ def train(province_id=None, save_path=MODEL_PATH):
     print("💾 ĐANG LƯU MÔ HÌNH...")
     
     try:
-        joblib.dump(model, save_path)
-        joblib.dump(feature_cols, os.path.join(MODEL_DIR, 'feature_cols.pkl'))
-        print(f"✅ Đã lưu mô hình tại: {save_path}")
-        print(f"✅ Đã lưu feature columns tại: {os.path.join(MODEL_DIR, 'feature_cols.pkl')}")
+        save_model_files(model, feature_cols, save_path, mode, horizons, model_format)
+        
+        if publish:
+            manifest = {
+                'target_cols': TARGET_COLS,
+                'province_id': province_id,
+                'training_range': {
+                    'start': pd.Timestamp(df['timestamp'].min()).isoformat(),
+                    'end': pd.Timestamp(df['timestamp'].max()).isoformat(),
+                },
+                # Anchor cuối cùng đã có target: incremental_update train tiếp từ đây
+                'watermark': pd.Timestamp(df.loc[X.index, 'timestamp'].max()).isoformat(),
+                'last_full_train': datetime.now().isoformat(),
+                'n_train': len(X_train),
+                'n_test': len(X_test),
+                'metrics': metrics,
+                'xgb_params': xgb_params,
+                'training': training,
+            }
+            if direct:
+                manifest['horizons'] = horizons
+            version = publish_version(model, feature_cols, mode, manifest=manifest)
+            print(f"✅ Đã đăng version {version} lên registry (active)")
     except Exception as e:
         print(f"❌ Lỗi khi lưu model: {e}")
         return False
@@ -465,6 +649,8 @@ def train(province_id=None, save_path=MODEL_PATH):
     print("🎯 TỔNG KẾT")
     print("="*80)
     print(f"Điểm trung bình: {overall_score:.2f}/3.0")
+    print(f"Trainer: {trainer} — {training['seconds']:.1f}s, {sum(training['n_rounds'])} vòng boosting, "
+          f"RSS đỉnh {training['peak_rss_mb']:.0f}MB")
     
     if overall_score >= 2.5:
         print("\n🌟🌟🌟 MÔ HÌNH XUẤT SẮC - ĐỘ TIN CẬY RẤT CAO!")
@@ -506,16 +692,160 @@ def retrain_for_province(province_id):
     model_path = os.path.join(MODEL_DIR, f'weather_xgboost_province_{province_id}.pkl')
     return train(province_id=province_id, save_path=model_path)
 
+# Khoá của metadata do save_model_native / publish_version tự ghi
+_STRUCTURAL_KEYS = ('format', 'boosters', 'n_targets', 'feature_cols', 'version', 'mode', 'created_at')
+
+def _drift_ratio(metrics, reference):
+    """Trung bình MAE hiện tại / MAE tham chiếu trên các target"""
+    ratios = [metrics[col]['mae'] / reference[col]['mae']
+              for col in TARGET_COLS if reference.get(col, {}).get('mae')]
+    return float(np.mean(ratios)) if ratios else 0.0
+
+def incremental_update(mode='recursive', max_new_trees=INCREMENTAL_TREES, drift_threshold=DRIFT_THRESHOLD,
+                       use_feature_store=True, model_format='both'):
+    """
+    Train tiếp mô hình active trên dữ liệu mới hơn watermark (warm start)
+    
+    Mỗi booster của version active được thêm tối đa max_new_trees vòng boosting
+    (early stopping trên phần cuối dữ liệu mới), rồi đăng version mới với watermark
+    mới. VALID_FRACTION giờ mới nhất được giữ riêng (không train, không early
+    stopping) để so MAE trước / sau trên cùng các dòng. Tự chuyển sang train() đầy đủ khi:
+        - chưa có version active, hoặc manifest không có watermark
+        - lần train đầy đủ gần nhất cũ hơn FULL_RETRAIN_DAYS ngày
+        - MAE của mô hình active trên dữ liệu mới vượt MAE lúc train đầy đủ
+          quá drift_threshold (trung bình trên các target)
+    
+    Returns:
+        bool: True nếu thành công (kể cả khi chưa đủ dữ liệu mới để cập nhật)
+    """
+    direct = mode == 'direct'
+    horizons = DIRECT_HORIZONS if direct else None
+    
+    def full_retrain(reason):
+        print(f"🔁 Train lại từ đầu: {reason}")
+        return train(mode=mode, model_format=model_format, use_feature_store=use_feature_store,
+                     trainer='native')
+    
+    print("\n" + "="*80)
+    print(f"🚀 CẬP NHẬT TĂNG DẦN MÔ HÌNH ({mode.upper()})")
+    print("="*80)
+    
+    version = get_active(mode)
+    if version is None:
+        return full_retrain("chưa có version active")
+    base, manifest = load_version(version)
+    watermark = manifest.get('watermark')
+    if watermark is None:
+        return full_retrain(f"version {version} không có watermark")
+    last_full = pd.Timestamp(manifest.get('last_full_train') or manifest['created_at'])
+    if datetime.now() - last_full > timedelta(days=FULL_RETRAIN_DAYS):
+        return full_retrain(f"lần train đầy đủ gần nhất {last_full:%Y-%m-%d} đã quá {FULL_RETRAIN_DAYS} ngày")
+    watermark = pd.Timestamp(watermark)
+    print(f"   • Version active: {version} (watermark {watermark})")
+    
+    conn = connect_to_db()
+    if conn is None:
+        return False
+    try:
+        df, has_features = load_training_frame(conn, use_feature_store=use_feature_store, since=watermark)
+    finally:
+        conn.close()
+    if df is None:
+        print("✅ Không có dữ liệu mới")
+        return True
+    
+    X, y, feature_cols = (make_training_set if has_features else feature_engineering)(df, horizons=horizons)
+    anchors = df.loc[X.index, 'timestamp']
+    # Chỉ anchor sau watermark, xếp theo thời gian để phần validation là giờ mới nhất
+    order = np.flatnonzero((anchors > watermark).to_numpy())
+    order = order[np.argsort(anchors.to_numpy()[order], kind='stable')]
+    X, y, anchors = X.iloc[order], y.iloc[order], anchors.iloc[order]
+    if len(X) < MIN_NEW_ROWS:
+        print(f"✅ Mới có {len(X)} dòng sau watermark (cần {MIN_NEW_ROWS}), chưa cập nhật")
+        return True
+    if set(base.feature_cols) - set(feature_cols):
+        return full_retrain("danh sách features đã thay đổi")
+    X = X[base.feature_cols]
+    
+    # Sai số của mô hình active trên dữ liệu nó chưa thấy
+    drift = _drift_ratio(target_metrics(y, base.predict(X)), manifest.get('metrics', {}))
+    print(f"   • {len(X):,} dòng mới — MAE / MAE lúc train đầy đủ: {drift:.2f}")
+    if drift > 1 + drift_threshold:
+        return full_retrain(f"sai số trên dữ liệu mới tăng {drift - 1:.0%} (ngưỡng {drift_threshold:.0%})")
+    
+    # Tập holdout: giờ mới nhất, train_native không thấy (nó early stopping trên phần cuối của X_fit)
+    n_holdout = int(len(X) * VALID_FRACTION)
+    split = len(X) - n_holdout
+    X_fit, y_fit = X.iloc[:split], y.iloc[:split]
+    X_holdout, y_holdout = X.iloc[split:], y.iloc[split:]
+    
+    start = time.perf_counter()
+    model, n_rounds = train_native(X_fit, y_fit, direct, init_boosters=base.boosters, num_rounds=max_new_trees)
+    print(f"   ✅ Số vòng boosting: {n_rounds} (thêm tối đa {max_new_trees}) trong {time.perf_counter() - start:.1f}s")
+    before = target_metrics(y_holdout, base.predict(X_holdout))
+    after = target_metrics(y_holdout, model.predict(X_holdout))
+    for col in TARGET_COLS:
+        print(f"   • {col:<22} MAE {before[col]['mae']:.3f} → {after[col]['mae']:.3f} (holdout {n_holdout:,} dòng)")
+    
+    new_manifest = {k: v for k, v in manifest.items() if k not in _STRUCTURAL_KEYS}
+    new_manifest.update({
+        'watermark': pd.Timestamp(anchors.max()).isoformat(),
+        'n_train': manifest.get('n_train', 0) + split - int(split * VALID_FRACTION),
+        'incremental': {
+            'base_version': version,
+            'new_rows': len(X),
+            'n_rounds': n_rounds,
+            'drift_ratio': drift,
+            'holdout_rows': n_holdout,
+            'base_metrics': before,
+            'valid_metrics': after,
+        },
+    })
+    if 'training_range' in new_manifest:
+        new_manifest['training_range'] = dict(new_manifest['training_range'],
+                                              end=pd.Timestamp(anchors.max()).isoformat())
+    try:
+        save_model_files(model, base.feature_cols, DIRECT_MODEL_PATH if direct else MODEL_PATH,
+                         mode, horizons, model_format)
+        new_version = publish_version(model, base.feature_cols, mode, manifest=new_manifest)
+    except Exception as e:
+        print(f"❌ Lỗi khi lưu model: {e}")
+        return False
+    print(f"✅ Đã đăng version {new_version} lên registry (active)")
+    return True
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Train mô hình dự đoán thời tiết')
     parser.add_argument('--province_id', type=int, help='ID tỉnh cần train (bỏ qua để train tất cả)')
+    parser.add_argument('--mode', choices=['recursive', 'direct'], default='recursive',
+                        help='recursive: 1 giờ tới (lặp 168 bước); direct: nhiều horizon cùng lúc')
+    parser.add_argument('--format', choices=['pickle', 'native', 'both'], default='both',
+                        help='Định dạng lưu mô hình (native = UBJSON + metadata.json)')
+    parser.add_argument('--no-publish', action='store_true',
+                        help='Không đăng version mới lên registry mô hình')
+    parser.add_argument('--from-raw', action='store_true',
+                        help='Tính features từ dữ liệu thô thay vì đọc feature store')
+    parser.add_argument('--trainer', choices=['sklearn', 'native'], default='sklearn',
+                        help='native: QuantileDMatrix + multi-target + early stopping')
+    parser.add_argument('--sql-features', action='store_true',
+                        help='Tính features bằng window function trong PostgreSQL (dùng với --from-raw)')
+    parser.add_argument('--limit', type=int, default=500000,
+                        help='Số bản ghi mới nhất dùng để train (0 = toàn bộ lịch sử)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Train tiếp mô hình active trên dữ liệu mới (tự train lại từ đầu khi cần)')
     
     args = parser.parse_args()
     
     # Huấn luyện mô hình
-    success = train(province_id=args.province_id)
+    if args.incremental:
+        success = incremental_update(mode=args.mode, model_format=args.format,
+                                     use_feature_store=not args.from_raw)
+    else:
+        success = train(province_id=args.province_id, mode=args.mode, model_format=args.format,
+                        publish=False if args.no_publish else None, use_feature_store=not args.from_raw,
+                        trainer=args.trainer, sql_features=args.sql_features, limit=args.limit or None)
     
     if not success:
         print("\n❌ Training thất bại!")
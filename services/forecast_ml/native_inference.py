@@ -0,0 +1,104 @@
+# services/forecast_ml/native_inference.py
+"""
+Suy luận trực tiếp trên XGBoost Booster (không qua sklearn).
+
+MultiOutputRegressor.predict() chạy 6 XGBRegressor, mỗi cái đều validate
+input của sklearn và chuyển DataFrame -> DMatrix. NativeEnsemble lấy thẳng
+các Booster bên trong (hoặc 1 booster multi-output) và gọi inplace_predict
+trên buffer float32 cấp phát sẵn.
+"""
+
+import threading
+
+import numpy as np
+
+
+def _iteration_range(booster):
+    """Giữ đúng số cây như sklearn khi model được train với early stopping."""
+    best = booster.attr('best_iteration')
+    return (0, int(best) + 1) if best is not None else (0, 0)
+
+
+class NativeEnsemble:
+    """
+    Tập Booster dùng cho serving, có cùng giao diện predict(X) -> (n, n_targets).
+
+    Args:
+        boosters: list xgboost.Booster (1 booster/target, hoặc 1 booster multi-output)
+        feature_cols: Danh sách features theo thứ tự cột của X
+        n_targets: Số target (mặc định = số booster)
+        nthread: Số thread cho mỗi lần predict (nhỏ thì nhanh hơn với batch nhỏ)
+    """
+
+    def __init__(self, boosters, feature_cols, n_targets=None, nthread=None):
+        self.boosters = list(boosters)
+        self.feature_cols = list(feature_cols)
+        self.n_features = len(self.feature_cols)
+        self.n_targets = n_targets or len(self.boosters)
+        self._ranges = [_iteration_range(b) for b in self.boosters]
+        if nthread:
+            for b in self.boosters:
+                b.set_param({'nthread': nthread})
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, model, feature_cols, **kwargs):
+        """Tạo từ MultiOutputRegressor(XGBRegressor) hoặc XGBRegressor multi-output."""
+        if isinstance(model, cls):
+            return model
+        if hasattr(model, 'estimators_'):
+            boosters = [est.get_booster() for est in model.estimators_]
+            return cls(boosters, feature_cols, **kwargs)
+        return cls([model.get_booster()], feature_cols, **kwargs)
+
+    def __getstate__(self):
+        # Buffer theo thread không pickle được (file .pkl của trainer native)
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def input_buffer(self, n_rows):
+        """
+        Buffer float32 (n_rows, n_features) dùng lại giữa các lần gọi (theo thread).
+
+        Ghi features thẳng vào đây rồi truyền cho predict() để tránh copy.
+        """
+        buf = getattr(self._local, 'buf', None)
+        if buf is None or buf.shape[0] < n_rows:
+            buf = np.empty((max(n_rows, 64), self.n_features), dtype=np.float32)
+            self._local.buf = buf
+        return buf[:n_rows]
+
+    def predict(self, X):
+        """
+        Dự đoán cho ma trận X (n, n_features).
+
+        Returns:
+            np.ndarray (n, n_targets)
+        """
+        if hasattr(X, 'columns'):
+            X = X[self.feature_cols].to_numpy()
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.dtype != np.float32 or not X.flags.c_contiguous:
+            buf = self.input_buffer(X.shape[0])
+            buf[...] = X
+            X = buf
+
+        if len(self.boosters) == 1:
+            pred = self.boosters[0].inplace_predict(
+                X, iteration_range=self._ranges[0], validate_features=False
+            )
+            return np.asarray(pred).reshape(X.shape[0], -1)
+
+        out = np.empty((X.shape[0], self.n_targets), dtype=np.float32)
+        for i, (booster, it_range) in enumerate(zip(self.boosters, self._ranges)):
+            out[:, i] = booster.inplace_predict(
+                X, iteration_range=it_range, validate_features=False
+            )
+        return out
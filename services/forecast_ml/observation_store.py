@@ -0,0 +1,245 @@
+# services/forecast_ml/observation_store.py
+"""
+Cửa sổ quan sát 168 giờ gần nhất của tất cả tỉnh, giữ sẵn trong bộ nhớ.
+
+Thay vì mỗi lần dự đoán mở kết nối Postgres và chạy ORDER BY ... LIMIT 168,
+store tải một lần cho mọi tỉnh rồi chỉ lấy thêm các dòng mới hơn timestamp
+cuối cùng đã thấy của từng tỉnh (dữ liệu chỉ đổi mỗi giờ); tỉnh bị trễ không
+kéo các tỉnh khác đọc lại quá `hours` giờ. Mỗi tỉnh giữ:
+    timestamps  - mảng datetime64 (tối đa `hours` phần tử, tăng dần)
+    values      - mảng float32 (n, len(HISTORY_COLUMNS)), NaN đã được điền
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from data_pipeline.data_storage import connect_to_db
+from data_pipeline.bulk_loader import copy_query
+from services.forecast_ml.feature_spec import HISTORY_COLUMNS
+
+# Số giây tối đa giữa hai lần lấy dữ liệu mới từ DB
+REFRESH_INTERVAL = float(os.environ.get('FORECAST_OBSERVATION_REFRESH', '300'))
+
+# Giá trị điền cho ô thiếu (giống load_historical_data); các cột trong
+# FALLBACK_COLUMNS lấy giá trị từ cột khác cùng dòng
+FILL_VALUES = {
+    'precipitation': 0,
+    'rain': 0,
+    'showers': 0,
+    'cloud_cover': 50,
+    'cloud_cover_low': 0,
+    'cloud_cover_mid': 0,
+    'cloud_cover_high': 0,
+    'shortwave_radiation': 0,
+    'direct_radiation': 0,
+    'uv_index': 0,
+    'sunshine_duration': 0,
+    'weather_code': 1,
+}
+FALLBACK_COLUMNS = {
+    'apparent_temperature': 'temperature_2m',
+    'wind_gusts_10m': 'wind_speed_10m',
+}
+
+_SELECT_COLUMNS = ', '.join(['province_id', 'timestamp'] + HISTORY_COLUMNS)
+
+INITIAL_QUERY = f"""
+    SELECT {_SELECT_COLUMNS}
+    FROM (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY province_id ORDER BY timestamp DESC) AS rn
+        FROM weather_data
+    ) w
+    WHERE rn <= %s
+    ORDER BY province_id, timestamp
+"""
+
+# Watermark theo tỉnh: (mảng province_id, mảng timestamp cuối đã thấy, mốc cho tỉnh chưa có)
+INCREMENTAL_QUERY = f"""
+    SELECT {', '.join('w.' + c for c in ['province_id', 'timestamp'] + HISTORY_COLUMNS)}
+    FROM weather_data w
+    LEFT JOIN unnest(%s::int[], %s::timestamp[]) AS seen(province_id, last_ts)
+        ON seen.province_id = w.province_id
+    WHERE w.timestamp > COALESCE(seen.last_ts, %s)
+    ORDER BY w.province_id, w.timestamp
+"""
+
+# Cửa sổ bất biến của một tỉnh: cập nhật bằng cách thay cả tuple
+Window = namedtuple('Window', ['timestamps', 'values'])
+
+
+def _fill_missing(values):
+    """Điền NaN theo cùng quy tắc với load_historical_data (sửa tại chỗ)."""
+    col = {c: i for i, c in enumerate(HISTORY_COLUMNS)}
+    for name, source in FALLBACK_COLUMNS.items():
+        target = values[:, col[name]]
+        missing = np.isnan(target)
+        target[missing] = values[missing, col[source]]
+    for name, default in FILL_VALUES.items():
+        target = values[:, col[name]]
+        target[np.isnan(target)] = default
+    return values
+
+
+class ObservationStore:
+    """
+    Store cửa sổ quan sát cho tất cả tỉnh, an toàn đa luồng.
+
+    Args:
+        hours: Số giờ giữ lại mỗi tỉnh
+        refresh_interval: Số giây giữa hai lần lấy dữ liệu mới (0 = mỗi lần truy cập)
+    """
+
+    def __init__(self, hours=168, refresh_interval=REFRESH_INTERVAL):
+        self.hours = hours
+        self.refresh_interval = refresh_interval
+        self.columns = list(HISTORY_COLUMNS)
+        self._windows = {}          # province_id -> Window
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Nạp dữ liệu
+    # ------------------------------------------------------------------
+    def _query(self, sql, params):
+        conn = connect_to_db()
+        if conn is None:
+            raise ConnectionError("Không kết nối được database")
+        try:
+            return copy_query(conn, sql, params)
+        finally:
+            conn.close()
+
+    def ingest(self, df):
+        """
+        Thêm các dòng quan sát (DataFrame có province_id, timestamp và HISTORY_COLUMNS).
+
+        Chỉ nhận dòng mới hơn timestamp cuối cùng của từng tỉnh; mỗi tỉnh giữ
+        tối đa `hours` dòng gần nhất.
+
+        Returns:
+            int: Số dòng đã thêm
+        """
+        if df is None or df.empty:
+            return 0
+        df = df.sort_values(['province_id', 'timestamp'])
+        values = np.column_stack([
+            df[c].to_numpy(dtype=np.float32, na_value=np.nan) if c in df.columns
+            else np.full(len(df), np.nan, dtype=np.float32)
+            for c in self.columns
+        ])
+        _fill_missing(values)
+        timestamps = df['timestamp'].to_numpy()
+        province_ids = df['province_id'].to_numpy()
+
+        # Ranh giới từng tỉnh trong mảng đã sort
+        starts = np.flatnonzero(np.r_[True, province_ids[1:] != province_ids[:-1]])
+        ends = np.r_[starts[1:], len(df)]
+
+        added = 0
+        for start, end in zip(starts, ends):
+            pid = int(province_ids[start])
+            new_ts, new_values = timestamps[start:end], values[start:end]
+            current = self._windows.get(pid)
+            if current is not None and len(current.timestamps):
+                keep = new_ts > current.timestamps[-1]
+                new_ts, new_values = new_ts[keep], new_values[keep]
+                if not len(new_ts):
+                    continue
+                added += len(new_ts)
+                new_ts = np.concatenate([current.timestamps, new_ts])
+                new_values = np.concatenate([current.values, new_values])
+            else:
+                added += len(new_ts)
+            self._windows[pid] = Window(new_ts[-self.hours:], new_values[-self.hours:])
+        return added
+
+    def load(self):
+        """Tải đầy đủ `hours` giờ gần nhất cho mọi tỉnh (một truy vấn)."""
+        df = self._query(INITIAL_QUERY, (self.hours,))
+        self._windows = {}
+        self.ingest(df)
+        self._loaded = True
+        self._last_refresh = time.monotonic()
+        print(f"✅ Đã tải cửa sổ quan sát {self.hours}h cho {len(self._windows)} tỉnh")
+
+    def watermarks(self):
+        """
+        Tham số của INCREMENTAL_QUERY: mỗi tỉnh đọc từ timestamp cuối của nó, nhưng
+        không sớm hơn `hours` giờ trước quan sát mới nhất (tỉnh bị trễ chỉ cần cửa sổ này).
+
+        Returns:
+            (list province_id, list datetime, datetime mốc cho tỉnh chưa có trong store)
+        """
+        latest = {pid: pd.Timestamp(w.timestamps[-1]) for pid, w in self._windows.items() if len(w.timestamps)}
+        floor = max(latest.values()) - pd.Timedelta(hours=self.hours)
+        pids = sorted(latest)
+        return pids, [max(latest[pid], floor).to_pydatetime() for pid in pids], floor.to_pydatetime()
+
+    def refresh(self):
+        """Lấy các dòng mới hơn timestamp cuối cùng đã thấy của từng tỉnh (tải đầy đủ nếu chưa tải)."""
+        if not self._loaded or not self._windows:
+            self.load()
+            return
+        added = self.ingest(self._query(INCREMENTAL_QUERY, self.watermarks()))
+        self._last_refresh = time.monotonic()
+        if added:
+            print(f"🔄 Cửa sổ quan sát: thêm {added} dòng mới")
+
+    def ensure_fresh(self):
+        """
+        Làm mới nếu dữ liệu đã cũ hơn refresh_interval.
+
+        Lần tải đầu tiên các luồng chờ nhau; các lần sau chỉ một luồng làm mới,
+        luồng khác dùng ngay cửa sổ hiện có.
+        """
+        if self._loaded and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+            return
+        if self._lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Giữ cửa sổ cũ, thử lại ở lần sau
+                print(f"❌ Lỗi khi làm mới cửa sổ quan sát: {e}")
+                self._last_refresh = time.monotonic()
+            finally:
+                self._lock.release()
+
+    # ------------------------------------------------------------------
+    # Truy cập
+    # ------------------------------------------------------------------
+    def window(self, province_id):
+        """Window (timestamps, values float32) của tỉnh, hoặc None."""
+        self.ensure_fresh()
+        return self._windows.get(province_id)
+
+    def last_timestamp(self, province_id):
+        """Timestamp quan sát mới nhất của tỉnh (pd.Timestamp), hoặc None."""
+        window = self.window(province_id)
+        if window is None or not len(window.timestamps):
+            return None
+        return pd.Timestamp(window.timestamps[-1])
+
+    def frame(self, province_id):
+        """Cửa sổ của tỉnh dạng DataFrame (cùng định dạng load_historical_data)."""
+        window = self.window(province_id)
+        if window is None:
+            return pd.DataFrame(columns=['timestamp'] + self.columns)
+        df = pd.DataFrame(window.values.astype(float), columns=self.columns)
+        df.insert(0, 'timestamp', window.timestamps)
+        return df
+
+    def __len__(self):
+        return len(self._windows)
@@ -4,32 +4,232 @@ Dự đoán thời tiết sử dụng mô hình XGBoost đã train
 Tương thích với database schema mới
 """
 
-import joblib
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
 import sys
+import random
+import threading
+import time
+import copy
+from collections import OrderedDict, namedtuple
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from data_pipeline.data_storage import connect_to_db
+from data_pipeline.data_storage import connect_to_db, get_last_timestamp
+from data_pipeline.bulk_loader import load_table
+from services.forecast_ml.feature_state import FeatureState
+from services.forecast_ml.feature_spec import HISTORY_COLUMNS, MIN_HISTORY
+from services.forecast_ml.native_inference import NativeEnsemble
+from services.forecast_ml.model_io import has_native_model, load_model_native
+from services.forecast_ml import model_registry
+from services.forecast_ml.observation_store import ObservationStore
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models/weather_xgboost_multi.pkl')
 FEATURE_COLS_PATH = os.path.join(os.path.dirname(__file__), 'models/feature_cols.pkl')
+# Bản native (UBJSON + metadata.json) nằm cạnh file .pkl, cùng tên không đuôi
+NATIVE_MODEL_DIR = os.path.splitext(MODEL_PATH)[0]
 
-model = None
-feature_cols = None
+# Chế độ suy luận khi serving:
+#   'native'  - gọi thẳng Booster.inplace_predict trên buffer float32 (mặc định)
+#   'sklearn' - dùng MultiOutputRegressor.predict trên DataFrame như cũ
+INFERENCE_MODE = os.environ.get('FORECAST_INFERENCE_MODE', 'native')
+
+# Định dạng mô hình khi tải:
+#   'auto'   - ưu tiên bản native nếu có, không thì dùng .pkl (mặc định)
+#   'native' - chỉ dùng bản native
+#   'pickle' - chỉ dùng .pkl (joblib)
+MODEL_FORMAT = os.environ.get('FORECAST_MODEL_FORMAT', 'auto')
+
+# Mô hình dự báo trực tiếp nhiều horizon (model_training.py --mode direct)
+DIRECT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models/weather_xgboost_direct.pkl')
+NATIVE_DIRECT_MODEL_DIR = os.path.splitext(DIRECT_MODEL_PATH)[0]
+
+# Chế độ dự báo:
+#   'direct'    - 1 lần predict cho tất cả horizon rồi nội suy theo giờ (mặc định,
+#                 tự chuyển sang 'recursive' nếu chưa có mô hình direct)
+#   'recursive' - lặp 168 bước, mỗi bước dự đoán 1 giờ tới
+FORECAST_MODE = os.environ.get('FORECAST_MODE', 'direct')
+
+# Registry mô hình có phiên bản (model_training.py publish mỗi lần train).
+# Watcher nền kiểm tra con trỏ active mỗi MODEL_WATCH_INTERVAL giây (0 = tắt),
+# tải version mới ngoài luồng request rồi hoán đổi snapshot một lần gán.
+MODEL_WATCH_INTERVAL = float(os.environ.get('FORECAST_MODEL_WATCH_INTERVAL', '30'))
+
+# Snapshot bất biến của một mô hình đã tải: request lấy snapshot một lần và
+# dùng đến hết, nên việc hoán đổi mô hình không bao giờ làm lẫn model/feature_cols
+LoadedModel = namedtuple('LoadedModel', ['mode', 'model', 'feature_cols', 'horizons', 'version'])
+
+# Mô hình được tải lười (lần dự đoán đầu tiên), không tải khi import module
+_loaded = {'recursive': None, 'direct': None}
+# Mode đã tìm mà không có mô hình: không dò lại mỗi request (không lấy _model_lock),
+# chỉ thử lại khi watcher thấy con trỏ registry đổi (refresh_models)
+_missing = set()
+
+_model_lock = threading.Lock()
+_watcher = None
+
+def _use_native_format(native_dir):
+    return MODEL_FORMAT != 'pickle' and has_native_model(native_dir)
+
+def _from_registry(mode):
+    """Tải version đang active trong registry (None nếu registry chưa có)"""
+    if MODEL_FORMAT == 'pickle':
+        return None
+    version = model_registry.get_active(mode)
+    if version is None:
+        return None
+    loaded, manifest = model_registry.load_version(version)
+    return LoadedModel(mode, loaded, list(manifest['feature_cols']),
+                       manifest.get('horizons'), version)
 
 def load_model():
     """Load mô hình ML đã được train"""
-    global model, feature_cols
-    if os.path.exists(MODEL_PATH) and os.path.exists(FEATURE_COLS_PATH):
-        model = joblib.load(MODEL_PATH)
-        feature_cols = joblib.load(FEATURE_COLS_PATH)
-        print("✅ ĐÃ TẢI MÔ HÌNH XGBOOST THÀNH CÔNG")
+    snapshot = _from_registry('recursive')
+    if snapshot is None and _use_native_format(NATIVE_MODEL_DIR):
+        loaded, metadata = load_model_native(NATIVE_MODEL_DIR)
+        snapshot = LoadedModel('recursive', loaded, metadata['feature_cols'], None, 'legacy')
+    if snapshot is None and MODEL_FORMAT != 'native' \
+            and os.path.exists(MODEL_PATH) and os.path.exists(FEATURE_COLS_PATH):
+        import joblib
+        loaded = joblib.load(MODEL_PATH)
+        cols = joblib.load(FEATURE_COLS_PATH)
+        if INFERENCE_MODE == 'native':
+            loaded = NativeEnsemble.from_sklearn(loaded, cols)
+        snapshot = LoadedModel('recursive', loaded, cols, None, 'legacy')
+    if snapshot is None:
+        print("⚠️  KHÔNG TÌM THẤY MÔ HÌNH")
+        print("💡 Vui lòng chạy: python machine_learning/model_training.py")
+        return False
+    _loaded['recursive'] = snapshot
+    print(f"✅ ĐÃ TẢI MÔ HÌNH XGBOOST THÀNH CÔNG (version {snapshot.version})")
+    return True
+
+def load_direct_model():
+    """Load mô hình dự báo trực tiếp nhiều horizon"""
+    snapshot = _from_registry('direct')
+    if snapshot is None and _use_native_format(NATIVE_DIRECT_MODEL_DIR):
+        loaded, metadata = load_model_native(NATIVE_DIRECT_MODEL_DIR)
+        snapshot = LoadedModel('direct', loaded, list(metadata['feature_cols']),
+                               list(metadata['horizons']), 'legacy')
+    if snapshot is None and MODEL_FORMAT != 'native' and os.path.exists(DIRECT_MODEL_PATH):
+        import joblib
+        bundle = joblib.load(DIRECT_MODEL_PATH)
+        loaded = bundle['model']
+        if INFERENCE_MODE == 'native':
+            loaded = NativeEnsemble.from_sklearn(loaded, bundle['feature_cols'])
+        snapshot = LoadedModel('direct', loaded, list(bundle['feature_cols']),
+                               list(bundle['horizons']), 'legacy')
+    if snapshot is None:
+        return False
+    _loaded['direct'] = snapshot
+    print(f"✅ ĐÃ TẢI MÔ HÌNH DIRECT ({len(snapshot.horizons)} horizon, version {snapshot.version})")
+    return True
+
+def _ensure(mode, loader):
+    if _loaded[mode] is not None:
         return True
-    print("⚠️  KHÔNG TÌM THẤY MÔ HÌNH")
-    print("💡 Vui lòng chạy: python machine_learning/model_training.py")
-    return False
+    if mode in _missing:
+        return False
+    with _model_lock:
+        if _loaded[mode] is not None:
+            return True
+        if mode in _missing:
+            return False
+        ok = loader()
+        if not ok:
+            _missing.add(mode)
+        # Watcher chạy cả khi thiếu mô hình để phát hiện version được publish sau
+        _start_watcher()
+        return ok
+
+def ensure_model():
+    """Tải mô hình recursive lần đầu cần dùng (an toàn đa luồng)"""
+    return _ensure('recursive', load_model)
+
+def ensure_direct_model():
+    """Tải mô hình direct lần đầu cần dùng (an toàn đa luồng)"""
+    return _ensure('direct', load_direct_model)
+
+def get_snapshot(mode):
+    """Snapshot mô hình hiện tại của mode (None nếu chưa tải)"""
+    return _loaded[mode]
+
+def refresh_models():
+    """
+    Tải version active mới (nếu đổi) cho các mode đã được dùng và hoán đổi snapshot.
+    
+    Chạy trong watcher nền; request đang chạy vẫn giữ snapshot cũ đến khi xong.
+    Mode trước đó không có mô hình sẽ được dò lại ở request kế tiếp.
+    
+    Returns:
+        list mode đã được hoán đổi
+    
+    Raises:
+        RuntimeError: Có mode không tải được version mới (giữ mô hình cũ, watcher thử lại)
+    """
+    _missing.clear()
+    swapped = []
+    failed = []
+    for mode, current in list(_loaded.items()):
+        if current is None or MODEL_FORMAT == 'pickle':
+            continue
+        version = model_registry.get_active(mode)
+        if version is None or version == current.version:
+            continue
+        try:
+            snapshot = _from_registry(mode)
+        except Exception as e:
+            # Giữ mô hình cũ nếu version mới lỗi
+            print(f"❌ Không tải được version {version} ({mode}): {e}")
+            failed.append(mode)
+            continue
+        # Một phép gán: luồng khác thấy hoặc snapshot cũ hoặc snapshot mới
+        _loaded[mode] = snapshot
+        swapped.append(mode)
+        print(f"🔄 Đã chuyển mô hình {mode}: {current.version} → {snapshot.version}")
+    if failed:
+        raise RuntimeError(f"Không tải được mô hình mới cho {', '.join(failed)}")
+    return swapped
+
+def _watch_registry(interval):
+    signature = model_registry.active_signature()
+    # Lệch pha ngẫu nhiên để các worker không cùng tải lại một lúc
+    time.sleep(random.uniform(0, interval))
+    while True:
+        current = model_registry.active_signature()
+        if current != signature:
+            try:
+                refresh_models()
+                # Chỉ ghi nhận khi tải xong: lỗi (version đang được ghi dở…) sẽ được thử lại
+                signature = current
+            except Exception as e:
+                print(f"❌ Lỗi watcher registry: {e}")
+        time.sleep(interval * random.uniform(0.8, 1.2))
+
+def _start_watcher():
+    """Khởi động watcher nền (một lần mỗi process)"""
+    global _watcher
+    if _watcher is not None or MODEL_WATCH_INTERVAL <= 0:
+        return
+    _watcher = threading.Thread(
+        target=_watch_registry, args=(MODEL_WATCH_INTERVAL,),
+        name='model-registry-watcher', daemon=True
+    )
+    _watcher.start()
+
+def _resolve_mode(mode=None):
+    """
+    Chọn chế độ dự báo thực tế, fallback sang recursive nếu thiếu mô hình direct
+    
+    Returns:
+        LoadedModel snapshot hoặc None nếu không có mô hình
+    """
+    mode = mode or FORECAST_MODE
+    if mode == 'direct' and ensure_direct_model():
+        return _loaded['direct']
+    if not ensure_model():
+        return None
+    return _loaded['recursive']
 
 def load_historical_data(province_id, hours=168):
     """
@@ -42,36 +242,17 @@ def load_historical_data(province_id, hours=168):
     Returns:
         DataFrame với dữ liệu lịch sử
     """
+    columns = ['timestamp'] + HISTORY_COLUMNS
     conn = connect_to_db()
-    query = """
-        SELECT 
-            timestamp,
-            temperature_2m,
-            apparent_temperature,
-            relative_humidity_2m,
-            precipitation,
-            rain,
-            showers,
-            cloud_cover,
-            cloud_cover_low,
-            cloud_cover_mid,
-            cloud_cover_high,
-            weather_code,
-            wind_speed_10m,
-            wind_direction_10m,
-            wind_gusts_10m,
-            pressure_msl,
-            shortwave_radiation,
-            direct_radiation,
-            uv_index,
-            sunshine_duration
-        FROM weather_data 
-        WHERE province_id = %s 
-        ORDER BY timestamp DESC 
-        LIMIT %s
-    """
-    df = pd.read_sql(query, conn, params=(province_id, hours))
-    conn.close()
+    df = None
+    if conn is not None:
+        try:
+            df = load_table(conn, 'weather_data', columns=columns, where='province_id = %s',
+                            params=[province_id], order_by='"timestamp" DESC', limit=hours)
+        finally:
+            conn.close()
+    if df is None:
+        df = pd.DataFrame(columns=columns)
     
     # Sort theo thứ tự thời gian tăng dần
     df = df.sort_values('timestamp')
@@ -96,117 +277,10 @@ def load_historical_data(province_id, hours=168):
     
     for col, default_val in fill_values.items():
         if col in df.columns:
-            df[col].fillna(default_val, inplace=True)
+            df[col] = df[col].fillna(default_val)
     
     return df
 
-def create_features(df, target_time):
-    """
-    Tạo features từ dữ liệu lịch sử cho một thời điểm dự đoán
-    
-    Args:
-        df: DataFrame chứa dữ liệu lịch sử
-        target_time: Thời điểm cần dự đoán
-    
-    Returns:
-        DataFrame với 1 dòng chứa features
-    """
-    if len(df) < 24:
-        return None
-    
-    # Lấy dòng cuối cùng làm base
-    row = df.tail(1).copy()
-    
-    # =========================================================================
-    # LAG FEATURES
-    # =========================================================================
-    lags = [1, 2, 3, 6, 12, 24]
-    lag_cols = [
-        'temperature_2m',
-        'relative_humidity_2m', 
-        'wind_speed_10m',
-        'pressure_msl',
-        'precipitation',
-        'cloud_cover'
-    ]
-    
-    for lag in lags:
-        for col in lag_cols:
-            if len(df) >= lag and col in df.columns:
-                row[f'{col}_lag{lag}'] = df[col].iloc[-lag]
-            else:
-                row[f'{col}_lag{lag}'] = row[col].iloc[0]
-    
-    # =========================================================================
-    # ROLLING FEATURES
-    # =========================================================================
-    rolls = [3, 6, 24]
-    
-    for w in rolls:
-        window = min(w, len(df))
-        
-        # Temperature
-        row[f'temp_roll_mean_{w}'] = df['temperature_2m'].tail(window).mean()
-        row[f'temp_roll_std_{w}'] = df['temperature_2m'].tail(window).std() if window > 1 else 0
-        row[f'temp_roll_min_{w}'] = df['temperature_2m'].tail(window).min()
-        row[f'temp_roll_max_{w}'] = df['temperature_2m'].tail(window).max()
-        
-        # Precipitation
-        row[f'precip_roll_sum_{w}'] = df['precipitation'].tail(window).sum()
-        
-        # Humidity
-        row[f'humidity_roll_mean_{w}'] = df['relative_humidity_2m'].tail(window).mean()
-        
-        # Pressure
-        row[f'pressure_roll_mean_{w}'] = df['pressure_msl'].tail(window).mean()
-        
-        # Wind
-        row[f'wind_roll_mean_{w}'] = df['wind_speed_10m'].tail(window).mean()
-        row[f'wind_roll_max_{w}'] = df['wind_speed_10m'].tail(window).max()
-    
-    # =========================================================================
-    # TIME FEATURES
-    # =========================================================================
-    row['hour'] = target_time.hour
-    row['dayofweek'] = target_time.weekday()
-    row['month'] = target_time.month
-    row['day'] = target_time.day
-    row['is_weekend'] = 1 if target_time.weekday() >= 5 else 0
-    
-    # Season
-    season_map = {
-        12: 0, 1: 0, 2: 0,  # Đông
-        3: 1, 4: 1, 5: 1,   # Xuân
-        6: 2, 7: 2, 8: 2,   # Hè
-        9: 3, 10: 3, 11: 3  # Thu
-    }
-    row['season'] = season_map.get(target_time.month, 0)
-    
-    # Time of day
-    if 0 <= target_time.hour < 6:
-        row['time_of_day'] = 0  # Đêm
-    elif 6 <= target_time.hour < 12:
-        row['time_of_day'] = 1  # Sáng
-    elif 12 <= target_time.hour < 18:
-        row['time_of_day'] = 2  # Chiều
-    else:
-        row['time_of_day'] = 3  # Tối
-    
-    # =========================================================================
-    # INTERACTION FEATURES
-    # =========================================================================
-    row['temp_humidity_interaction'] = row['temperature_2m'].iloc[0] * row['relative_humidity_2m'].iloc[0] / 100
-    row['temp_wind_interaction'] = row['temperature_2m'].iloc[0] * row['wind_speed_10m'].iloc[0]
-    row['pressure_humidity_interaction'] = row['pressure_msl'].iloc[0] * row['relative_humidity_2m'].iloc[0] / 100
-    
-    # Cloud cover total
-    if all(col in row.columns for col in ['cloud_cover_low', 'cloud_cover_mid', 'cloud_cover_high']):
-        row['cloud_cover_total'] = (row['cloud_cover_low'].iloc[0] + 
-                                    row['cloud_cover_mid'].iloc[0] + 
-                                    row['cloud_cover_high'].iloc[0])
-    
-    return row
-
 def predict_weather_code(temp, precip, humidity, wind, cloud_cover):
     """
     Dự đoán weather code dựa trên các yếu tố thời tiết
@@ -305,13 +379,545 @@ def calculate_visibility(humidity, precipitation, cloud_cover):
     
     return int(base_visibility)
 
-def predict_storm(province_id, current_weather_data=None):
+# =============================================================================
+# Phiên bản mảng của các hàm trên: nhận cả mảng horizon hoặc ma trận tỉnh×horizon
+# (broadcast như NumPy), kết quả trùng với bản vô hướng từng phần tử
+# =============================================================================
+
+_RAIN_CODES = [61, 63, 65, 95]
+_CLOUDY_CODES = [3, 45]
+_SUMMER_MONTHS = [5, 6, 7, 8]
+_SHOULDER_MONTHS = [3, 4, 9, 10]
+
+def predict_weather_code_array(temp, precip, humidity, wind, cloud_cover):
+    """
+    Bản mảng của predict_weather_code
+    
+    Returns:
+        np.ndarray int: Weather code
+    """
+    temp, precip, humidity, wind, cloud_cover = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (temp, precip, humidity, wind, cloud_cover))
+    )
+    # Điều kiện theo đúng thứ tự if/elif: np.select lấy điều kiện đúng đầu tiên
+    return np.select(
+        [
+            (wind > 20) & (precip > 5),
+            precip > 10,
+            precip > 5,
+            precip > 2,
+            precip > 0.5,
+            (humidity > 90) & (temp < 20),
+            cloud_cover > 80,
+            cloud_cover > 50,
+            (temp > 28) | (cloud_cover > 20),
+        ],
+        [95, 65, 63, 61, 51, 45, 3, 2, 1],
+        default=0
+    )
+
+def predict_uv_index_array(hour, month, weather_code):
+    """
+    Bản mảng của predict_uv_index
+    
+    Returns:
+        np.ndarray float: UV index
+    """
+    hour, month, weather_code = np.broadcast_arrays(
+        np.asarray(hour), np.asarray(month), np.asarray(weather_code)
+    )
+    base_uv = np.select(
+        [(hour >= 11) & (hour <= 14), (hour >= 9) & (hour <= 16), (hour >= 7) & (hour <= 17)],
+        [8.0, 6.0, 3.0],
+        default=np.nan  # ban đêm: trả về 0 ở cuối
+    )
+    base_uv = base_uv + np.select(
+        [np.isin(month, _SUMMER_MONTHS), np.isin(month, _SHOULDER_MONTHS)], [2, 1], default=0
+    )
+    base_uv = base_uv * np.select(
+        [np.isin(weather_code, _RAIN_CODES), np.isin(weather_code, _CLOUDY_CODES), weather_code == 2],
+        [0.3, 0.5, 0.7],
+        default=1.0
+    )
+    uv = np.clip(np.round(base_uv, 1), 0, 11)
+    return np.where(np.isnan(base_uv), 0.0, uv)
+
+def calculate_visibility_array(humidity, precipitation, cloud_cover):
+    """
+    Bản mảng của calculate_visibility
+    
+    Returns:
+        np.ndarray int: Visibility in meters
+    """
+    humidity, precipitation, cloud_cover = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (humidity, precipitation, cloud_cover))
+    )
+    visibility = np.select(
+        [precipitation > 10, precipitation > 5, precipitation > 1],
+        [2000, 5000, 10000],
+        default=50000
+    )
+    visibility = np.minimum(visibility, np.select(
+        [humidity > 95, humidity > 90], [5000, 10000], default=50000
+    ))
+    return np.where(cloud_cover > 90, np.minimum(visibility, 15000), visibility)
+
+# Tổng số giờ dự đoán tự hồi quy (7 ngày)
+FORECAST_HOURS = 168
+
+# Nguồn lịch sử khi dự đoán:
+#   'memory' - cửa sổ 168h của mọi tỉnh giữ sẵn trong ObservationStore (mặc định),
+#              chỉ lấy thêm dòng mới từ DB mỗi FORECAST_OBSERVATION_REFRESH giây
+#   'db'     - truy vấn Postgres mỗi lần dự đoán (load_historical_data)
+OBSERVATION_SOURCE = os.environ.get('FORECAST_OBSERVATION_SOURCE', 'memory')
+observation_store = ObservationStore(hours=FORECAST_HOURS)
+
+# Memo kết quả dự báo trong process (LRU + TTL)
+#   FORECAST_MEMO_SIZE - số entry tối đa (0 = tắt)
+#   FORECAST_MEMO_TTL  - thời gian sống của một entry (giây)
+FORECAST_MEMO_SIZE = int(os.environ.get('FORECAST_MEMO_SIZE', '256'))
+FORECAST_MEMO_TTL = float(os.environ.get('FORECAST_MEMO_TTL', '900'))
+
+class ForecastMemo:
+    """
+    Cache LRU + TTL cho kết quả predict_storm, an toàn đa luồng.
+    
+    Key gồm (tỉnh, timestamp quan sát mới nhất, mode, version mô hình, giờ hiện tại)
+    nên entry tự hết hiệu lực khi có dữ liệu mới, mô hình mới hoặc sang giờ mới.
+    Nhiều request cùng key đến lúc cache trống chỉ tính một lần (single-flight).
+    """
+    
+    def __init__(self, maxsize=FORECAST_MEMO_SIZE, ttl=FORECAST_MEMO_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (hết hạn lúc, kết quả)
+        self._inflight = {}             # key -> threading.Event
+        self._lock = threading.Lock()
+    
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def get_or_compute(self, key, compute):
+        """
+        Trả về kết quả đã memo cho key, hoặc gọi compute() rồi lưu lại.
+        
+        Kết quả có 'error' không được lưu. Luôn trả về bản sao để caller
+        sửa thoải mái mà không ảnh hưởng cache.
+        """
+        if self.maxsize <= 0:
+            return compute()
+        
+        while True:
+            with self._lock:
+                value = self._lookup(key)
+                if value is not None:
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                event = self._inflight.get(key)
+                if event is None:
+                    # Luồng này chịu trách nhiệm tính
+                    self.misses += 1
+                    event = self._inflight[key] = threading.Event()
+                    break
+            # Luồng khác đang tính cùng key: chờ rồi đọc lại cache
+            event.wait()
+        
+        try:
+            value = compute()
+            if 'error' not in value:
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+            return copy.deepcopy(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Số liệu cache: size, hits, misses, hit_rate"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+forecast_memo = ForecastMemo()
+
+def latest_observation_time(province_id):
+    """Timestamp quan sát mới nhất của tỉnh trong weather_data (None nếu chưa có / không kết nối được DB)"""
+    if OBSERVATION_SOURCE == 'memory':
+        return observation_store.last_timestamp(province_id)
+    conn = connect_to_db()
+    if conn is None:
+        return None
+    try:
+        return get_last_timestamp(conn, province_id)
+    finally:
+        conn.close()
+
+def _history_frame(province_id, current_weather_data=None):
+    """
+    Lấy lịch sử của một tỉnh, fallback sang dữ liệu hiện tại nếu DB thiếu
+    
+    Returns:
+        DataFrame lịch sử, hoặc None nếu không đủ dữ liệu
+    """
+    if OBSERVATION_SOURCE == 'memory':
+        df = observation_store.frame(province_id)
+    else:
+        df = load_historical_data(province_id, hours=168)
+    
+    if len(df) < MIN_HISTORY:
+        # Fallback: dùng current weather data
+        if not current_weather_data:
+            return None
+        df = pd.DataFrame([{
+            'timestamp': datetime.now(),
+            'temperature_2m': current_weather_data.get('temperature_2m', 25),
+            'apparent_temperature': current_weather_data.get('temperature_2m', 25),
+            'relative_humidity_2m': current_weather_data.get('relative_humidity_2m', 70),
+            'precipitation': 0,
+            'rain': 0,
+            'showers': 0,
+            'cloud_cover': 50,
+            'cloud_cover_low': 20,
+            'cloud_cover_mid': 20,
+            'cloud_cover_high': 10,
+            'weather_code': 1,
+            'wind_speed_10m': current_weather_data.get('wind_speed_10m', 5),
+            'wind_direction_10m': 0,
+            'wind_gusts_10m': current_weather_data.get('wind_speed_10m', 5),
+            'pressure_msl': current_weather_data.get('pressure_msl', 1013),
+            'shortwave_radiation': 0,
+            'direct_radiation': 0,
+            'uv_index': 0,
+            'sunshine_duration': 0
+        }])
+    return df
+
+def _history_state(province_id, current_weather_data, feature_cols):
+    """
+    FeatureState cho một tỉnh: đọc thẳng mảng float32 trong observation_store
+    (không qua DB/pandas), fallback về _history_frame khi thiếu lịch sử
+    
+    Returns:
+        FeatureState, hoặc None nếu không đủ dữ liệu
+    """
+    if OBSERVATION_SOURCE == 'memory':
+        window = observation_store.window(province_id)
+        if window is not None and len(window.timestamps) >= MIN_HISTORY:
+            return FeatureState.from_arrays(window.values, window.timestamps, feature_cols)
+    df = _history_frame(province_id, current_weather_data)
+    if df is None:
+        return None
+    return FeatureState.from_frame(df, feature_cols)
+
+def _postprocess_hour(pred, target_time):
+    """
+    Chuyển 6 giá trị dự đoán thô thành dữ liệu giờ hoàn chỉnh
+    
+    Returns:
+        (dict dữ liệu giờ cho API, dict dòng lịch sử để đẩy vào FeatureState)
+    """
+    # Lấy kết quả (6 targets: temp, humidity, precip, wind, pressure, cloud_cover)
+    temp = float(pred[0])
+    humidity = int(np.clip(pred[1], 0, 100))
+    precip = max(float(pred[2]), 0)
+    wind = max(float(pred[3]), 0)
+    pressure = float(pred[4])
+    cloud_cover = float(np.clip(pred[5], 0, 100))
+    
+    # Dự đoán các giá trị khác
+    weather_code = predict_weather_code(temp, precip, humidity, wind, cloud_cover)
+    uv_index = predict_uv_index(target_time.hour, target_time.month, weather_code)
+    visibility = calculate_visibility(humidity, precip, cloud_cover)
+    
+    history_row = {
+        'temperature_2m': temp,
+        'apparent_temperature': temp,
+        'relative_humidity_2m': humidity,
+        'precipitation': precip,
+        'rain': precip,
+        'showers': 0,
+        'cloud_cover': cloud_cover,
+        'cloud_cover_low': cloud_cover / 3,
+        'cloud_cover_mid': cloud_cover / 3,
+        'cloud_cover_high': cloud_cover / 3,
+        'weather_code': weather_code,
+        'wind_speed_10m': wind,
+        'wind_direction_10m': 0,
+        'wind_gusts_10m': wind * 1.2,
+        'pressure_msl': pressure,
+        'shortwave_radiation': 0,
+        'direct_radiation': 0,
+        'uv_index': uv_index,
+        'sunshine_duration': 0
+    }
+    
+    hour_data = {
+        'temperature_2m': round(temp, 1),
+        'relative_humidity_2m': humidity,
+        'precipitation': round(precip, 2),
+        'wind_speed_10m': round(wind, 1),
+        'pressure_msl': round(pressure, 1),
+        'cloud_cover': round(cloud_cover, 1),
+        'weather_code': weather_code,
+        'uv_index': uv_index,
+        'visibility': visibility,
+        'time': target_time.isoformat()
+    }
+    return hour_data, history_row
+
+def _predict_step(snapshot, states, target_time):
+    """
+    Dự đoán 1 giờ tiếp theo cho nhiều tỉnh bằng MỘT lần model.predict (N×F)
+    rồi đẩy kết quả vào từng state
+    
+    Returns:
+        list dict dữ liệu giờ dự đoán (None cho state chưa đủ lịch sử)
+    """
+    model, feature_cols = snapshot.model, snapshot.feature_cols
+    native = isinstance(model, NativeEnsemble)
+    if native:
+        # Ghi features thẳng vào buffer float32 của booster, không qua pandas
+        X = model.input_buffer(len(states))
+    else:
+        X = np.empty((len(states), len(feature_cols)))
+    # Anchor là dòng mới nhất của từng state (giờ trước target_time)
+    ready = [state.features(out=X[i]) is not None for i, state in enumerate(states)]
+    results = [None] * len(states)
+    if not any(ready):
+        return results
+    
+    rows = [i for i, ok in enumerate(ready) if ok]
+    X = X if len(rows) == len(states) else X[rows]
+    preds = model.predict(X if native else pd.DataFrame(X, columns=feature_cols))
+    
+    for i, pred in zip(rows, preds):
+        results[i], history_row = _postprocess_hour(pred, target_time)
+        # Cập nhật state cho prediction tiếp theo
+        states[i].push(history_row, timestamp=target_time)
+    return results
+
+def summarize_daily(temperature, precipitation, wind_speed, weather_code, now):
+    """
+    Tổng hợp daily forecast bằng reshape (…, ngày, 24) rồi reduce theo trục giờ
+    
+    Args:
+        temperature, precipitation, wind_speed: Mảng giờ (H,), (P, H) hoặc
+            (P, ngày, 24) đã làm tròn như hourly_predictions; NaN ở temperature
+            = giờ không có dự đoán
+        weather_code: Mảng mã thời tiết cùng shape
+        now: Mốc bắt đầu (ngày 0)
+    
+    Returns:
+        list dict mỗi ngày (đầu vào 1 chiều), hoặc list P list (đầu vào nhiều tỉnh)
+    """
+    temperature = np.asarray(temperature, dtype=float)
+    single = temperature.ndim == 1
+    n_rows = 1 if single else temperature.shape[0]
+    temperature, precipitation, wind_speed = (
+        np.asarray(a, dtype=float).reshape(n_rows, -1) for a in (temperature, precipitation, wind_speed)
+    )
+    weather_code = np.asarray(weather_code).reshape(n_rows, -1)
+    n_hours = temperature.shape[1]
+    days = -(-n_hours // 24)
+    
+    def by_day(values, fill):
+        # (P, H) -> (P, ngày, 24), giờ thiếu ở ngày cuối được điền `fill`
+        padded = np.pad(values, ((0, 0), (0, days * 24 - n_hours)), constant_values=fill)
+        return padded.reshape(n_rows, days, 24)
+    
+    temps = by_day(temperature, np.nan)
+    valid = ~np.isnan(temps)
+    has_data = valid.any(axis=-1)
+    temp_max = np.where(valid, temps, -np.inf).max(axis=-1)
+    temp_min = np.where(valid, temps, np.inf).min(axis=-1)
+    precip_sum = np.where(valid, by_day(precipitation, 0.0), 0.0).sum(axis=-1)
+    wind_max = np.where(valid, by_day(wind_speed, 0.0), -np.inf).max(axis=-1)
+    
+    # Mode mã thời tiết: bincount trên khoá (tỉnh×ngày, mã), hoà thì lấy mã nhỏ nhất
+    codes = np.where(valid, by_day(np.nan_to_num(weather_code, nan=-1).astype(int), -1), -1)
+    codes = codes.reshape(n_rows * days, 24)
+    n_codes = max(int(codes.max()) + 1, 1)
+    groups = np.repeat(np.arange(n_rows * days), 24).reshape(codes.shape)
+    ok = codes >= 0
+    counts = np.bincount(
+        groups[ok] * n_codes + codes[ok], minlength=n_rows * days * n_codes
+    ).reshape(n_rows * days, n_codes)
+    mode = counts.argmax(axis=1).reshape(n_rows, days)
+    
+    # Sunrise/sunset cố định 06:00 / 18:00 nên chỉ cần ghép chuỗi ngày
+    dates = [(now + timedelta(days=day)).date().isoformat() for day in range(days)]
+    results = [
+        [
+            {
+                'time': dates[day],
+                'temperature_2m_max': round(float(temp_max[i, day]), 1),
+                'temperature_2m_min': round(float(temp_min[i, day]), 1),
+                'precipitation_sum': round(float(precip_sum[i, day]), 2),
+                'wind_speed_10m_max': round(float(wind_max[i, day]), 1),
+                'weather_code': int(mode[i, day]),
+                'sunrise': f"{dates[day]}T06:00:00",
+                'sunset': f"{dates[day]}T18:00:00"
+            }
+            for day in range(days) if has_data[i, day]
+        ]
+        for i in range(n_rows)
+    ]
+    return results[0] if single else results
+
+def _summarize_daily(hourly_predictions, now):
+    """Tổng hợp daily forecast (7 ngày) từ các giờ dự đoán"""
+    hourly_predictions = hourly_predictions[:FORECAST_HOURS]
+    if not hourly_predictions:
+        return []
+    return summarize_daily(
+        [h['temperature_2m'] for h in hourly_predictions],
+        [h['precipitation'] for h in hourly_predictions],
+        [h['wind_speed_10m'] for h in hourly_predictions],
+        [h['weather_code'] for h in hourly_predictions],
+        now
+    )
+
+def _format_result(hourly_predictions, daily_forecast):
+    """Đóng gói kết quả theo định dạng trả về của predict_storm"""
+    return {
+        'predicted_temperature': [h['temperature_2m'] for h in hourly_predictions[:24]],
+        'predicted_humidity': [h['relative_humidity_2m'] for h in hourly_predictions[:24]],
+        'predicted_precipitation': [h['precipitation'] for h in hourly_predictions[:24]],
+        'predicted_wind_speed': [h['wind_speed_10m'] for h in hourly_predictions[:24]],
+        'predicted_pressure': [h['pressure_msl'] for h in hourly_predictions[:24]],
+        'predicted_cloud_cover': [h['cloud_cover'] for h in hourly_predictions[:24]],
+        'predicted_visibility': [h['visibility'] for h in hourly_predictions[:24]],
+        'predicted_weather_code': [h['weather_code'] for h in hourly_predictions[:24]],
+        'predicted_uv_index': [h['uv_index'] for h in hourly_predictions[:24]],
+        'hourly_predictions': hourly_predictions[:24],
+        'daily_forecast': daily_forecast,
+        'prediction_hours': 24
+    }
+
+def _forecast_states(snapshot, states, now):
+    """
+    Chạy vòng lặp tự hồi quy đồng bộ (lockstep) cho nhiều state
+    
+    Mỗi giờ chỉ gọi model.predict một lần cho tất cả tỉnh còn đủ lịch sử.
+    
+    Returns:
+        list dict kết quả (cùng định dạng predict_storm), theo thứ tự states
+    """
+    hourly = [[] for _ in states]
+    active = list(range(len(states)))
+    # Giá trị giờ cho daily rollup: (nhiệt độ, mưa, gió, mã thời tiết) × tỉnh × giờ
+    daily_inputs = np.full((4, len(states), FORECAST_HOURS), np.nan)
+    
+    for step in range(FORECAST_HOURS):
+        if not active:
+            break
+        target_time = now + timedelta(hours=step + 1)
+        results = _predict_step(snapshot, [states[i] for i in active], target_time)
+        
+        still_active = []
+        for i, hour_data in zip(active, results):
+            if hour_data is not None:
+                hourly[i].append(hour_data)
+                daily_inputs[:, i, step] = (
+                    hour_data['temperature_2m'], hour_data['precipitation'],
+                    hour_data['wind_speed_10m'], hour_data['weather_code']
+                )
+                still_active.append(i)
+        active = still_active
+    
+    if not states:
+        return []
+    daily = summarize_daily(*daily_inputs, now)
+    return [_format_result(h, d) for h, d in zip(hourly, daily)]
+
+def _interpolation_matrix(horizons, hours):
+    """Ma trận W (len(hours) × len(horizons)) nội suy tuyến tính giữa các horizon"""
+    eye = np.eye(len(horizons))
+    return np.column_stack([np.interp(hours, horizons, eye[k]) for k in range(len(horizons))])
+
+def _forecast_direct(snapshot, states, now):
+    """
+    Dự báo trực tiếp: 1 lần predict cho tất cả tỉnh và tất cả horizon,
+    sau đó nội suy tuyến tính ra từng giờ (+1…+168)
+    
+    Returns:
+        list dict kết quả (cùng định dạng predict_storm), theo thứ tự states
+    """
+    n_targets = 6
+    results = [_format_result([], []) for _ in states]
+    
+    direct_model, direct_feature_cols, direct_horizons = snapshot.model, snapshot.feature_cols, snapshot.horizons
+    native = isinstance(direct_model, NativeEnsemble)
+    X = direct_model.input_buffer(len(states)) if native else np.empty((len(states), len(direct_feature_cols)))
+    # Features tại mốc quan sát cuối cùng (giống lúc training)
+    rows = [i for i, state in enumerate(states) if state.features(out=X[i]) is not None]
+    if not rows:
+        return results
+    
+    X = X if len(rows) == len(states) else X[rows]
+    preds = direct_model.predict(X if native else pd.DataFrame(X, columns=direct_feature_cols))
+    preds = np.asarray(preds, dtype=float).reshape(len(rows), len(direct_horizons), n_targets)
+    
+    # Nội suy (H horizon) -> (168 giờ) cho mọi tỉnh/target trong 1 phép nhân ma trận
+    hours = np.arange(1, FORECAST_HOURS + 1)
+    weights = _interpolation_matrix(direct_horizons, hours)
+    hourly_values = np.einsum('hk,nkt->nht', weights, preds)
+    
+    # Daily rollup cho cả batch tỉnh: xử lý hậu kỳ dạng mảng, không tạo dict từng giờ
+    temp = hourly_values[..., 0]
+    humidity = np.clip(hourly_values[..., 1], 0, 100).astype(int)
+    precip = np.maximum(hourly_values[..., 2], 0)
+    wind = np.maximum(hourly_values[..., 3], 0)
+    cloud_cover = np.clip(hourly_values[..., 5], 0, 100)
+    weather_code = predict_weather_code_array(temp, precip, humidity, wind, cloud_cover)
+    daily = summarize_daily(np.round(temp, 1), np.round(precip, 2), np.round(wind, 1), weather_code, now)
+    
+    # API chỉ trả về 24 giờ đầu
+    for i, values, days in zip(rows, hourly_values, daily):
+        hourly = [
+            _postprocess_hour(values[h], now + timedelta(hours=int(hours[h])))[0]
+            for h in range(min(24, len(hours)))
+        ]
+        results[i] = _format_result(hourly, days)
+    return results
+
+def _run_forecast(snapshot, states, now):
+    """Chạy dự báo theo chế độ của snapshot mô hình"""
+    if snapshot.mode == 'direct':
+        return _forecast_direct(snapshot, states, now)
+    return _forecast_states(snapshot, states, now)
+
+def predict_storm(province_id, current_weather_data=None, mode=None):
     """
     Dự đoán thời tiết cho 24 giờ tới (hourly) và 7 ngày tới (daily)
     
     Args:
         province_id: ID của tỉnh cần dự đoán
         current_weather_data: Dict với dữ liệu hiện tại (fallback nếu DB thiếu)
+        mode: 'direct' hoặc 'recursive' (mặc định FORECAST_MODE)
     
     Returns:
         dict với các key:
@@ -327,211 +933,27 @@ def predict_storm(province_id, current_weather_data=None):
         - daily_forecast: list 7 dict với thông tin mỗi ngày
         - prediction_hours: 24
     """
-    if model is None and not load_model():
+    # Lấy snapshot một lần: mô hình có bị hoán đổi giữa chừng cũng không ảnh hưởng
+    snapshot = _resolve_mode(mode)
+    if snapshot is None:
         return {"error": "Không thể load mô hình"}
     
-    try:
+    def compute():
         # Load dữ liệu lịch sử
-        df = load_historical_data(province_id, hours=168)
-        
-        if len(df) < 24:
-            # Fallback: dùng current weather data
-            if current_weather_data:
-                df = pd.DataFrame([{
-                    'timestamp': datetime.now(),
-                    'temperature_2m': current_weather_data.get('temperature_2m', 25),
-                    'apparent_temperature': current_weather_data.get('temperature_2m', 25),
-                    'relative_humidity_2m': current_weather_data.get('relative_humidity_2m', 70),
-                    'precipitation': 0,
-                    'rain': 0,
-                    'showers': 0,
-                    'cloud_cover': 50,
-                    'cloud_cover_low': 20,
-                    'cloud_cover_mid': 20,
-                    'cloud_cover_high': 10,
-                    'weather_code': 1,
-                    'wind_speed_10m': current_weather_data.get('wind_speed_10m', 5),
-                    'wind_direction_10m': 0,
-                    'wind_gusts_10m': current_weather_data.get('wind_speed_10m', 5),
-                    'pressure_msl': current_weather_data.get('pressure_msl', 1013),
-                    'shortwave_radiation': 0,
-                    'direct_radiation': 0,
-                    'uv_index': 0,
-                    'sunshine_duration': 0
-                }])
-            else:
-                return {"error": "Không đủ dữ liệu lịch sử"}
+        state = _history_state(province_id, current_weather_data, snapshot.feature_cols)
+        if state is None:
+            return {"error": "Không đủ dữ liệu lịch sử"}
         
-        # Dự đoán 24 giờ tới (hourly)
-        hourly_predictions = []
-        current_df = df.copy()
-        now = datetime.now()
-        
-        for hour in range(24):
-            target_time = now + timedelta(hours=hour + 1)
-            
-            # Tạo features
-            feature_row = create_features(current_df, target_time)
-            if feature_row is None:
-                break
-            
-            # Predict
-            X = feature_row[feature_cols]
-            pred = model.predict(X)[0]
-            
-            # Lấy kết quả (6 targets: temp, humidity, precip, wind, pressure, cloud_cover)
-            temp = float(pred[0])
-            humidity = int(np.clip(pred[1], 0, 100))
-            precip = max(float(pred[2]), 0)
-            wind = max(float(pred[3]), 0)
-            pressure = float(pred[4])
-            cloud_cover = float(np.clip(pred[5], 0, 100))
-            
-            # Dự đoán các giá trị khác
-            weather_code = predict_weather_code(temp, precip, humidity, wind, cloud_cover)
-            uv_index = predict_uv_index(target_time.hour, target_time.month, weather_code)
-            visibility = calculate_visibility(humidity, precip, cloud_cover)
-            
-            hourly_predictions.append({
-                'temperature_2m': round(temp, 1),
-                'relative_humidity_2m': humidity,
-                'precipitation': round(precip, 2),
-                'wind_speed_10m': round(wind, 1),
-                'pressure_msl': round(pressure, 1),
-                'cloud_cover': round(cloud_cover, 1),
-                'weather_code': weather_code,
-                'uv_index': uv_index,
-                'visibility': visibility,
-                'time': target_time.isoformat()
-            })
-            
-            # Cập nhật df cho prediction tiếp theo
-            new_row = pd.DataFrame([{
-                'timestamp': target_time,
-                'temperature_2m': temp,
-                'apparent_temperature': temp,
-                'relative_humidity_2m': humidity,
-                'precipitation': precip,
-                'rain': precip,
-                'showers': 0,
-                'cloud_cover': cloud_cover,
-                'cloud_cover_low': cloud_cover / 3,
-                'cloud_cover_mid': cloud_cover / 3,
-                'cloud_cover_high': cloud_cover / 3,
-                'weather_code': weather_code,
-                'wind_speed_10m': wind,
-                'wind_direction_10m': 0,
-                'wind_gusts_10m': wind * 1.2,
-                'pressure_msl': pressure,
-                'shortwave_radiation': 0,
-                'direct_radiation': 0,
-                'uv_index': uv_index,
-                'sunshine_duration': 0
-            }])
-            current_df = pd.concat([current_df, new_row], ignore_index=True)
-        
-        # Tổng hợp daily forecast (7 ngày)
-        daily_forecast = []
-        for day in range(7):
-            start_idx = day * 24
-            end_idx = start_idx + 24
-            
-            # Predict thêm nếu chưa đủ
-            while len(hourly_predictions) < end_idx:
-                target_time = now + timedelta(hours=len(hourly_predictions) + 1)
-                feature_row = create_features(current_df, target_time)
-                if feature_row is None:
-                    break
-                
-                X = feature_row[feature_cols]
-                pred = model.predict(X)[0]
-                
-                temp = float(pred[0])
-                humidity = int(np.clip(pred[1], 0, 100))
-                precip = max(float(pred[2]), 0)
-                wind = max(float(pred[3]), 0)
-                pressure = float(pred[4])
-                cloud_cover = float(np.clip(pred[5], 0, 100))
-                weather_code = predict_weather_code(temp, precip, humidity, wind, cloud_cover)
-                uv_index = predict_uv_index(target_time.hour, target_time.month, weather_code)
-                visibility = calculate_visibility(humidity, precip, cloud_cover)
-                
-                hourly_predictions.append({
-                    'temperature_2m': round(temp, 1),
-                    'relative_humidity_2m': humidity,
-                    'precipitation': round(precip, 2),
-                    'wind_speed_10m': round(wind, 1),
-                    'pressure_msl': round(pressure, 1),
-                    'cloud_cover': round(cloud_cover, 1),
-                    'weather_code': weather_code,
-                    'uv_index': uv_index,
-                    'visibility': visibility,
-                    'time': target_time.isoformat()
-                })
-                
-                new_row = pd.DataFrame([{
-                    'timestamp': target_time,
-                    'temperature_2m': temp,
-                    'apparent_temperature': temp,
-                    'relative_humidity_2m': humidity,
-                    'precipitation': precip,
-                    'rain': precip,
-                    'showers': 0,
-                    'cloud_cover': cloud_cover,
-                    'cloud_cover_low': cloud_cover / 3,
-                    'cloud_cover_mid': cloud_cover / 3,
-                    'cloud_cover_high': cloud_cover / 3,
-                    'weather_code': weather_code,
-                    'wind_speed_10m': wind,
-                    'wind_direction_10m': 0,
-                    'wind_gusts_10m': wind * 1.2,
-                    'pressure_msl': pressure,
-                    'shortwave_radiation': 0,
-                    'direct_radiation': 0,
-                    'uv_index': uv_index,
-                    'sunshine_duration': 0
-                }])
-                current_df = pd.concat([current_df, new_row], ignore_index=True)
-            
-            day_data = hourly_predictions[start_idx:end_idx]
-            if not day_data:
-                continue
-            
-            temps = [h['temperature_2m'] for h in day_data]
-            precips = [h['precipitation'] for h in day_data]
-            winds = [h['wind_speed_10m'] for h in day_data]
-            weather_codes = [h['weather_code'] for h in day_data]
-            
-            # Tính toán sunrise/sunset
-            day_date = (now + timedelta(days=day)).date()
-            sunrise = datetime.combine(day_date, datetime.min.time().replace(hour=6, minute=0))
-            sunset = datetime.combine(day_date, datetime.min.time().replace(hour=18, minute=0))
-            
-            daily_forecast.append({
-                'time': day_date.isoformat(),
-                'temperature_2m_max': round(max(temps), 1),
-                'temperature_2m_min': round(min(temps), 1),
-                'precipitation_sum': round(sum(precips), 2),
-                'wind_speed_10m_max': round(max(winds), 1),
-                'weather_code': max(set(weather_codes), key=weather_codes.count),
-                'sunrise': sunrise.isoformat(),
-                'sunset': sunset.isoformat()
-            })
-        
-        return {
-            'predicted_temperature': [h['temperature_2m'] for h in hourly_predictions[:24]],
-            'predicted_humidity': [h['relative_humidity_2m'] for h in hourly_predictions[:24]],
-            'predicted_precipitation': [h['precipitation'] for h in hourly_predictions[:24]],
-            'predicted_wind_speed': [h['wind_speed_10m'] for h in hourly_predictions[:24]],
-            'predicted_pressure': [h['pressure_msl'] for h in hourly_predictions[:24]],
-            'predicted_cloud_cover': [h['cloud_cover'] for h in hourly_predictions[:24]],
-            'predicted_visibility': [h['visibility'] for h in hourly_predictions[:24]],
-            'predicted_weather_code': [h['weather_code'] for h in hourly_predictions[:24]],
-            'predicted_uv_index': [h['uv_index'] for h in hourly_predictions[:24]],
-            'hourly_predictions': hourly_predictions[:24],
-            'daily_forecast': daily_forecast,
-            'prediction_hours': 24
-        }
+        return _run_forecast(snapshot, [state], datetime.now())[0]
+    
+    try:
+        last_observation = latest_observation_time(province_id)
+        if last_observation is None:
+            # Chưa có quan sát: kết quả phụ thuộc current_weather_data, không memo
+            return compute()
+        hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+        key = (province_id, last_observation, snapshot.mode, snapshot.version, hour)
+        return forecast_memo.get_or_compute(key, compute)
         
     except Exception as e:
         print(f"❌ Lỗi trong predict_storm: {e}")
@@ -539,5 +961,48 @@ def predict_storm(province_id, current_weather_data=None):
         traceback.print_exc()
         return {"error": str(e)}
 
-# Load model khi import
-load_model()
\ No newline at end of file
+def predict_storms(province_ids, current_weather_data=None, mode=None):
+    """
+    Dự đoán đồng thời cho nhiều tỉnh (dùng cho cron cập nhật cache)
+    
+    Tất cả tỉnh được đẩy tiến cùng nhau: mỗi giờ dự đoán chỉ gọi
+    model.predict một lần trên ma trận N×F thay vì N lần 1 dòng.
+    
+    Args:
+        province_ids: Danh sách ID tỉnh
+        current_weather_data: Dict {province_id: dữ liệu hiện tại} (tuỳ chọn)
+        mode: 'direct' hoặc 'recursive' (mặc định FORECAST_MODE)
+    
+    Returns:
+        dict {province_id: kết quả cùng định dạng predict_storm}
+    """
+    snapshot = _resolve_mode(mode)
+    if snapshot is None:
+        return {pid: {"error": "Không thể load mô hình"} for pid in province_ids}
+    
+    current_weather_data = current_weather_data or {}
+    results = {}
+    states, state_ids = [], []
+    
+    for pid in province_ids:
+        try:
+            state = _history_state(pid, current_weather_data.get(pid), snapshot.feature_cols)
+            if state is None:
+                results[pid] = {"error": "Không đủ dữ liệu lịch sử"}
+                continue
+            states.append(state)
+            state_ids.append(pid)
+        except Exception as e:
+            print(f"❌ Lỗi khi tải lịch sử tỉnh {pid}: {e}")
+            results[pid] = {"error": str(e)}
+    
+    try:
+        forecasts = _run_forecast(snapshot, states, datetime.now())
+    except Exception as e:
+        print(f"❌ Lỗi trong predict_storms: {e}")
+        import traceback
+        traceback.print_exc()
+        return {pid: results.get(pid, {"error": str(e)}) for pid in province_ids}
+    
+    results.update(zip(state_ids, forecasts))
+    return {pid: results[pid] for pid in province_ids}
@@ -0,0 +1,198 @@
+# services/forecast_ml/rolling_engine.py
+"""
+Tạo lag + rolling features theo nhóm (tỉnh) bằng NumPy, không dùng groupby/lambda.
+
+Dữ liệu đã sort theo (nhóm, thời gian) được tính trên cả cột một lượt; chỉ PAD
+dòng đầu mỗi nhóm (lag/cửa sổ chạm sang nhóm trước) được tính lại trên một mảng
+nhỏ có chèn PAD dòng NaN trước mỗi nhóm:
+    lag k             - một phép dịch
+    sum/count/min/max - nhân đôi cửa sổ: 3 = 1+1+1, 6 = 3+3, 12 = 6+6, 24 = 12+12
+                        (vài phép dịch cho mọi cửa sổ thay vì w phép)
+    std               - từ tổng và tổng bình phương (đã trừ trung bình cột) của cửa sổ
+Ngữ nghĩa giống x.rolling(w, min_periods=1) của pandas: bỏ qua NaN, cửa sổ
+không có giá trị nào -> NaN, std (ddof=1) của cửa sổ 1 giá trị -> NaN.
+min/max/lag trùng từng bit; sum/mean/std chỉ khác thứ tự cộng float64
+(std của cửa sổ toàn giá trị bằng nhau luôn đúng bằng 0).
+Tính trên float64 từng cột, kết quả ghi vào block kiểu `dtype` (mặc định
+schema.FEATURE_DTYPE = float32).
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.schema import FEATURE_DTYPE
+
+
+def group_starts(groups):
+    """Chỉ số dòng đầu tiên của mỗi nhóm liên tiếp (dữ liệu đã sort theo nhóm)."""
+    groups = np.asarray(groups)
+    if len(groups) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+
+def group_positions(groups):
+    """
+    Vị trí của từng dòng trong nhóm liên tiếp.
+
+    Returns:
+        np.ndarray int: 0, 1, 2, ... reset tại đầu mỗi nhóm
+    """
+    starts = group_starts(groups)
+    lengths = np.diff(np.r_[starts, len(groups)])
+    return np.arange(len(groups)) - np.repeat(starts, lengths)
+
+
+def padded_index(groups, pad):
+    """
+    Vị trí của từng dòng trong mảng có đệm (mỗi nhóm có `pad` dòng trống phía trước).
+
+    Returns:
+        (chỉ số int, độ dài mảng có đệm)
+    """
+    starts = group_starts(groups)
+    lengths = np.diff(np.r_[starts, len(groups)])
+    ordinal = np.repeat(np.arange(len(starts)), lengths)
+    return np.arange(len(groups)) + pad * (ordinal + 1), len(groups) + pad * len(starts)
+
+
+def _window_reduce(values, windows, op):
+    """
+    Gộp trượt theo cửa sổ bằng cách nhân đôi (op: np.add / np.minimum / np.maximum).
+
+    Vị trí đầu mảng (chưa đủ w phần tử) chỉ gộp các phần tử có sẵn.
+
+    Returns:
+        dict {w: mảng} với mỗi w trong windows
+    """
+    def combine(result, block, offset):
+        # result[i] = op(result[i], block[i - offset]) cho i >= offset, tại chỗ
+        op(result[offset:], block[:-offset], out=result[offset:])
+
+    # acc[w] = op của w giá trị cuối; dựng dần từ các cửa sổ nhỏ hơn
+    acc = {1: values}
+    for w in sorted(windows):
+        if w not in acc:
+            # Ghép w từ các khối đã có: mỗi lần lấy khối lớn nhất <= phần còn lại
+            size = max(s for s in acc if s <= w)
+            result, covered = acc[size].copy(), size
+            while covered < w:
+                size = max(s for s in acc if s <= w - covered)
+                combine(result, acc[size], covered)
+                covered += size
+            acc[w] = result
+        # Nhân đôi khối giúp các cửa sổ lớn hơn cần ít phép dịch hơn
+        size = w
+        while 2 * size <= max(windows) and 2 * size not in acc:
+            acc[2 * size] = acc[size].copy()
+            combine(acc[2 * size], acc[size], size)
+            size *= 2
+    return {w: acc[w] for w in windows}
+
+
+def rolling_column(x, windows, aggs):
+    """
+    Rolling cho một cột (một nhóm, hoặc nhiều nhóm đã trải ra mảng có đệm).
+
+    Args:
+        x: Mảng float 1 chiều
+        windows: Các kích thước cửa sổ
+        aggs: Tập phép gộp cần tính ('sum', 'mean', 'std', 'min', 'max')
+
+    Returns:
+        dict {(agg, w): mảng}
+    """
+    valid = ~np.isnan(x)
+    result = {}
+    counts = _window_reduce(valid.astype(np.int32), windows, np.add)
+
+    if aggs & {'sum', 'mean'}:
+        sums = _window_reduce(np.where(valid, x, 0.0), windows, np.add)
+    if aggs & {'min', 'std'}:
+        lows = _window_reduce(np.where(valid, x, np.inf), windows, np.minimum)
+    if aggs & {'max', 'std'}:
+        highs = _window_reduce(np.where(valid, x, -np.inf), windows, np.maximum)
+    if 'std' in aggs:
+        # Trừ trung bình toàn cột trước khi bình phương để giảm sai số triệt tiêu
+        centered = np.where(valid, x - np.nanmean(x), 0.0)
+        centered_sums = _window_reduce(centered, windows, np.add)
+        squares = _window_reduce(centered * centered, windows, np.add)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for w in windows:
+            empty = counts[w] == 0
+            if 'sum' in aggs:
+                result[('sum', w)] = np.where(empty, np.nan, sums[w])
+            if 'mean' in aggs:
+                result[('mean', w)] = sums[w] / counts[w]
+            if 'min' in aggs:
+                result[('min', w)] = np.where(empty, np.nan, lows[w])
+            if 'max' in aggs:
+                result[('max', w)] = np.where(empty, np.nan, highs[w])
+            if 'std' in aggs:
+                n = counts[w]
+                variance = (squares[w] - centered_sums[w] ** 2 / n) / (n - 1)
+                std = np.sqrt(np.maximum(variance, 0.0))
+                # Cửa sổ toàn giá trị bằng nhau: std đúng bằng 0
+                std = np.where(lows[w] == highs[w], 0.0, std)
+                result[('std', w)] = np.where(n > 1, std, np.nan)
+    return result
+
+
+def add_lag_rolling_features(df, lags, lag_cols, windows, rolling_specs, group_col='province_id',
+                             dtype=FEATURE_DTYPE):
+    """
+    Thêm lag + rolling features vào DataFrame đã sort theo (group_col, timestamp).
+
+    Tên và thứ tự cột giống vòng lặp groupby cũ trong feature_engineering:
+    lag theo (lag, cột) rồi rolling theo (cửa sổ, spec).
+
+    Args:
+        df: DataFrame đã sort
+        lags: Danh sách độ trễ (giờ)
+        lag_cols: Các cột tạo lag (bỏ qua cột không có trong df)
+        windows: Các cửa sổ rolling
+        rolling_specs: List (tiền tố, cột nguồn, phép gộp)
+        dtype: Kiểu của các cột feature
+
+    Returns:
+        DataFrame mới có thêm các cột feature
+    """
+    pad = max(max(lags), max(windows) - 1)
+    groups = df[group_col].to_numpy()
+    pos = group_positions(groups)
+    # Chỉ `pad` dòng đầu mỗi nhóm có lag/cửa sổ chạm sang nhóm trước: tính lại
+    # riêng các dòng này trên mảng nhỏ có đệm NaN trước mỗi nhóm
+    head = np.flatnonzero(pos < pad)
+    head_index, head_len = padded_index(groups[head], pad)
+
+    lag_cols = [c for c in lag_cols if c in df.columns]
+    names = [f'{col}_lag{k}' for k in lags for col in lag_cols]
+    names += [f'{prefix}_{w}' for w in windows for prefix, _, _ in rolling_specs]
+    # Mỗi feature là một hàng liên tục; DataFrame nhận bản chuyển vị như một block
+    out = np.empty((len(names), len(df)), dtype=dtype)
+    row = {name: i for i, name in enumerate(names)}
+
+    for col in lag_cols:
+        x = df[col].to_numpy(dtype=float)
+        for k in lags:
+            target = out[row[f'{col}_lag{k}']]
+            target[:k] = np.nan
+            target[k:] = x[:-k]
+            target[head[pos[head] < k]] = np.nan
+
+    for col in dict.fromkeys(col for _, col, _ in rolling_specs):
+        aggs = {agg for _, c, agg in rolling_specs if c == col}
+        x = df[col].to_numpy(dtype=float)
+        rolled = rolling_column(x, windows, aggs)
+        head_x = np.full(head_len, np.nan)
+        head_x[head_index] = x[head]
+        head_rolled = rolling_column(head_x, windows, aggs)
+        for w in windows:
+            for prefix, c, agg in rolling_specs:
+                if c == col:
+                    target = out[row[f'{prefix}_{w}']]
+                    target[:] = rolled[(agg, w)]
+                    target[head] = head_rolled[(agg, w)][head_index]
+
+    return pd.concat([df, pd.DataFrame(out.T, index=df.index, columns=names, copy=False)], axis=1)
@@ -0,0 +1,160 @@
+# services/forecast_ml/sql_features.py
+"""
+Đường tính features thứ ba của feature_spec: sinh câu SELECT cho PostgreSQL, tính
+lag / rolling bằng window function ngay trên server.
+
+    {col}_lag{k}   LAG(col, k) OVER (PARTITION BY province_id ORDER BY "timestamp")
+    {prefix}_{w}   AVG/STDDEV_SAMP/MIN/MAX/SUM(col) OVER (… ROWS BETWEEN w-1 PRECEDING
+                   AND CURRENT ROW) - bỏ qua NULL, cửa sổ toàn NULL -> NULL,
+                   stddev của 1 giá trị -> NULL (giống rolling(w, min_periods=1))
+    time features  EXTRACT(…) từ "timestamp" (ISODOW - 1 = dayofweek của pandas)
+    interaction    phép tính trên giá trị thô của dòng
+
+Cột thô được điền FILL_VALUES (COALESCE) trước khi tính, như compute_features.
+Các dòng chưa đủ MIN_HISTORY dòng lịch sử (lag 24 NULL, training sẽ bỏ) được lọc
+ngay trên server; chỉ cột được yêu cầu + FEATURE_NAMES đi qua mạng, nên train trên
+toàn bộ lịch sử nhiều năm không cần tải dữ liệu thô vào bộ nhớ Python.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from data_pipeline.bulk_loader import copy_query
+from data_pipeline.schema import apply_schema
+from services.forecast_ml.feature_spec import (
+    FEATURE_NAMES, INTERACTION_FEATURES, LAG_COLS, LAGS, MIN_HISTORY, ROLLING_FEATURES,
+    ROLLING_WINDOWS, SEASON_MAP, TIME_FEATURES, TIME_OF_DAY_EDGES,
+)
+from services.forecast_ml.feature_store import FILL_VALUES, KEY_COLUMNS, RAW_FILTER, STORE_DTYPES
+
+# Phép gộp rolling -> hàm gộp SQL
+SQL_AGGREGATES = {
+    'mean': 'AVG',
+    'std': 'STDDEV_SAMP',
+    'min': 'MIN',
+    'max': 'MAX',
+    'sum': 'SUM',
+}
+
+
+def _q(column):
+    return f'"{column}"'
+
+
+def _raw_expr(col):
+    """Giá trị thô (double precision) đã điền FILL_VALUES."""
+    expr = f'{_q(col)}::double precision'
+    fill = FILL_VALUES.get(col)
+    if fill is None:
+        return expr
+    if isinstance(fill, str):
+        return f'COALESCE({expr}, {_q(fill)}::double precision)'
+    return f'COALESCE({expr}, {fill})'
+
+
+def _time_exprs(ts='"timestamp"'):
+    """Biểu thức SQL của TIME_FEATURES (cùng quy ước với feature_spec.time_values)."""
+    hour = f'EXTRACT(HOUR FROM {ts})::int'
+    dow = f'(EXTRACT(ISODOW FROM {ts})::int - 1)'
+    month = f'EXTRACT(MONTH FROM {ts})::int'
+    seasons = {}
+    for m, s in SEASON_MAP.items():
+        seasons.setdefault(s, []).append(str(m))
+    season = 'CASE ' + ' '.join(
+        f"WHEN {month} IN ({', '.join(months)}) THEN {s}" for s, months in sorted(seasons.items())
+    ) + ' END'
+    time_of_day = 'CASE ' + ' '.join(
+        f'WHEN {hour} <= {edge} THEN {i}' for i, edge in enumerate(TIME_OF_DAY_EDGES)
+    ) + f' ELSE {len(TIME_OF_DAY_EDGES)} END'
+    exprs = {
+        'hour': hour,
+        'dayofweek': dow,
+        'month': month,
+        'day': f'EXTRACT(DAY FROM {ts})::int',
+        'is_weekend': f'({dow} >= 5)::int',
+        'season': season,
+        'time_of_day': time_of_day,
+    }
+    return {name: exprs[name] for name in TIME_FEATURES}
+
+
+def _interaction_expr(op, cols, divisor):
+    joiner = ' * ' if op == 'product' else ' + '
+    expr = '(' + joiner.join(_q(c) for c in cols) + ')'
+    return f'{expr} / {divisor}' if divisor != 1 else expr
+
+
+def feature_query(columns, where=RAW_FILTER, limit=None):
+    """
+    Câu SELECT trả về KEY_COLUMNS + columns + FEATURE_NAMES, sort theo (province_id, timestamp).
+
+    Args:
+        columns: Cột thô cần trả về (ví dụ cột target), theo thứ tự mong muốn
+        where: Điều kiện lọc weather_data (chuỗi SQL, có thể có %s)
+        limit: Chỉ tính trên `limit` bản ghi mới nhất (thêm một tham số %s sau
+               tham số của where), như load_data_for_training
+
+    Returns:
+        str: Câu SQL
+    """
+    needed = list(dict.fromkeys(
+        list(columns) + LAG_COLS + [src for _, src, _ in ROLLING_FEATURES]
+        + [c for _, cols, _, _ in INTERACTION_FEATURES for c in cols]
+    ))
+    raw_cols = ',\n            '.join(f'{_raw_expr(c)} AS {_q(c)}' for c in needed)
+    raw = f"""
+        SELECT province_id, "timestamp",
+            {raw_cols}
+        FROM weather_data
+        WHERE {where}"""
+    if limit is not None:
+        raw += '\n        ORDER BY "timestamp" DESC LIMIT %s'
+
+    windowed = [f'LAG({_q(col)}, {k}) OVER w AS {_q(f"{col}_lag{k}")}' for k in LAGS for col in LAG_COLS]
+    windowed += [
+        f'{SQL_AGGREGATES[agg]}({_q(src)}) OVER w{win} AS {_q(f"{prefix}_{win}")}'
+        for win in ROLLING_WINDOWS for prefix, src, agg in ROLLING_FEATURES
+    ]
+    windows = ',\n            '.join(
+        ['w AS (PARTITION BY province_id ORDER BY "timestamp")']
+        + [f'w{win} AS (w ROWS BETWEEN {win - 1} PRECEDING AND CURRENT ROW)' for win in ROLLING_WINDOWS]
+    )
+    lagged = ',\n            '.join(windowed)
+
+    computed = _time_exprs()
+    computed.update({
+        name: _interaction_expr(op, cols, divisor) for name, cols, op, divisor in INTERACTION_FEATURES
+    })
+    select = [_q(c) for c in KEY_COLUMNS + list(columns)]
+    select += [f'{computed[name]} AS {_q(name)}' if name in computed else _q(name) for name in FEATURE_NAMES]
+    select_sql = ',\n        '.join(select)
+
+    return f"""
+    WITH raw AS ({raw}
+    ), windowed AS (
+        SELECT raw.*,
+            {lagged},
+            ROW_NUMBER() OVER w AS _row
+        FROM raw
+        WINDOW {windows}
+    )
+    SELECT {select_sql}
+    FROM windowed
+    WHERE _row >= {MIN_HISTORY}
+    ORDER BY province_id, "timestamp"
+    """
+
+
+def load_sql_features(conn, columns, where=RAW_FILTER, params=None, limit=None):
+    """
+    Chạy feature_query qua COPY và trả về DataFrame có kiểu (float32 / int8 / category).
+
+    Returns:
+        DataFrame cùng dạng với compute_features (chỉ các cột được yêu cầu)
+    """
+    params = list(params or [])
+    if limit is not None:
+        params.append(limit)
+    df = copy_query(conn, feature_query(columns, where, limit), params or None, dtypes=STORE_DTYPES)
+    return apply_schema(df)
@@ -0,0 +1,294 @@
+# services/forecast_ml/training_farm.py
+"""
+Train đồng loạt mô hình riêng cho từng tỉnh (như retrain_for_province) và mô hình
+chung trên một process pool.
+
+- Dữ liệu được tải MỘT lần ở process chính (feature store, fallback dữ liệu thô),
+  ghi ra file .npy float32 theo tỉnh; worker mở bằng np.load(mmap_mode='r') nên
+  các process dùng chung page cache thay vì mỗi process query lại DB.
+- Tổng số luồng bị chặn: workers × nthread ≤ số CPU (XGBoost n_jobs = nthread,
+  thread pool BLAS/OpenMP trong worker cũng bị giới hạn bằng threadpoolctl).
+- Job lớn nhất (mô hình chung) chạy trước, sau đó các tỉnh theo số dòng giảm dần.
+- Kết quả (thời gian, số dòng, metrics từng tỉnh) ghi vào models/farm/summary-*.json.
+
+Chạy:
+    python services/forecast_ml/training_farm.py
+    python services/forecast_ml/training_farm.py --workers 4 --province-id 1 --province-id 2
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from data_pipeline.data_storage import connect_to_db, get_provinces_from_db
+from services.forecast_ml.model_training import (
+    DIRECT_HORIZONS, DIRECT_MODEL_PATH, MODEL_DIR, MODEL_PATH, TARGET_COLS,
+    build_model, load_training_frame, make_training_set, feature_engineering,
+    save_model_files, target_metrics
+)
+from services.forecast_ml.model_registry import publish_version
+
+FARM_DIR = os.path.join(MODEL_DIR, 'farm')
+# Số dòng mới nhất cho mô hình chung (giống train())
+GLOBAL_ROWS = 500000
+# Tỷ lệ tập test (phần cuối theo thời gian)
+TEST_SIZE = 0.2
+
+
+def plan_threads(workers=None, n_jobs=None, cores=None):
+    """
+    Chia CPU cho pool: workers × nthread ≤ cores.
+
+    Args:
+        workers: Số process mong muốn (mặc định = số CPU)
+        n_jobs: Số job cần chạy (không tạo nhiều worker hơn số job)
+        cores: Số CPU (mặc định os.cpu_count())
+
+    Returns:
+        (workers, nthread)
+    """
+    cores = cores or os.cpu_count() or 1
+    workers = max(1, min(workers or cores, cores, n_jobs or cores))
+    return workers, max(1, cores // workers)
+
+
+def province_model_path(province_id):
+    """Đường dẫn mô hình riêng của một tỉnh (cùng tên với retrain_for_province)."""
+    return os.path.join(MODEL_DIR, f'weather_xgboost_province_{province_id}.pkl')
+
+
+# ----------------------------------------------------------------------------
+# Chuẩn bị dữ liệu dùng chung
+# ----------------------------------------------------------------------------
+
+def prepare_shared_data(conn, province_ids, data_dir, horizons=None, use_feature_store=True):
+    """
+    Tải dữ liệu từng tỉnh, tạo X / y và ghi ra data_dir/{X,y,ts}_{tỉnh}.npy.
+
+    Returns:
+        dict {'feature_cols', 'target_cols', 'provinces': {tỉnh: số dòng}}
+    """
+    meta = {'feature_cols': None, 'target_cols': None, 'provinces': {}}
+    for pid in province_ids:
+        df, has_features = load_training_frame(conn, province_id=pid, limit=GLOBAL_ROWS,
+                                               use_feature_store=use_feature_store)
+        if df is None or len(df) < 1000:
+            print(f"⚠️  Tỉnh {pid}: không đủ dữ liệu, bỏ qua")
+            continue
+        X, y, feature_cols = (make_training_set if has_features else feature_engineering)(df, horizons=horizons)
+        if meta['feature_cols'] is None:
+            meta['feature_cols'], meta['target_cols'] = feature_cols, list(y.columns)
+        elif feature_cols != meta['feature_cols']:
+            raise ValueError(f"Tỉnh {pid}: danh sách features khác các tỉnh trước")
+
+        np.save(os.path.join(data_dir, f'X_{pid}.npy'), X.to_numpy(dtype=np.float32))
+        np.save(os.path.join(data_dir, f'y_{pid}.npy'), y.to_numpy(dtype=np.float32))
+        np.save(os.path.join(data_dir, f'ts_{pid}.npy'), df.loc[X.index, 'timestamp'].to_numpy('datetime64[s]'))
+        meta['provinces'][pid] = len(X)
+    return meta
+
+
+def _open(data_dir, name, pid):
+    return np.load(os.path.join(data_dir, f'{name}_{pid}.npy'), mmap_mode='r')
+
+
+def _global_rows(data_dir, province_rows, limit):
+    """
+    X / y của mô hình chung: `limit` dòng mới nhất trên mọi tỉnh, sắp theo thời gian
+    (cùng giờ thì theo tỉnh) để phần cuối là các giờ mới nhất của mọi tỉnh.
+    """
+    pids = list(province_rows)
+    timestamps = np.concatenate([_open(data_dir, 'ts', pid) for pid in pids])
+    if len(timestamps) > limit:
+        cutoff = np.partition(timestamps, len(timestamps) - limit)[len(timestamps) - limit]
+    else:
+        cutoff = timestamps.min()
+    X, y, ts = [], [], []
+    for pid in pids:
+        keep = _open(data_dir, 'ts', pid) >= cutoff
+        X.append(_open(data_dir, 'X', pid)[keep])
+        y.append(_open(data_dir, 'y', pid)[keep])
+        ts.append(_open(data_dir, 'ts', pid)[keep])
+    order = np.argsort(np.concatenate(ts), kind='stable')
+    return np.concatenate(X)[order], np.concatenate(y)[order]
+
+
+# ----------------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------------
+
+def _limit_threads(nthread):
+    """Initializer của worker: chặn thread pool BLAS/OpenMP."""
+    os.environ['OMP_NUM_THREADS'] = str(nthread)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(nthread)
+    except ImportError:
+        pass
+
+
+def train_job(job):
+    """
+    Train một mô hình trong worker (job là dict, xem run_farm).
+
+    Returns:
+        dict tóm tắt: name, rows, n_train, n_test, seconds, metrics, version, error
+    """
+    start = time.perf_counter()
+    summary = {'name': job['name'], 'province_id': job['province_id'], 'save_path': job['save_path']}
+    try:
+        if job['province_id'] is None:
+            X, y = _global_rows(job['data_dir'], job['province_rows'], job['global_rows'])
+        else:
+            X = _open(job['data_dir'], 'X', job['province_id'])
+            y = _open(job['data_dir'], 'y', job['province_id'])
+
+        # Dòng đã theo thứ tự thời gian (mô hình chung: xem _global_rows): phần cuối làm tập test
+        split = int(len(X) * (1 - TEST_SIZE))
+        X_train = pd.DataFrame(X[:split], columns=job['feature_cols'], copy=False)
+        X_test = pd.DataFrame(X[split:], columns=job['feature_cols'], copy=False)
+        y_train, y_test = y[:split], y[split:]
+
+        direct = job['mode'] == 'direct'
+        model = build_model(direct, n_jobs=job['nthread'])
+        model.fit(X_train, y_train)
+        metrics = target_metrics(y_test, model.predict(X_test))
+
+        save_model_files(model, job['feature_cols'], job['save_path'], job['mode'],
+                         job['horizons'], job['model_format'])
+        if job['publish']:
+            summary['version'] = publish_version(model, job['feature_cols'], job['mode'], manifest={
+                'target_cols': TARGET_COLS,
+                'province_id': job['province_id'],
+                'n_train': len(X_train),
+                'n_test': len(X_test),
+                'metrics': metrics,
+                'horizons': job['horizons'],
+            })
+        summary.update(rows=len(X), n_train=len(X_train), n_test=len(X_test), metrics=metrics)
+    except Exception as e:
+        summary['error'] = f'{type(e).__name__}: {e}'
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+# ----------------------------------------------------------------------------
+# Điều phối
+# ----------------------------------------------------------------------------
+
+def run_farm(province_ids=None, workers=None, mode='recursive', include_global=True,
+             publish_global=True, model_format='both', use_feature_store=True, data_dir=None):
+    """
+    Train mọi mô hình tỉnh (+ mô hình chung) song song.
+
+    Args:
+        province_ids: Danh sách tỉnh (None = mọi tỉnh trong bảng provinces)
+        workers: Số process (mặc định = số CPU); nthread = cores // workers
+        mode: 'recursive' hoặc 'direct'
+        include_global: Train thêm mô hình chung trên dữ liệu mọi tỉnh
+        publish_global: Đăng mô hình chung lên registry (active)
+        data_dir: Thư mục ghi file .npy dùng chung (mặc định thư mục tạm, xoá khi xong)
+
+    Returns:
+        dict tóm tắt (cũng được ghi ra FARM_DIR/summary-*.json)
+    """
+    started = time.perf_counter()
+    horizons = DIRECT_HORIZONS if mode == 'direct' else None
+    own_dir = data_dir is None
+    data_dir = data_dir or tempfile.mkdtemp(prefix='training-farm-')
+    os.makedirs(FARM_DIR, exist_ok=True)
+
+    try:
+        print("\n📥 Đang tải dữ liệu (một lần cho mọi worker)...")
+        conn = connect_to_db()
+        if conn is None:
+            return None
+        try:
+            if province_ids is None:
+                province_ids = [p[0] for p in get_provinces_from_db(conn)]
+            load_start = time.perf_counter()
+            meta = prepare_shared_data(conn, province_ids, data_dir, horizons, use_feature_store)
+            load_seconds = time.perf_counter() - load_start
+        finally:
+            conn.close()
+        if not meta['provinces']:
+            print("❌ Không có tỉnh nào đủ dữ liệu")
+            return None
+
+        base = {
+            'data_dir': data_dir, 'feature_cols': meta['feature_cols'], 'mode': mode,
+            'horizons': horizons, 'model_format': model_format, 'province_rows': meta['provinces'],
+            'global_rows': GLOBAL_ROWS,
+        }
+        jobs = []
+        if include_global:
+            jobs.append(dict(base, name='global', province_id=None, publish=publish_global,
+                             save_path=DIRECT_MODEL_PATH if mode == 'direct' else MODEL_PATH))
+        for pid, _ in sorted(meta['provinces'].items(), key=lambda item: -item[1]):
+            jobs.append(dict(base, name=f'province_{pid}', province_id=pid, publish=False,
+                             save_path=province_model_path(pid)))
+
+        workers, nthread = plan_threads(workers, len(jobs))
+        print(f"🚀 {len(jobs)} mô hình trên {workers} worker × {nthread} luồng")
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads,
+                                 initargs=(nthread,)) as pool:
+            futures = [pool.submit(train_job, dict(job, nthread=nthread)) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if 'error' in result:
+                    print(f"   ❌ {result['name']}: {result['error']}")
+                else:
+                    temp = result['metrics'][TARGET_COLS[0]]
+                    print(f"   ✅ {result['name']:<14} {result['rows']:>8} dòng  {result['seconds']:>7.1f}s  "
+                          f"MAE nhiệt độ {temp['mae']:.3f}  R² {temp['r2']:.3f}")
+    finally:
+        if own_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    summary = {
+        'created_at': datetime.now().isoformat(),
+        'mode': mode,
+        'cores': os.cpu_count(),
+        'workers': workers,
+        'nthread': nthread,
+        'load_seconds': round(load_seconds, 2),
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'failed': sorted(r['name'] for r in results if 'error' in r),
+        'models': sorted(results, key=lambda r: (r['province_id'] is not None, r['province_id'] or 0)),
+    }
+    path = os.path.join(FARM_DIR, f"summary-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Xong {len(results) - len(summary['failed'])}/{len(results)} mô hình "
+          f"trong {summary['wall_seconds']:.1f}s — tóm tắt: {path}")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train song song mô hình cho mọi tỉnh')
+    parser.add_argument('--workers', type=int, help='Số process (mặc định = số CPU)')
+    parser.add_argument('--mode', choices=['recursive', 'direct'], default='recursive')
+    parser.add_argument('--province-id', type=int, action='append', help='Chỉ train các tỉnh này')
+    parser.add_argument('--no-global', action='store_true', help='Không train mô hình chung')
+    parser.add_argument('--no-publish', action='store_true', help='Không đăng mô hình chung lên registry')
+    parser.add_argument('--format', choices=['pickle', 'native', 'both'], default='both')
+    parser.add_argument('--from-raw', action='store_true', help='Tính features từ dữ liệu thô')
+    args = parser.parse_args()
+
+    summary = run_farm(province_ids=args.province_id, workers=args.workers, mode=args.mode,
+                       include_global=not args.no_global, publish_global=not args.no_publish,
+                       model_format=args.format, use_feature_store=not args.from_raw)
+    sys.exit(0 if summary and not summary['failed'] else 1)
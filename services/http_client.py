@@ -0,0 +1,183 @@
+# services/http_client.py
+"""
+HTTP client dùng chung cho mọi lời gọi ra ngoài (Open-Meteo, Open-Meteo archive, WAQI).
+
+Một requests.Session cho cả process:
+    - connection pool theo host, keep-alive (không bắt tay TCP + TLS lại mỗi lần gọi)
+    - timeout (connect, read) mặc định theo host, ghi đè được từng lời gọi
+    - retry lỗi kết nối / 429 / 5xx với backoff luỹ thừa có jitter (tôn trọng Retry-After);
+      hết lượt retry thì trả về response cuối để raise_for_status() xử lý như trước
+    - metrics theo host: số lời gọi, lỗi, retry, mã trạng thái, p50 / p99, số kết nối đã mở
+
+    from services import http_client
+    data = http_client.get_json(url, params=params)
+    resp = http_client.get(url, timeout=5)
+    data = http_client.get_json(url, retries=0)   # người gọi tự có chính sách retry riêng
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.fanout import LatencyTracker
+
+# Timeout (connect, read) theo host; host khác dùng DEFAULT_TIMEOUT
+DEFAULT_TIMEOUT = (3.05, 10)
+HOST_TIMEOUTS = {
+    'api.open-meteo.com': (3.05, 10),
+    'archive-api.open-meteo.com': (3.05, 60),   # Khoảng thời gian dài trả về JSON lớn
+    'api.waqi.info': (3.05, 5),
+}
+
+# Số kết nối giữ sẵn cho mỗi host (>= số thread fan-out gọi cùng host)
+POOL_HOSTS = 8
+POOL_SIZE = 16
+
+# Retry: lần chờ thứ n = BACKOFF_FACTOR * 2^(n-1) + uniform(0, BACKOFF_JITTER), tối đa BACKOFF_MAX
+RETRIES = 2
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.5
+BACKOFF_MAX = 10
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+USER_AGENT = 'weather-project/1.0'
+
+_sessions = {}   # số lượt retry -> Session
+_session_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+LATENCY = LatencyTracker()
+
+
+def build_retry(retries=RETRIES):
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=BACKOFF_FACTOR,
+        backoff_jitter=BACKOFF_JITTER,
+        backoff_max=BACKOFF_MAX,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def build_session(retries=RETRIES, pool_size=POOL_SIZE):
+    """Session mới có adapter pool + retry cho http / https."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size,
+                          max_retries=build_retry(retries), pool_block=False)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def get_session(retries=RETRIES):
+    """Session dùng chung cho số lượt retry này (tạo lần đầu khi cần, thread-safe)."""
+    session = _sessions.get(retries)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(retries)
+            if session is None:
+                session = _sessions[retries] = build_session(retries)
+    return session
+
+
+def close():
+    """Đóng mọi kết nối (session mới được tạo ở lần gọi sau)."""
+    with _session_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _host_metrics(host):
+    with _metrics_lock:
+        if host not in _metrics:
+            _metrics[host] = {'requests': 0, 'errors': 0, 'retries': 0, 'status': {}}
+        return _metrics[host]
+
+
+def request(method, url, timeout=None, retries=RETRIES, **kwargs):
+    """
+    Gửi request qua session dùng chung.
+
+    Args:
+        timeout: Số giây hoặc (connect, read); None = theo HOST_TIMEOUTS
+        retries: Số lượt retry (0 = không retry, để người gọi tự xử lý như 429)
+        **kwargs: Như requests.Session.request (params, headers…)
+
+    Returns:
+        requests.Response (raise requests.RequestException nếu lỗi kết nối / timeout)
+    """
+    host = urlsplit(url).hostname or ''
+    if timeout is None:
+        timeout = HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+    stats = _host_metrics(host)
+    start = time.perf_counter()
+    try:
+        response = get_session(retries).request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        with _metrics_lock:
+            stats['requests'] += 1
+            stats['errors'] += 1
+        LATENCY.record(host, time.perf_counter() - start)
+        raise
+    retries = getattr(getattr(response.raw, 'retries', None), 'history', ()) or ()
+    with _metrics_lock:
+        stats['requests'] += 1
+        stats['retries'] += len(retries)
+        stats['status'][response.status_code] = stats['status'].get(response.status_code, 0) + 1
+        if response.status_code >= 400:
+            stats['errors'] += 1
+    LATENCY.record(host, time.perf_counter() - start)
+    return response
+
+
+def get(url, params=None, timeout=None, retries=RETRIES, **kwargs):
+    return request('GET', url, params=params, timeout=timeout, retries=retries, **kwargs)
+
+
+def get_json(url, params=None, timeout=None, retries=RETRIES, **kwargs):
+    """GET, raise_for_status() rồi trả về JSON."""
+    response = get(url, params=params, timeout=timeout, retries=retries, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+def stats():
+    """
+    Metrics theo host: requests, errors, retries, status, p50_ms / p99_ms và
+    connections (số kết nối TCP đã mở - nhỏ hơn nhiều so với requests khi keep-alive).
+    """
+    latency = LATENCY.percentiles()
+    opened = {}
+    with _session_lock:
+        sessions = list(_sessions.values())
+    for session in sessions:
+        for adapter in set(session.adapters.values()):
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    opened[pool.host] = opened.get(pool.host, 0) + pool.num_connections
+    with _metrics_lock:
+        result = {host: dict(m, status=dict(m['status'])) for host, m in _metrics.items()}
+    for host, m in result.items():
+        m['connections'] = opened.get(host, 0)
+        if host in latency:
+            m.update(p50_ms=latency[host]['p50_ms'], p99_ms=latency[host]['p99_ms'])
+    return result
+
+
+def reset_stats():
+    with _metrics_lock:
+        _metrics.clear()
+    LATENCY.clear()
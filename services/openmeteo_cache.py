@@ -0,0 +1,305 @@
+# services/openmeteo_cache.py
+"""
+Cache response Open-Meteo (forecast) theo giờ, stale-while-revalidate.
+
+Khoá: (endpoint, lat, lon, tập biến hourly / daily / current, timezone, tham số khác).
+Mỗi entry luôn được tải với forecast_days = FETCH_DAYS (16) rồi cắt theo `days`
+của từng request: một entry 16 ngày trả lời mọi request days ngắn hơn
+(trang chủ days=1, trang dự báo days=7 dùng chung một lần gọi).
+
+Vòng đời entry:
+    fresh  - tới mốc giờ tròn kế tiếp sau lúc tải (dữ liệu Open-Meteo đổi theo giờ)
+    stale  - thêm STALE_SECONDS: trả ngay dữ liệu cũ, một thread nền tải lại
+             (mỗi khoá chỉ một lần tải lại cùng lúc)
+    hết    - tải đồng bộ; các request cùng khoá chờ chung một lần tải
+
+Lớp 1 là bộ nhớ process; lớp 2 (tuỳ chọn, dùng chung giữa các worker) chọn bằng
+biến môi trường OPENMETEO_CACHE:
+    file:///var/cache/openmeteo     - thư mục JSON
+    redis://localhost:6379/0        - Redis (hoặc server tương thích, cần gói redis)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services import http_client
+
+FETCH_DAYS = 16                 # forecast_days tối đa của Open-Meteo
+STALE_SECONDS = 3600            # Thời gian được trả dữ liệu cũ sau khi hết hạn
+MEMORY_ENTRIES = 512            # 63 tỉnh × vài tập biến
+WAIT_SECONDS = 15               # Thời gian tối đa chờ lần tải của request khác
+BUCKET_SECONDS = 3600
+SHARED_CACHE = os.environ.get('OPENMETEO_CACHE')
+
+# Tham số mảng: hourly cắt theo giờ, daily theo ngày
+_PER_HOUR = ('hourly', 24)
+_PER_DAY = ('daily', 1)
+
+
+def cache_key(url, params):
+    """Khoá cache (chuỗi) từ URL + tham số, bỏ forecast_days; biến được sort."""
+    items = []
+    for name, value in sorted(params.items()):
+        if name == 'forecast_days':
+            continue
+        if name in ('hourly', 'daily', 'current'):
+            value = ','.join(sorted(str(value).split(',')))
+        elif name in ('latitude', 'longitude'):
+            value = f'{float(value):.4f}'
+        items.append(f'{name}={value}')
+    return f"{url}?{'&'.join(items)}"
+
+
+def bucket_expiry(fetched_at):
+    """Mốc giờ tròn kế tiếp sau fetched_at (epoch giây)."""
+    return (int(fetched_at) // BUCKET_SECONDS + 1) * BUCKET_SECONDS
+
+
+def slice_days(data, days):
+    """Bản sao response (các dict con cũng được sao) chỉ giữ `days` ngày đầu của hourly / daily."""
+    result = {k: dict(v) if isinstance(v, dict) else v for k, v in data.items()}
+    for block, per_day in (_PER_HOUR, _PER_DAY):
+        values = data.get(block)
+        if isinstance(values, dict):
+            n = days * per_day
+            result[block] = {k: v[:n] if isinstance(v, list) else v for k, v in values.items()}
+    return result
+
+
+# ----------------------------------------------------------------------------
+# Lớp lưu trữ
+# ----------------------------------------------------------------------------
+
+class MemoryBackend:
+    """LRU trong process."""
+
+    def __init__(self, maxsize=MEMORY_ENTRIES):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class FileBackend:
+    """Mỗi khoá một file JSON (ghi nguyên tử), dùng chung giữa các process."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('key') == key else None
+
+    def set(self, key, entry):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dict(entry, key=key), f)
+        os.replace(tmp, path)
+
+
+class RedisBackend:
+    """Redis (hoặc server tương thích giao thức Redis); key tự hết hạn sau vùng stale."""
+
+    def __init__(self, url, prefix='openmeteo:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, entry):
+        ttl = max(1, int(entry['expires'] + STALE_SECONDS - time.time()))
+        self.client.set(self.prefix + key, json.dumps(entry), ex=ttl)
+
+
+def make_backend(url):
+    """Lớp 2 từ OPENMETEO_CACHE (None nếu không cấu hình / không dùng được)."""
+    if not url:
+        return None
+    try:
+        if url.startswith('file://'):
+            return FileBackend(url[len('file://'):])
+        if url.startswith(('redis://', 'rediss://', 'unix://')):
+            return RedisBackend(url)
+    except ImportError:
+        print("⚠️  Chưa cài gói redis, cache Open-Meteo chỉ dùng bộ nhớ process")
+        return None
+    except Exception as e:
+        print(f"⚠️  Không dùng được cache chung {url}: {e}")
+        return None
+    print(f"⚠️  OPENMETEO_CACHE không hợp lệ: {url}")
+    return None
+
+
+# ----------------------------------------------------------------------------
+# Cache
+# ----------------------------------------------------------------------------
+
+class ResponseCache:
+    """
+    Cache response JSON theo giờ với stale-while-revalidate và gộp các lần tải trùng.
+
+    Args:
+        fetch: Hàm (url, params, timeout) -> dict (mặc định http_client.get_json)
+        shared: Lớp 2 tuỳ chọn (FileBackend / RedisBackend)
+    """
+
+    def __init__(self, fetch=None, shared=None, maxsize=MEMORY_ENTRIES):
+        self.fetch = fetch or (lambda url, params, timeout: http_client.get_json(url, params=params,
+                                                                                 timeout=timeout))
+        self.memory = MemoryBackend(maxsize)
+        self.shared = shared
+        self._inflight = {}   # khoá -> threading.Event của lần tải đang chạy
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if self.shared is not None and (entry is None or time.time() >= entry['expires']):
+            # Worker khác có thể đã tải bản mới hơn
+            try:
+                shared = self.shared.get(key)
+            except Exception as e:
+                print(f"⚠️  Lỗi đọc cache chung: {e}")
+                shared = None
+            if shared is not None and (entry is None or shared['fetched_at'] > entry['fetched_at']):
+                entry = shared
+                self.memory.set(key, entry)
+        return entry
+
+    def _load(self, key, url, params, timeout):
+        """Tải FETCH_DAYS ngày và lưu entry (người gọi đang giữ lượt tải của key)."""
+        fetched_at = time.time()
+        data = self.fetch(url, dict(params, forecast_days=FETCH_DAYS), timeout)
+        entry = {'data': data, 'fetched_at': fetched_at, 'expires': bucket_expiry(fetched_at)}
+        self.memory.set(key, entry)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, entry)
+            except Exception as e:
+                print(f"⚠️  Lỗi ghi cache chung: {e}")
+        return entry
+
+    def _claim(self, key):
+        """(event, True) nếu lượt tải thuộc về người gọi, (event đang chạy, False) nếu không."""
+        with self._lock:
+            event = self._inflight.get(key)
+            if event is not None:
+                return event, False
+            event = self._inflight[key] = threading.Event()
+            return event, True
+
+    def _release(self, key, event):
+        with self._lock:
+            self._inflight.pop(key, None)
+        event.set()
+
+    def _refresh(self, key, url, params, timeout):
+        event, owner = self._claim(key)
+        if not owner:
+            return
+
+        def run():
+            try:
+                self._load(key, url, params, timeout)
+                self._count('refreshes')
+            except Exception as e:
+                self._count('errors')
+                print(f"⚠️  Làm mới cache Open-Meteo lỗi ({key}): {e}")
+            finally:
+                self._release(key, event)
+
+        threading.Thread(target=run, name='openmeteo-refresh', daemon=True).start()
+
+    def get(self, url, params, timeout=None):
+        """
+        Response cho params (forecast_days trong params = số ngày cần, mặc định 7).
+
+        Returns:
+            dict JSON đã cắt theo số ngày (bản sao, sửa thoải mái)
+        """
+        days = min(int(params.get('forecast_days', 7)), FETCH_DAYS)
+        key = cache_key(url, params)
+        now = time.time()
+
+        entry = self._lookup(key)
+        if entry is not None and now < entry['expires']:
+            self._count('hits')
+        elif entry is not None and now < entry['expires'] + STALE_SECONDS:
+            self._count('stale')
+            self._refresh(key, url, params, timeout)
+        else:
+            self._count('misses')
+            entry = self._get_blocking(key, url, params, timeout)
+        return slice_days(entry['data'], days)
+
+    def _get_blocking(self, key, url, params, timeout):
+        while True:
+            event, owner = self._claim(key)
+            if owner:
+                try:
+                    return self._load(key, url, params, timeout)
+                except Exception:
+                    self._count('errors')
+                    raise
+                finally:
+                    self._release(key, event)
+            # Request khác đang tải cùng khoá: chờ rồi dùng kết quả của nó
+            event.wait(WAIT_SECONDS if timeout is None else timeout)
+            entry = self.memory.get(key)
+            if entry is not None and time.time() < entry['expires'] + STALE_SECONDS:
+                return entry
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, inflight=len(self._inflight))
+
+    def clear(self):
+        self.memory.clear()
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+CACHE = ResponseCache(shared=make_backend(SHARED_CACHE))
+
+
+def get_forecast(url, params, timeout=None):
+    """Response Open-Meteo forecast qua CACHE."""
+    return CACHE.get(url, params, timeout)
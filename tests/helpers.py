@@ -0,0 +1,78 @@
+# tests/helpers.py
+"""Dữ liệu và đối tượng giả dùng chung cho các file test."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sklearn.multioutput import MultiOutputRegressor
+from xgboost import XGBRegressor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml.feature_spec import HISTORY_COLUMNS, build_features
+
+
+def make_history(hours=48, seed=0):
+    """Tạo lịch sử giả lập cho một tỉnh."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 6, 1)
+    df = pd.DataFrame({col: rng.uniform(0, 100, hours) for col in HISTORY_COLUMNS})
+    df['temperature_2m'] = 25 + 5 * np.sin(np.arange(hours) / 4) + rng.normal(0, 0.5, hours)
+    df['pressure_msl'] = 1010 + rng.normal(0, 2, hours)
+    df['precipitation'] = np.where(rng.random(hours) > 0.7, rng.uniform(0, 10, hours), 0)
+    df.insert(0, 'timestamp', [start + timedelta(hours=i) for i in range(hours)])
+    return df
+
+
+def reference_feature_cols(df):
+    """Toàn bộ features mà feature_spec tạo được từ lịch sử (kể cả cột thô)."""
+    batch = build_features(df.assign(province_id=1), dtype=np.float64)
+    return [c for c in batch.columns if c not in ['timestamp', 'province_id']]
+
+
+def train_small_model(n_rows=300, n_features=8, n_targets=3):
+    rng = np.random.default_rng(0)
+    cols = [f'f{i}' for i in range(n_features)]
+    X = pd.DataFrame(rng.normal(size=(n_rows, n_features)), columns=cols)
+    y = pd.DataFrame(rng.normal(size=(n_rows, n_targets)))
+    model = MultiOutputRegressor(XGBRegressor(n_estimators=20, max_depth=3, verbosity=0))
+    model.fit(X, y)
+    return model, X, cols
+
+
+class FakeCursor:
+    """Cursor giả: COPY trả về CSV của bảng, ghi từng mẩu nhỏ như psycopg2."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, sql, params):
+        return (sql % tuple(repr(p) for p in params)).encode('utf-8')
+
+    def copy_expert(self, sql, file):
+        self.conn.statements.append(sql)
+        data = self.conn.table.to_csv(index=False, date_format='%Y-%m-%d %H:%M:%S').encode('utf-8')
+        for start in range(0, len(data), 777):
+            file.write(data[start:start + 777])
+
+
+class FakeConn:
+    def __init__(self, table):
+        self.table = table
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from data_pipeline.schema import db_values
+from services import aqi_store
+
+
+def waqi_payload(aqi, pm25=None):
+    iaqi = {'t': {'v': 30}}
+    if pm25 is not None:
+        iaqi['pm25'] = {'v': pm25}
+    return {'status': 'ok', 'data': {'aqi': aqi, 'iaqi': iaqi, 'time': {'s': '2024-06-01 10:23:00'},
+                                     'city': {'name': 'Hanoi'}}}
+
+
+def test_parse_reading():
+    reading = aqi_store.parse_reading(waqi_payload(87, pm25=87))
+    assert reading == {'index': 87, 'components': {'pm2_5': 87}, 'time': '2024-06-01T10:00:00',
+                       'station': 'Hanoi'}
+    assert aqi_store.parse_reading(waqi_payload('-')) is None
+    assert aqi_store.parse_reading({'status': 'error', 'data': 'Unknown station'}) is None
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(aqi_store, 'AQI_REFRESH_INTERVAL', 0)
+    monkeypatch.setattr(aqi_store, '_snapshot', {})
+    written = []
+    monkeypatch.setattr(aqi_store, 'insert_air_quality_data', lambda conn, df: written.append(df))
+    return written
+
+
+def test_refresh_bounded_and_stored(store):
+    provinces = [(pid, f'P{pid}', 10.0 + pid, 105.0) for pid in range(1, 64)]
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def fetch(lat, lon):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.005)
+        with lock:
+            active[0] -= 1
+        if lat == 13.0:
+            raise ConnectionError('timeout')
+        return aqi_store.parse_reading(waqi_payload(int(lat), pm25=lat + 0.5))
+
+    readings = aqi_store.refresh(object(), provinces, concurrency=4, fetch=fetch)
+    assert len(readings) == 62 and 3 not in readings
+    assert 1 < peak[0] <= 4
+    assert aqi_store.status()['failed'] == 1
+
+    df = store[0]
+    assert list(df.columns) == aqi_store.AQI_COLUMNS and len(df) == 62
+    row = db_values(df)[0]
+    assert row[0] == 1 and row[2] == 11.0 and row[3] == 11.5 and row[4] is None
+
+    # Request chỉ đọc snapshot
+    assert aqi_store.get_aqi(2)['index'] == 12
+    assert aqi_store.get_aqi(3) is None
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from data_pipeline.bulk_loader import build_select, copy_query, load_table
+from helpers import FakeConn
+
+
+def make_table(rows=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=rows, freq='h'),
+        'province_id': rng.integers(1, 64, rows),
+        'temperature_2m': rng.normal(25, 5, rows).round(2),
+        'weather_code': rng.choice([0, 1, 3, 61], rows).astype(float),
+    })
+    df.loc[df.sample(frac=0.1, random_state=seed).index, 'weather_code'] = np.nan
+    return df
+
+
+def test_copy_query_typed_columns_across_chunks():
+    table = make_table()
+    conn = FakeConn(table)
+    df = copy_query(conn, 'SELECT * FROM weather_data WHERE province_id = %s', [5], chunk_bytes=4096)
+
+    assert conn.statements[0].startswith('COPY (SELECT * FROM weather_data WHERE province_id = 5)')
+    assert df['province_id'].dtype == np.int16
+    assert df['temperature_2m'].dtype == np.float32
+    assert df['weather_code'].dtype == np.float32
+    assert df['timestamp'].equals(table['timestamp'])
+    np.testing.assert_array_equal(df['province_id'], table['province_id'])
+    np.testing.assert_allclose(df['temperature_2m'], table['temperature_2m'], rtol=1e-6)
+    np.testing.assert_array_equal(df['weather_code'].isna(), table['weather_code'].isna())
+
+
+def test_load_table_projection_and_empty_result():
+    conn = FakeConn(make_table(rows=0)[['timestamp', 'temperature_2m']])
+    df = load_table(conn, 'weather_data', columns=['timestamp', 'temperature_2m'],
+                    where='province_id = %s', params=[1], order_by='"timestamp" DESC', limit=168)
+
+    assert conn.statements[0] == (
+        'COPY (SELECT "timestamp", temperature_2m FROM weather_data WHERE province_id = 1 '
+        'ORDER BY "timestamp" DESC LIMIT 168) TO STDOUT WITH (FORMAT csv, HEADER true)'
+    )
+    assert list(df.columns) == ['timestamp', 'temperature_2m'] and len(df) == 0
+    assert build_select('t', ['a']) == 'SELECT a FROM t'
@@ -0,0 +1,133 @@
+import itertools
+import os
+import sys
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import predictor
+
+WEATHER_CODES = [0, 1, 2, 3, 45, 51, 61, 63, 65, 95]
+
+
+def sample_inputs(n=5000, seed=0):
+    """Giá trị ngẫu nhiên + đúng các ngưỡng của if/elif (so sánh > dễ lệch ở biên)."""
+    rng = np.random.default_rng(seed)
+    edges = {
+        'temp': [19.9, 20, 20.1, 27.9, 28, 28.1],
+        'precip': [0, 0.5, 0.51, 1, 1.01, 2, 2.01, 5, 5.01, 10, 10.01],
+        'humidity': [89, 90, 91, 95, 96, 100],
+        'wind': [19.9, 20, 20.1],
+        'cloud_cover': [20, 20.1, 50, 50.1, 80, 80.1, 90, 90.1, 100],
+    }
+    ranges = {'temp': (5, 40), 'precip': (0, 15), 'humidity': (40, 100),
+              'wind': (0, 40), 'cloud_cover': (0, 100)}
+    return {
+        name: np.concatenate([rng.uniform(*ranges[name], n), rng.choice(edges[name], n)])
+        for name in ranges
+    }
+
+
+def test_weather_code_matches_scalar():
+    x = sample_inputs()
+    expected = [
+        predictor.predict_weather_code(*args)
+        for args in zip(x['temp'], x['precip'], x['humidity'], x['wind'], x['cloud_cover'])
+    ]
+    result = predictor.predict_weather_code_array(x['temp'], x['precip'], x['humidity'], x['wind'], x['cloud_cover'])
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_uv_index_matches_scalar_exhaustive():
+    grid = np.array(list(itertools.product(range(24), range(1, 13), WEATHER_CODES)))
+    expected = [predictor.predict_uv_index(h, m, c) for h, m, c in grid]
+    result = predictor.predict_uv_index_array(grid[:, 0], grid[:, 1], grid[:, 2])
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_visibility_matches_scalar():
+    x = sample_inputs(seed=1)
+    expected = [
+        predictor.calculate_visibility(*args)
+        for args in zip(x['humidity'], x['precip'], x['cloud_cover'])
+    ]
+    result = predictor.calculate_visibility_array(x['humidity'], x['precip'], x['cloud_cover'])
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_kernels_accept_province_by_horizon_matrix():
+    x = {k: v[:63 * 24].reshape(63, 24) for k, v in sample_inputs(n=63 * 12).items()}
+    codes = predictor.predict_weather_code_array(x['temp'], x['precip'], x['humidity'], x['wind'], x['cloud_cover'])
+    hours = np.arange(24)[None, :]
+    uv = predictor.predict_uv_index_array(hours, 6, codes)
+    visibility = predictor.calculate_visibility_array(x['humidity'], x['precip'], x['cloud_cover'])
+
+    assert codes.shape == uv.shape == visibility.shape == (63, 24)
+    assert uv[5, 12] == predictor.predict_uv_index(12, 6, codes[5, 12])
+    assert codes[7, 3] == predictor.predict_weather_code(
+        x['temp'][7, 3], x['precip'][7, 3], x['humidity'][7, 3], x['wind'][7, 3], x['cloud_cover'][7, 3]
+    )
+
+
+def reference_daily(temps, precips, winds, codes, now):
+    """Cách tổng hợp cũ bằng list Python (không có hoà mode)."""
+    daily = []
+    for day in range(7):
+        sl = slice(day * 24, (day + 1) * 24)
+        t, p, w, c = list(temps[sl]), list(precips[sl]), list(winds[sl]), list(codes[sl])
+        if not t:
+            continue
+        date = (now + timedelta(days=day)).date()
+        daily.append({
+            'time': date.isoformat(),
+            'temperature_2m_max': round(max(t), 1),
+            'temperature_2m_min': round(min(t), 1),
+            'precipitation_sum': round(sum(p), 2),
+            'wind_speed_10m_max': round(max(w), 1),
+            'weather_code': max(set(c), key=c.count),
+            'sunrise': datetime.combine(date, time(6)).isoformat(),
+            'sunset': datetime.combine(date, time(18)).isoformat(),
+        })
+    return daily
+
+
+def hourly_arrays(n_provinces, hours=168, seed=0):
+    rng = np.random.default_rng(seed)
+    temps = np.round(rng.uniform(20, 35, (n_provinces, hours)), 1)
+    precips = np.round(rng.uniform(0, 1, (n_provinces, hours)), 2)
+    winds = np.round(rng.uniform(0, 15, (n_provinces, hours)), 1)
+    # Mã 2 chiếm đa số mỗi ngày để mode không bị hoà
+    codes = np.where(rng.random((n_provinces, hours)) < 0.6, 2, rng.choice([0, 1, 3, 61], (n_provinces, hours)))
+    return temps, precips, winds, codes
+
+
+def test_summarize_daily_matches_list_version():
+    now = datetime(2024, 6, 3, 10, 30)
+    temps, precips, winds, codes = hourly_arrays(5)
+    batch = predictor.summarize_daily(temps, precips, winds, codes, now)
+    # Tensor tỉnh × ngày × 24 cho kết quả giống ma trận tỉnh × giờ
+    cube = predictor.summarize_daily(*(a.reshape(5, 7, 24) for a in (temps, precips, winds, codes)), now)
+
+    assert batch == cube
+    for i in range(5):
+        expected = reference_daily(temps[i], precips[i], winds[i], codes[i].tolist(), now)
+        for got, exp in zip(batch[i], expected):
+            # np.sum cộng theo cặp, có thể lệch sum() tuần tự ở chữ số làm tròn cuối
+            assert got == {**exp, 'precipitation_sum': pytest.approx(exp['precipitation_sum'], abs=0.011)}
+
+
+def test_summarize_daily_mode_ties_and_partial_days():
+    now = datetime(2024, 6, 3)
+    codes = np.array([3] * 12 + [1] * 12 + [95] * 6)
+    temps = np.arange(30, dtype=float)
+    daily = predictor.summarize_daily(temps, np.zeros(30), np.ones(30), codes, now)
+
+    assert len(daily) == 2
+    assert daily[0]['weather_code'] == 1       # hoà 12-12 -> mã nhỏ hơn
+    assert daily[1]['weather_code'] == 95
+    assert daily[1]['temperature_2m_min'] == 24 and daily[1]['temperature_2m_max'] == 29
+    assert daily[1]['sunrise'] == '2024-06-04T06:00:00'
@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.fanout import (
+    BoundedExecutor, Deadline, DeadlineExceeded, ExecutorSaturated, LatencyTracker, StageRecorder
+)
+
+
+def test_stages_overlap_and_optional_stage_is_dropped():
+    tracker = LatencyTracker()
+    stages = StageRecorder(tracker)
+    deadline = Deadline(0.5)
+    with ThreadPoolExecutor(4) as pool:
+        start = time.perf_counter()
+        f_api = stages.submit(pool, 'api', lambda: time.sleep(0.2) or 'api')
+        f_cache = stages.submit(pool, 'cache', lambda: time.sleep(0.2) or 'cache')
+        f_aqi = stages.submit(pool, 'aqi', lambda: time.sleep(1.0) or 'aqi')
+
+        assert stages.wait('api', f_api, deadline) == 'api'
+        assert stages.wait('cache', f_cache, deadline, default=None) == 'cache'
+        assert stages.wait('aqi', f_aqi, deadline, default='missing') == 'missing'
+        elapsed = time.perf_counter() - start
+
+    # Chạy song song: tổng thời gian theo deadline, không phải tổng các bước
+    assert elapsed < 0.7
+    assert stages.partial == ['aqi']
+    header = stages.server_timing()
+    assert 'api;dur=' in header and 'aqi;dur=' in header and 'desc="partial"' in header
+    assert header.split(', ')[-1].startswith('total;dur=')
+    # Bước quá hạn vẫn được ghi thời gian thật khi xong
+    stats = tracker.percentiles()
+    assert set(stats) == {'api', 'cache', 'aqi'}
+    assert stats['aqi']['p50_ms'] >= 1000
+
+
+def test_required_stage_errors_propagate():
+    stages = StageRecorder()
+    with ThreadPoolExecutor(2) as pool:
+        failing = stages.submit(pool, 'api', lambda: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            stages.wait('api', failing, Deadline(1))
+        slow = stages.submit(pool, 'slow', time.sleep, 0.3)
+        with pytest.raises(DeadlineExceeded):
+            stages.wait('slow', slow, Deadline(0.05))
+        failing = stages.submit(pool, 'aqi', lambda: 1 / 0)
+        assert stages.wait('aqi', failing, Deadline(1), default={}) == {}
+    assert stages.partial == ['aqi']
+
+
+def test_latency_percentiles_window():
+    tracker = LatencyTracker(window=100)
+    for ms in range(1, 201):
+        tracker.record('total', ms / 1000)
+    stats = tracker.percentiles()['total']
+    assert stats['count'] == 100
+    assert stats['p50_ms'] == pytest.approx(150.5)
+    assert stats['p99_ms'] == pytest.approx(199.0, abs=0.1)
+    assert Deadline(0).expired() and Deadline(5).remaining(cap=2) == 2
+
+
+def test_bounded_executor_rejects_when_saturated():
+    pool = BoundedExecutor(max_workers=2, thread_name_prefix='test-ml')
+    release = threading.Event()
+    busy = [pool.submit(release.wait) for _ in range(2)]
+    stages = StageRecorder()
+    with pytest.raises(ExecutorSaturated):
+        stages.submit(pool, 'ml_fallback', time.sleep, 0)
+    stages.skip('ml_fallback', 'pool đầy')
+    assert stages.partial == ['ml_fallback']
+
+    # Việc xong trả lại chỗ trong pool
+    release.set()
+    for f in busy:
+        f.result(timeout=1)
+    time.sleep(0.05)
+    assert pool.submit(lambda: 'ok').result(timeout=1) == 'ok'
+    pool.shutdown()
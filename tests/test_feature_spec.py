@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml.feature_spec import MIN_HISTORY, build_features, time_values
+from services.forecast_ml.feature_state import FeatureState
+from helpers import make_history
+
+
+def test_online_matches_batch_at_every_anchor():
+    # Hai tỉnh nối tiếp nhau: đường batch không được lấy lag/cửa sổ sang tỉnh khác
+    frames = {pid: make_history(hours=60, seed=pid).assign(province_id=pid) for pid in (1, 2)}
+    # float64: so sánh logic ở độ chính xác đầy đủ (production lưu float32)
+    batch = build_features(pd.concat(frames.values(), ignore_index=True), dtype=np.float64)
+    feature_cols = [c for c in batch.columns if c not in ['timestamp', 'province_id']]
+
+    for pid, df in frames.items():
+        expected = batch[batch['province_id'] == pid][feature_cols].to_numpy(dtype=float)
+        state = FeatureState(feature_cols)
+        for t, (_, row) in enumerate(df.iterrows()):
+            state.push(row.to_dict())
+            features = state.features()
+            if t < MIN_HISTORY - 1:
+                assert features is None
+            else:
+                np.testing.assert_allclose(features, expected[t], rtol=1e-9, atol=1e-9)
+
+
+def test_anchor_semantics():
+    df = make_history(hours=30)
+    state = FeatureState.from_frame(df, ['temperature_2m_lag1', 'temperature_2m_lag24', 'hour'])
+    lag1, lag24, hour = state.features()
+    assert lag1 == df['temperature_2m'].iloc[-2]
+    assert lag24 == df['temperature_2m'].iloc[-25]
+    assert hour == df['timestamp'].iloc[-1].hour
+
+
+def test_time_of_day_matches_training_bins():
+    hours = np.arange(24)
+    expected = pd.cut(hours, bins=[0, 6, 12, 18, 24], labels=[0, 1, 2, 3], include_lowest=True).astype(int)
+    batch = time_values(hours, hours % 7, np.full(24, 6), np.ones(24, dtype=int))['time_of_day']
+    online = [time_values(int(h), 0, 6, 1)['time_of_day'] for h in hours]
+    np.testing.assert_array_equal(batch, expected)
+    np.testing.assert_array_equal(online, expected)
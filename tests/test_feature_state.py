@@ -0,0 +1,51 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml.feature_spec import HISTORY_COLUMNS, MIN_HISTORY, build_features
+from services.forecast_ml.feature_state import FeatureState
+from helpers import make_history, reference_feature_cols
+
+
+def batch_row(df, feature_cols):
+    """Features đường batch tại anchor là dòng cuối của df."""
+    batch = build_features(df.assign(province_id=1), dtype=np.float64)
+    return batch[feature_cols].to_numpy(dtype=float)[-1]
+
+
+def test_features_match_batch_kernel():
+    df = make_history()
+    feature_cols = reference_feature_cols(df)
+
+    state = FeatureState.from_frame(df, feature_cols)
+    np.testing.assert_allclose(state.features(), batch_row(df, feature_cols), rtol=1e-9, atol=1e-9)
+
+
+def test_push_matches_batch_over_many_steps():
+    df = make_history(hours=30, seed=1)
+    feature_cols = reference_feature_cols(df)
+
+    state = FeatureState.from_frame(df, feature_cols)
+    rng = np.random.default_rng(2)
+    for step in range(60):
+        np.testing.assert_allclose(state.features(), batch_row(df, feature_cols), rtol=1e-9, atol=1e-9)
+
+        new_row = {col: float(rng.uniform(0, 100)) for col in HISTORY_COLUMNS}
+        new_row['timestamp'] = df['timestamp'].iloc[-1] + timedelta(hours=1)
+        state.push(new_row)
+        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+
+
+def test_not_ready_with_short_history():
+    # lag 24 cần 25 dòng tính cả anchor
+    df = make_history(hours=MIN_HISTORY - 1)
+    state = FeatureState.from_frame(df, ['temperature_2m_lag1'])
+    assert state.features(datetime(2024, 6, 2)) is None
+    state.push({col: 1.0 for col in HISTORY_COLUMNS}, timestamp=datetime(2024, 6, 2))
+    assert state.features() is not None
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import feature_store
+from services.forecast_ml.model_training import feature_engineering, make_training_set
+from helpers import FakeConn, make_history
+
+
+def make_raw(hours=120):
+    return pd.concat([make_history(hours, seed=pid).assign(province_id=pid) for pid in (1, 2)],
+                     ignore_index=True)
+
+
+def test_incremental_rows_match_full_recompute():
+    raw = make_raw()
+    full = feature_store.compute_features(raw.copy())
+
+    # Store đã có tới giờ thứ 80 của mỗi tỉnh: chỉ CONTEXT_ROWS dòng cuối làm ngữ cảnh
+    parts = []
+    for _, df in raw.groupby('province_id'):
+        parts.append(df.iloc[80 - feature_store.CONTEXT_ROWS:80].assign(context_row=1))
+        parts.append(df.iloc[80:].assign(context_row=0))
+    incremental = feature_store.compute_features(pd.concat(parts, ignore_index=True))
+    incremental = incremental[incremental['context_row'] == 0]
+
+    expected = full[full.groupby('province_id').cumcount() >= 80]
+    cols = feature_store.STORE_COLUMNS
+    np.testing.assert_allclose(incremental[cols].to_numpy(float), expected[cols].to_numpy(float),
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_training_from_store_matches_raw_path():
+    raw = make_raw()
+    stored = feature_store.compute_features(raw.copy())[feature_store.KEY_COLUMNS + feature_store.STORE_COLUMNS]
+    df = feature_store.load_feature_matrix(FakeConn(stored))
+
+    assert df['temperature_2m_lag24'].dtype == np.float32
+    X, y, cols = make_training_set(df)
+    X_raw, y_raw, cols_raw = feature_engineering(raw.copy())
+    assert cols == cols_raw
+    assert len(X) == len(X_raw)
+    np.testing.assert_allclose(X.to_numpy(float), X_raw.to_numpy(float), rtol=1e-6, atol=1e-4)
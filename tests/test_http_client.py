@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services import http_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+    failures = {}                   # path -> số lần trả 503 còn lại
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if Handler.failures.get(path, 0) > 0:
+            Handler.failures[path] -= 1
+            status, body = 503, b'{}'
+        else:
+            status, body = 200, json.dumps({'path': self.path}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_client, 'BACKOFF_FACTOR', 0.01)
+    monkeypatch.setattr(http_client, 'BACKOFF_JITTER', 0.01)
+    http_client.close()
+    http_client.reset_stats()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+    http_client.close()
+    Handler.failures.clear()
+
+
+def test_connections_are_reused(server):
+    for i in range(5):
+        assert http_client.get_json(f'{server}/forecast', params={'i': i}) == {'path': f'/forecast?i={i}'}
+    stats = http_client.stats()['127.0.0.1']
+    assert stats['requests'] == 5 and stats['errors'] == 0
+    assert stats['connections'] == 1
+    assert stats['status'] == {200: 5}
+    assert 'p50_ms' in stats and 'p99_ms' in stats
+
+
+def test_retries_transient_errors(server):
+    Handler.failures['/flaky'] = 2
+    assert http_client.get_json(f'{server}/flaky') == {'path': '/flaky'}
+    assert http_client.stats()['127.0.0.1']['retries'] == 2
+
+    # Hết lượt retry: trả về response cuối, raise_for_status như requests.get
+    Handler.failures['/down'] = http_client.RETRIES + 1
+    with pytest.raises(requests.HTTPError) as exc:
+        http_client.get_json(f'{server}/down')
+    assert exc.value.response.status_code == 503
+    assert http_client.stats()['127.0.0.1']['errors'] == 1
+
+    # retries=0: lỗi đầu tiên trả thẳng về người gọi (để vòng retry của họ xử lý)
+    Handler.failures['/limited'] = 2
+    with pytest.raises(requests.HTTPError):
+        http_client.get_json(f'{server}/limited', retries=0)
+    assert Handler.failures['/limited'] == 1
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import hyperparameter_search as hs
+
+
+def write_cache(cache_dir, n_rows=400, n_features=5):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n_rows, n_features)).astype(np.float32)
+    y = np.stack([X[:, i % n_features] * (i + 1) + rng.normal(0, 0.1, n_rows) for i in range(6)], axis=1)
+    split = int(n_rows * 0.8)
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, part in (('X_train', X[:split]), ('y_train', y[:split]),
+                       ('X_valid', X[split:]), ('y_valid', y[split:])):
+        np.save(os.path.join(cache_dir, f'{name}.npy'), part.astype(np.float32))
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+        json.dump({'feature_cols': [f'f{i}' for i in range(n_features)],
+                   'n_train': split, 'n_valid': n_rows - split}, f)
+
+
+def test_rung_budgets_and_configs():
+    assert hs.rung_budgets(1000, 27) == [37, 111, 333, 1000]
+    assert hs.rung_budgets(1000, 9) == [111, 333, 1000]
+    assert hs.rung_budgets(90, 1) == [90]
+
+    configs = hs.sample_configs(12)
+    assert len({tuple(c.values()) for c in configs}) == 12
+    assert configs[0] == {k: hs.XGB_PARAMS[k] for k in hs.SEARCH_SPACE}
+
+
+def test_pareto_front():
+    points = [{'latency_ms': 1, 'score': 0.5}, {'latency_ms': 2, 'score': 0.6},
+              {'latency_ms': 3, 'score': 0.3}, {'latency_ms': 4, 'score': 0.3}]
+    assert hs.pareto_front(points) == [points[0], points[2]]
+
+
+def test_search_prunes_configs(tmp_path, monkeypatch):
+    monkeypatch.setattr(hs, 'SEARCH_DIR', str(tmp_path))
+    monkeypatch.setattr(hs, 'LATENCY_REPEAT', 3)
+    cache_dir = str(tmp_path / 'cache')
+    write_cache(cache_dir)
+
+    report = hs.search(n_configs=9, max_trees=18, workers=1, reuse_cache=True, cache_dir=cache_dir)
+    rungs = [[r for r in report['trials'] if r['rung'] == i] for i in range(3)]
+    assert [len(r) for r in rungs] == [9, 3, 1]
+    assert [r[0]['n_trees'] for r in rungs] == [2, 6, 18]
+    # Cấu hình được giữ lại là tốt nhất của rung trước
+    best = min(rungs[0], key=lambda r: r['score'])['config_id']
+    assert best in {r['config_id'] for r in rungs[1]}
+    assert report['most_accurate']['score'] == min(r['score'] for r in report['trials'])
+    assert all(r['latency_ms'] > 0 for r in report['trials'])
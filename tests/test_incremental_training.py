@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import model_registry, model_training
+from services.forecast_ml.feature_store import compute_features
+from helpers import make_history
+
+
+class NoopConn:
+    def close(self):
+        pass
+
+
+def setup_registry(tmp_path, monkeypatch, hours=900, cut=600):
+    """Version active train trên `cut` giờ đầu; loader trả về dữ liệu mới hơn `since`."""
+    monkeypatch.setattr(model_registry, 'REGISTRY_DIR', str(tmp_path / 'registry'))
+    monkeypatch.setattr(model_training, 'MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(model_training, 'MODEL_PATH', str(tmp_path / 'model.pkl'))
+    monkeypatch.setattr(model_training, 'connect_to_db', NoopConn)
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'n_estimators', 30)
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'max_depth', 3)
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'n_jobs', 1)
+
+    df = compute_features(pd.concat([make_history(hours, seed=p).assign(province_id=p) for p in (1, 2)],
+                                    ignore_index=True))
+    monkeypatch.setattr(model_training, 'load_training_frame',
+                        lambda conn, since=None, **kw: (df[df['timestamp'] > since], True))
+
+    old = df[df['timestamp'] < df['timestamp'].min() + pd.Timedelta(hours=cut)]
+    X, y, cols = model_training.make_training_set(old)
+    model, _ = model_training.train_native(X, y)
+    metrics = model_training.target_metrics(y, model.predict(X))
+    watermark = old.loc[X.index, 'timestamp'].max()
+    version = model_registry.publish_version(model, cols, 'recursive', manifest={
+        'watermark': watermark.isoformat(),
+        'last_full_train': pd.Timestamp.now().isoformat(),
+        'metrics': metrics,
+    })
+    return version, model, watermark
+
+
+def test_incremental_update_adds_trees_and_moves_watermark(tmp_path, monkeypatch):
+    version, base, watermark = setup_registry(tmp_path, monkeypatch)
+    fitted = []
+    train_native = model_training.train_native
+    monkeypatch.setattr(model_training, 'train_native',
+                        lambda X, y, *a, **kw: fitted.append(X) or train_native(X, y, *a, **kw))
+
+    assert model_training.incremental_update(max_new_trees=10, drift_threshold=100.0)
+    new_version = model_registry.get_active('recursive')
+    assert new_version != version
+    model, manifest = model_registry.load_version(new_version)
+    assert pd.Timestamp(manifest['watermark']) > watermark
+    assert manifest['incremental']['base_version'] == version
+    # Holdout (giờ mới nhất) nằm ngoài dữ liệu train + early stopping
+    incremental = manifest['incremental']
+    assert len(fitted[0]) == incremental['new_rows'] - incremental['holdout_rows']
+    assert incremental['holdout_rows'] > 0
+    assert set(incremental['base_metrics']) == set(incremental['valid_metrics']) == set(model_training.TARGET_COLS)
+    for old, new in zip(base.boosters, model.boosters):
+        assert old.num_boosted_rounds() <= new.num_boosted_rounds() <= old.num_boosted_rounds() + 10
+
+
+def test_drift_falls_back_to_full_retrain(tmp_path, monkeypatch):
+    version, _, _ = setup_registry(tmp_path, monkeypatch)
+    calls = []
+    monkeypatch.setattr(model_training, 'train', lambda **kw: calls.append(kw) or True)
+
+    # Tham chiếu là MAE trên chính tập train: dữ liệu mới luôn vượt ngưỡng 0%
+    assert model_training.incremental_update(drift_threshold=0.0)
+    assert calls and calls[0]['mode'] == 'recursive'
+    assert model_registry.get_active('recursive') == version
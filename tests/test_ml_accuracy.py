@@ -1,7 +1,6 @@
 import os
 import sys
 import argparse
-import requests
 import numpy as np
 
 # Thêm đường dẫn gốc project để Python tìm thấy các package con
@@ -9,6 +8,7 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT_DIR)
 
 # Import các modules nội bộ
+from services import http_client
 from services.forecast_ml.predictor import predict_storm
 from backend_api.models.weather_model import Provinces
 
@@ -56,9 +56,7 @@ def compare_ml_vs_api(province_name="Hà Nội"):
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            api_data = response.json()
+            api_data = http_client.get_json(url, params=params, timeout=10)
             print("API data hoàn thành!")
         except Exception as e:
             print(f"Lỗi khi lấy API: {e}")
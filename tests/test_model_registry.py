@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import model_registry, predictor
+from helpers import train_small_model
+
+
+def test_publish_and_activate(tmp_path):
+    registry = str(tmp_path)
+    model, X, cols = train_small_model()
+
+    v1 = model_registry.publish_version(model, cols, 'recursive', registry_dir=registry,
+                                        manifest={'metrics': {'temperature_2m': {'mae': 0.5}}})
+    assert model_registry.get_active('recursive', registry) == v1
+    assert model_registry.get_active('direct', registry) is None
+
+    v2 = model_registry.publish_version(model, cols, 'recursive', registry_dir=registry, activate=False)
+    assert model_registry.get_active('recursive', registry) == v1
+    assert [m['version'] for m in model_registry.list_versions('recursive', registry)] == sorted([v1, v2], reverse=True)
+    # Không còn thư mục tạm sau khi publish
+    assert not [d for d in os.listdir(model_registry._versions_dir(registry)) if d.startswith('.')]
+
+    model_registry.set_active('recursive', v2, registry)
+    loaded, manifest = model_registry.load_version(v2, registry)
+    assert manifest['version'] == v2 and manifest['feature_cols'] == cols
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X), rtol=1e-6)
+
+
+def test_predictor_swaps_to_new_active_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'REGISTRY_DIR', str(tmp_path))
+    monkeypatch.setattr(predictor, 'MODEL_WATCH_INTERVAL', 0)
+    monkeypatch.setattr(predictor, 'MODEL_FORMAT', 'auto')
+    monkeypatch.setitem(predictor._loaded, 'recursive', None)
+    monkeypatch.setattr(predictor, '_missing', set())
+
+    model, X, cols = train_small_model()
+    v1 = model_registry.publish_version(model, cols, 'recursive')
+    assert predictor.ensure_model()
+    old = predictor.get_snapshot('recursive')
+    assert old.version == v1
+
+    # Chưa đổi con trỏ active thì không tải lại
+    assert predictor.refresh_models() == []
+
+    v2 = model_registry.publish_version(model, cols, 'recursive')
+    assert predictor.refresh_models() == ['recursive']
+    new = predictor.get_snapshot('recursive')
+    assert new.version == v2 and new.model is not old.model
+    # Snapshot cũ vẫn dùng được cho request đang chạy
+    np.testing.assert_allclose(old.model.predict(X), new.model.predict(X), rtol=1e-6)
+
+
+def test_set_active_keeps_other_mode_under_concurrency(tmp_path):
+    registry = str(tmp_path)
+    model, X, cols = train_small_model()
+    versions = {mode: model_registry.publish_version(model, cols, mode, registry_dir=registry, activate=False)
+                for mode in ('recursive', 'direct')}
+
+    def publish(mode):
+        for _ in range(20):
+            model_registry.set_active(mode, versions[mode], registry)
+
+    threads = [threading.Thread(target=publish, args=(mode,)) for mode in ('recursive', 'direct') * 2]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert model_registry.read_active(registry) == versions
+
+
+def test_refresh_failure_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'REGISTRY_DIR', str(tmp_path))
+    monkeypatch.setattr(predictor, 'MODEL_WATCH_INTERVAL', 0)
+    monkeypatch.setattr(predictor, 'MODEL_FORMAT', 'auto')
+    monkeypatch.setitem(predictor._loaded, 'recursive', None)
+    monkeypatch.setattr(predictor, '_missing', set())
+
+    model, X, cols = train_small_model()
+    model_registry.publish_version(model, cols, 'recursive')
+    assert predictor.ensure_model()
+    old = predictor.get_snapshot('recursive')
+
+    v2 = model_registry.publish_version(model, cols, 'recursive')
+    with monkeypatch.context() as m:
+        m.setattr(predictor, '_from_registry', lambda mode: 1 / 0)
+        # Watcher chỉ ghi nhận signature khi refresh_models không raise
+        with pytest.raises(RuntimeError):
+            predictor.refresh_models()
+    assert predictor.get_snapshot('recursive') is old
+    assert predictor.refresh_models() == ['recursive']
+    assert predictor.get_snapshot('recursive').version == v2
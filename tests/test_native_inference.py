@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml.native_inference import NativeEnsemble
+from services.forecast_ml.model_io import has_native_model, load_model_native, save_model_native
+from helpers import train_small_model
+
+
+def test_native_matches_sklearn():
+    model, X, cols = train_small_model()
+    native = NativeEnsemble.from_sklearn(model, cols)
+
+    expected = model.predict(X)
+    np.testing.assert_allclose(native.predict(X.to_numpy()), expected, rtol=1e-6)
+    # DataFrame có thêm cột thừa / sai thứ tự vẫn được chọn đúng cột
+    shuffled = X[cols[::-1]].assign(extra=1.0)
+    np.testing.assert_allclose(native.predict(shuffled), expected, rtol=1e-6)
+
+
+def test_input_buffer_is_reused():
+    model, X, cols = train_small_model()
+    native = NativeEnsemble.from_sklearn(model, cols)
+
+    buf = native.input_buffer(5)
+    buf[...] = X.to_numpy()[:5]
+    np.testing.assert_allclose(native.predict(buf), model.predict(X.iloc[:5]), rtol=1e-6)
+    assert np.shares_memory(native.input_buffer(3), buf)
+
+
+def test_native_format_roundtrip(tmp_path):
+    model, X, cols = train_small_model()
+    model_dir = tmp_path / 'weather_xgboost_multi'
+    save_model_native(model, cols, str(model_dir), extra={'target_cols': ['a', 'b', 'c']})
+
+    assert has_native_model(str(model_dir))
+    loaded, metadata = load_model_native(str(model_dir))
+    assert metadata['feature_cols'] == cols
+    assert metadata['n_targets'] == 3
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X), rtol=1e-6)
+
+
+def test_predictor_import_does_not_load_model():
+    # Chạy trong process riêng để sys.modules sạch
+    code = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "from services.forecast_ml import predictor\n"
+        "assert predictor.get_snapshot('recursive') is None and predictor.get_snapshot('direct') is None\n"
+        "assert 'xgboost' not in sys.modules and 'joblib' not in sys.modules\n"
+    ) % ROOT_DIR
+    subprocess.run([sys.executable, '-c', code], check=True)
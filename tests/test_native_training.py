@@ -0,0 +1,49 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import model_training
+from services.forecast_ml.model_io import load_model_native, save_model_native
+
+
+def make_data(n_rows=600, n_features=6, n_targets=6):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(n_rows, n_features)), columns=[f'f{i}' for i in range(n_features)])
+    y = pd.DataFrame({f't{i}': X.iloc[:, i] * (i + 1) + rng.normal(0, 0.1, n_rows) for i in range(n_targets)})
+    return X, y
+
+
+def test_train_native_early_stopping(monkeypatch):
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'n_estimators', 300)
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'max_depth', 3)
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'learning_rate', 0.3)
+    X, y = make_data()
+
+    model, rounds = model_training.train_native(X, y, early_stopping_rounds=10, n_jobs=1)
+    assert len(model.boosters) == len(rounds) == 6
+    assert all(n < 300 for n in rounds)
+    assert [b.num_boosted_rounds() for b in model.boosters] == rounds
+
+    pred = model.predict(X)
+    assert pred.shape == (len(X), 6)
+    metrics = model_training.target_metrics(y, pred)
+    assert all(m['r2'] > 0.9 for m in metrics.values())
+
+
+def test_native_trained_model_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'n_estimators', 20)
+    X, y = make_data()
+    model, _ = model_training.train_native(X, y, direct=True, n_jobs=1)
+    expected = model.predict(X)
+
+    np.testing.assert_allclose(pickle.loads(pickle.dumps(model)).predict(X), expected, rtol=1e-6)
+    save_model_native(model, list(X.columns), str(tmp_path / 'm'))
+    loaded, metadata = load_model_native(str(tmp_path / 'm'))
+    assert metadata['n_targets'] == 6
+    np.testing.assert_allclose(loaded.predict(X), expected, rtol=1e-6)
@@ -0,0 +1,99 @@
+import os
+import sys
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml.observation_store import ObservationStore
+from helpers import make_history
+
+
+class FakeDB:
+    """Bảng weather_data giả: trả về các dòng theo truy vấn đầu / tăng dần."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def __call__(self, sql, params):
+        self.queries.append(params)
+        if 'ROW_NUMBER' in sql:
+            return self.rows.groupby('province_id').tail(params[0])
+        pids, last_ts, floor = params
+        since = self.rows['province_id'].map(dict(zip(pids, last_ts))).fillna(floor)
+        return self.rows[self.rows['timestamp'] > since]
+
+
+def make_rows(hours=200):
+    return pd.concat([make_history(hours, seed=pid).assign(province_id=pid) for pid in [1, 2]])
+
+
+def test_initial_load_keeps_last_hours():
+    rows = make_rows()
+    store = ObservationStore(hours=168, refresh_interval=float('inf'))
+    store._query = FakeDB(rows)
+
+    window = store.window(1)
+    expected = rows[rows['province_id'] == 1].tail(168)
+    assert len(store) == 2
+    assert window.values.dtype == np.float32
+    assert window.values.shape == (168, len(store.columns))
+    assert store.last_timestamp(1) == expected['timestamp'].iloc[-1]
+    np.testing.assert_allclose(window.values[:, 0], expected['temperature_2m'], rtol=1e-6)
+
+
+def test_incremental_refresh_appends_only_new_rows():
+    rows = make_rows(200)
+    db = FakeDB(rows.groupby('province_id').head(180))
+    store = ObservationStore(hours=168, refresh_interval=0)
+    store._query = db
+    store.window(1)
+
+    db.rows = rows
+    window = store.window(1)
+    assert len(db.queries) == 2
+    assert len(window.timestamps) == 168
+    assert store.last_timestamp(1) == rows['timestamp'].max()
+    # Không có dòng mới thì cửa sổ giữ nguyên
+    assert store.ingest(rows) == 0
+
+
+def test_stale_province_does_not_widen_refresh():
+    rows = make_rows(400)
+    # Tỉnh 2 ngừng nhận dữ liệu sau 100 giờ đầu
+    stale = rows[(rows['province_id'] == 1) | (rows['timestamp'] < rows['timestamp'].min() + timedelta(hours=100))]
+    db = FakeDB(stale[stale['timestamp'] < rows['timestamp'].min() + timedelta(hours=390)])
+    store = ObservationStore(hours=168, refresh_interval=0)
+    store._query = db
+    store.window(1)
+    stale_last = store.last_timestamp(2)
+
+    db.rows = stale
+    store.window(1)
+    pids, last_ts, floor = db.queries[-1]
+    watermark = dict(zip(pids, last_ts))
+    assert watermark[1] == store.last_timestamp(1) - timedelta(hours=10)
+    # Mốc của tỉnh 2 bị chặn ở `hours` giờ trước quan sát mới nhất, không lùi về timestamp cuối của nó
+    assert watermark[2] == floor > stale_last
+    assert len(db.rows[db.rows['timestamp'] > min(last_ts)]) < len(db.rows[db.rows['timestamp'] > stale_last])
+    assert store.last_timestamp(1) == rows['timestamp'].max()
+    assert store.last_timestamp(2) == stale_last
+
+
+def test_missing_values_filled_like_load_historical_data():
+    rows = make_history(30).assign(province_id=1)
+    rows.loc[5, ['apparent_temperature', 'cloud_cover', 'weather_code']] = np.nan
+    rows.loc[6, 'wind_gusts_10m'] = np.nan
+    store = ObservationStore(hours=168, refresh_interval=float('inf'))
+    store._query = FakeDB(rows)
+
+    df = store.frame(1)
+    assert df.loc[5, 'apparent_temperature'] == np.float32(rows.loc[5, 'temperature_2m'])
+    assert df.loc[5, 'cloud_cover'] == 50 and df.loc[5, 'weather_code'] == 1
+    assert df.loc[6, 'wind_gusts_10m'] == np.float32(rows.loc[6, 'wind_speed_10m'])
+    assert not df.drop(columns='timestamp').isna().any().any()
+    assert (df['timestamp'].diff().dropna() == timedelta(hours=1)).all()
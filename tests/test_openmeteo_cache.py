@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services import openmeteo_cache
+from services.openmeteo_cache import FileBackend, ResponseCache
+
+URL = 'https://api.open-meteo.com/v1/forecast'
+PARAMS = {'latitude': 21.0285, 'longitude': 105.8542, 'hourly': 'temperature_2m,precipitation',
+          'daily': 'temperature_2m_max', 'current': 'temperature_2m', 'timezone': 'Asia/Bangkok'}
+
+
+class FakeUpstream:
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    def __call__(self, url, params, timeout):
+        self.calls.append(dict(params))
+        time.sleep(self.delay)
+        days = params['forecast_days']
+        version = len(self.calls)
+        return {
+            'current': {'temperature_2m': 30.0 + version},
+            'hourly': {'time': [f't{i}' for i in range(days * 24)], 'temperature_2m': list(range(days * 24)),
+                       'precipitation': [0.0] * (days * 24)},
+            'daily': {'time': [f'd{i}' for i in range(days)], 'temperature_2m_max': [35.0] * days},
+        }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0 - 1_700_000_000.0 % 3600 + 600]   # 10 phút sau giờ tròn
+    monkeypatch.setattr(openmeteo_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_one_16_day_entry_serves_shorter_days(clock):
+    upstream = FakeUpstream()
+    cache = ResponseCache(fetch=upstream)
+
+    week = cache.get(URL, dict(PARAMS, forecast_days=7))
+    day = cache.get(URL, dict(PARAMS, forecast_days=1, hourly='precipitation,temperature_2m'))
+    assert len(upstream.calls) == 1
+    assert upstream.calls[0]['forecast_days'] == openmeteo_cache.FETCH_DAYS
+    assert len(week['hourly']['time']) == 7 * 24 and len(week['daily']['time']) == 7
+    assert len(day['hourly']['temperature_2m']) == 24 and len(day['daily']['time']) == 1
+    # Bản sao: sửa kết quả không ảnh hưởng entry
+    day['current']['temperature_2m'] = -1
+    assert cache.get(URL, dict(PARAMS, forecast_days=2))['current']['temperature_2m'] == 31.0
+    assert cache.stats()['hits'] == 2
+
+
+def test_expires_at_hour_boundary_then_serves_stale_while_refreshing(clock):
+    upstream = FakeUpstream(delay=0.2)
+    cache = ResponseCache(fetch=upstream)
+    cache.get(URL, PARAMS)
+
+    clock[0] += 3000 - 1           # vẫn trong giờ
+    assert cache.get(URL, PARAMS)['current']['temperature_2m'] == 31.0
+    clock[0] += 2                  # qua giờ tròn
+    start = time.perf_counter()
+    results = [cache.get(URL, PARAMS) for _ in range(5)]
+    assert time.perf_counter() - start < 0.1          # không chờ upstream
+    assert all(r['current']['temperature_2m'] == 31.0 for r in results)
+    for _ in range(50):
+        if len(upstream.calls) == 2 and cache.stats()['inflight'] == 0:
+            break
+        time.sleep(0.02)
+    assert len(upstream.calls) == 2                    # đúng một lần làm mới nền
+    assert cache.get(URL, PARAMS)['current']['temperature_2m'] == 32.0
+
+    # Quá vùng stale: tải đồng bộ, các request đồng thời dùng chung một lần tải
+    clock[0] += 3 * 3600
+    threads = [threading.Thread(target=cache.get, args=(URL, PARAMS)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(upstream.calls) == 3
+
+
+def test_shared_file_backend(tmp_path, clock):
+    upstream = FakeUpstream()
+    first = ResponseCache(fetch=upstream, shared=FileBackend(str(tmp_path)))
+    second = ResponseCache(fetch=upstream, shared=FileBackend(str(tmp_path)))
+    first.get(URL, PARAMS)
+    assert second.get(URL, dict(PARAMS, forecast_days=3))['current']['temperature_2m'] == 31.0
+    assert len(upstream.calls) == 1
@@ -0,0 +1,196 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import predictor
+from services.forecast_ml.observation_store import ObservationStore
+from helpers import make_history, reference_feature_cols
+
+
+class FakeModel:
+    """Mô hình giả: tuyến tính + tanh, đếm số lần predict."""
+
+    def __init__(self, n_features):
+        self.weights = np.random.default_rng(5).normal(0, 0.01, (n_features, 6))
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        X = np.asarray(X, dtype=float)
+        scale = np.array([5, 20, 3, 5, 5, 40])
+        base = np.array([25, 70, 1, 5, 1010, 50])
+        return np.tanh(X @ self.weights) * scale + base
+
+
+@pytest.fixture
+def fake_predictor(monkeypatch):
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    frames = {}
+    for pid, hours in [(1, 168), (2, 168), (3, 10), (4, 48)]:
+        df = make_history(hours, seed=pid)
+        df['timestamp'] = [now - timedelta(hours=hours - 1 - i) for i in range(hours)]
+        frames[pid] = df
+
+    feature_cols = reference_feature_cols(frames[1])
+    fake_model = FakeModel(len(feature_cols))
+    monkeypatch.setitem(predictor._loaded, 'recursive',
+                        predictor.LoadedModel('recursive', fake_model, feature_cols, None, 'test'))
+    store = ObservationStore(hours=168, refresh_interval=float('inf'))
+    rows = pd.concat([df.assign(province_id=pid) for pid, df in frames.items()])
+    monkeypatch.setattr(store, '_query', lambda sql, params: rows)
+    monkeypatch.setattr(predictor, 'observation_store', store)
+    monkeypatch.setattr(predictor, 'OBSERVATION_SOURCE', 'memory')
+    monkeypatch.setattr(predictor, 'forecast_memo', predictor.ForecastMemo(maxsize=8, ttl=60))
+    monkeypatch.setattr(predictor, 'FORECAST_MODE', 'recursive')
+    return fake_model
+
+
+class FakeDirectModel(FakeModel):
+    """Mô hình direct giả: output (n, len(horizons) * 6), tăng nhiệt độ theo horizon."""
+
+    def __init__(self, n_features, horizons):
+        super().__init__(n_features)
+        self.horizons = np.asarray(horizons, dtype=float)
+
+    def predict(self, X):
+        base = super().predict(X)
+        out = np.repeat(base[:, None, :], len(self.horizons), axis=1)
+        out[:, :, 0] += self.horizons / 10
+        return out.reshape(len(base), -1)
+
+
+@pytest.fixture
+def fake_direct(fake_predictor, monkeypatch):
+    horizons = list(range(1, 25)) + list(range(36, 169, 12))
+    feature_cols = predictor.get_snapshot('recursive').feature_cols
+    direct = FakeDirectModel(len(feature_cols), horizons)
+    monkeypatch.setitem(predictor._loaded, 'direct',
+                        predictor.LoadedModel('direct', direct, feature_cols, horizons, 'test'))
+    return direct
+
+
+def without_times(result):
+    """Bỏ mốc thời gian tuyệt đối (datetime.now() khác nhau giữa 2 lần gọi)."""
+    hourly = [{k: v for k, v in h.items() if k != 'time'} for h in result['hourly_predictions']]
+    return {**result, 'hourly_predictions': hourly}
+
+
+def test_predict_storms_matches_predict_storm(fake_predictor):
+    batch = predictor.predict_storms([1, 2, 3, 4])
+
+    assert list(batch) == [1, 2, 3, 4]
+    assert batch[3] == {"error": "Không đủ dữ liệu lịch sử"}
+    for pid in [1, 2, 4]:
+        assert len(batch[pid]['hourly_predictions']) == 24
+        assert len(batch[pid]['daily_forecast']) == 7
+        assert without_times(batch[pid]) == without_times(predictor.predict_storm(pid))
+
+
+def test_predict_storms_one_call_per_step(fake_predictor):
+    predictor.predict_storms([1, 2, 4])
+    assert fake_predictor.calls == predictor.FORECAST_HOURS
+
+
+def test_direct_mode_single_call_and_interpolation(fake_direct):
+    batch = predictor.predict_storms([1, 2, 3, 4], mode='direct')
+
+    assert fake_direct.calls == 1
+    assert batch[3] == {"error": "Không đủ dữ liệu lịch sử"}
+    for pid in [1, 2, 4]:
+        result = batch[pid]
+        assert len(result['hourly_predictions']) == 24
+        assert len(result['daily_forecast']) == 7
+
+    # Giữa 2 horizon 24h và 36h nhiệt độ được nội suy tuyến tính
+    temps = predictor.predict_storm(1, mode='direct')
+    daily = temps['daily_forecast']
+    assert daily[0]['temperature_2m_max'] <= daily[6]['temperature_2m_max']
+
+
+def test_missing_direct_model_cached(fake_predictor, monkeypatch):
+    loads = []
+    monkeypatch.setattr(predictor, '_missing', set())
+    monkeypatch.setattr(predictor, 'MODEL_WATCH_INTERVAL', 0)
+    monkeypatch.setattr(predictor, 'load_direct_model', lambda: loads.append(1) or False)
+    monkeypatch.setattr(predictor.model_registry, 'get_active', lambda mode: None)
+
+    for _ in range(3):
+        assert predictor._resolve_mode('direct').mode == 'recursive'
+    assert len(loads) == 1
+
+    # Con trỏ registry đổi -> watcher gọi refresh_models -> dò lại ở request sau
+    predictor.refresh_models()
+    predictor._resolve_mode('direct')
+    assert len(loads) == 2
+
+
+def test_interpolation_matrix_hits_horizons():
+    horizons = [1, 2, 4, 8]
+    weights = predictor._interpolation_matrix(horizons, np.arange(1, 9))
+    values = np.array([10.0, 20.0, 40.0, 80.0])
+    np.testing.assert_allclose(weights @ values, [10, 20, 30, 40, 50, 60, 70, 80])
+
+
+def test_predict_storm_memoized(fake_predictor, monkeypatch):
+    first = predictor.predict_storm(1)
+    calls = fake_predictor.calls
+    second = predictor.predict_storm(1)
+
+    assert fake_predictor.calls == calls
+    assert second == first and second is not first
+    assert predictor.forecast_memo.stats()['hits'] == 1
+
+    # Quan sát mới -> key mới -> tính lại
+    monkeypatch.setattr(predictor, 'latest_observation_time', lambda pid: datetime(2100, 1, 1))
+    predictor.predict_storm(1)
+    assert fake_predictor.calls == 2 * calls
+
+    # Version mô hình mới -> tính lại
+    snapshot = predictor.get_snapshot('recursive')
+    monkeypatch.setitem(predictor._loaded, 'recursive', snapshot._replace(version='v2'))
+    predictor.predict_storm(1)
+    assert fake_predictor.calls == 3 * calls
+    assert predictor.forecast_memo.stats()['misses'] == 3
+
+
+def test_forecast_memo_lru_and_errors():
+    memo = predictor.ForecastMemo(maxsize=2, ttl=60)
+    for key in ['a', 'b', 'a', 'c']:
+        memo.get_or_compute(key, lambda: {'value': 1})
+    assert memo.stats()['size'] == 2
+    # 'b' ít dùng nhất bị loại
+    assert memo.get_or_compute('b', lambda: {'value': 2}) == {'value': 2}
+
+    memo.get_or_compute('e', lambda: {'error': 'x'})
+    assert memo.get_or_compute('e', lambda: {'value': 3}) == {'value': 3}
+
+
+def test_latest_observation_time_without_db(monkeypatch):
+    monkeypatch.setattr(predictor, 'OBSERVATION_SOURCE', 'db')
+    monkeypatch.setattr(predictor, 'connect_to_db', lambda: None)
+    assert predictor.latest_observation_time(1) is None
+
+
+def test_load_historical_data_fills_missing(monkeypatch):
+    rows = make_history(30)
+    rows.loc[5, ['apparent_temperature', 'cloud_cover']] = np.nan
+    rows.loc[6, 'wind_gusts_10m'] = np.nan
+
+    class Conn:
+        def close(self):
+            pass
+
+    monkeypatch.setattr(predictor, 'connect_to_db', Conn)
+    monkeypatch.setattr(predictor, 'load_table', lambda conn, table, **kwargs: rows.iloc[::-1].copy())
+
+    df = predictor.load_historical_data(1, hours=30)
+    assert df.loc[5, 'apparent_temperature'] == rows.loc[5, 'temperature_2m']
+    assert df.loc[5, 'cloud_cover'] == 50
+    assert df.loc[6, 'wind_gusts_10m'] == rows.loc[6, 'wind_speed_10m']
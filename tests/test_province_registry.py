@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from backend_api.models import province_registry
+from backend_api.models.province_registry import Province, ProvinceIndex, normalize_name
+
+ROWS = [
+    Province(4, 'Đà Nẵng', 16.0544, 108.2022),
+    Province(1, 'Hà Nội', 21.0285, 105.8542),
+    Province(2, 'Hồ Chí Minh', 10.8231, 106.6297),
+    Province(3, 'Thừa Thiên Huế', 16.4637, 107.5909),
+]
+
+
+def test_normalize_name():
+    assert normalize_name('Hà Nội') == 'ha noi'
+    assert normalize_name('  ĐÀ   NẴNG ') == 'da nang'
+    assert normalize_name('Thừa Thiên Huế') == normalize_name('thua thien hue')
+
+
+def test_lookup_and_serialized_body():
+    index = ProvinceIndex(ROWS)
+    assert index.get(2).name == 'Hồ Chí Minh'
+    assert index.find('Hà Nội') is ROWS[1]
+    assert index.find('ha noi') is ROWS[1]
+    assert index.find('DA NANG').province_id == 4
+    assert index.find('Sài Gòn') is None and index.find('') is None
+    # Thứ tự và khoá như /api/provinces cũ
+    body = json.loads(index.json_body)
+    assert [p['name'] for p in body] == [p.name for p in ROWS]
+    assert body[0] == {'province_id': 4, 'name': 'Đà Nẵng', 'latitude': 16.0544, 'longitude': 108.2022}
+    with pytest.raises(TypeError):
+        index.by_id[99] = ROWS[0]
+
+
+def test_refresh_only_on_change(monkeypatch):
+    monkeypatch.setattr(province_registry, '_index', None)
+    rows = list(ROWS)
+    assert province_registry.refresh(lambda: rows) is True
+    first = province_registry.get_index()
+    assert province_registry.refresh(lambda: list(rows)) is False
+    assert province_registry.get_index() is first
+
+    rows[1] = rows[1]._replace(latitude=21.03)
+    assert province_registry.refresh(lambda: rows) is True
+    assert province_registry.find_province('ha noi').latitude == 21.03
+    assert province_registry.get_index().etag != first.etag
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml.feature_spec import LAGS, LAG_COLS, ROLLING_WINDOWS, ROLLING_FEATURES
+from services.forecast_ml.rolling_engine import add_lag_rolling_features, group_positions
+
+
+def make_panel(seed=0):
+    """Nhiều tỉnh, độ dài khác nhau, có NaN và đoạn giá trị hằng."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for pid, n in [(1, 200), (2, 5), (3, 1), (4, 90)]:
+        df = pd.DataFrame({
+            'province_id': pid,
+            'timestamp': pd.date_range('2024-01-01', periods=n, freq='h'),
+        })
+        for col in LAG_COLS:
+            df[col] = rng.normal(20, 5, n)
+        df.loc[rng.random(n) < 0.1, 'temperature_2m'] = np.nan
+        df.loc[rng.random(n) < 0.1, 'wind_speed_10m'] = np.nan
+        df.loc[10:40, 'pressure_msl'] = 1012.3
+        df.loc[50:60, 'temperature_2m'] = 27.1
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def reference(df):
+    """Cách cũ: groupby().shift() và groupby().transform(rolling) cho từng cột."""
+    df = df.copy()
+    for lag in LAGS:
+        for col in LAG_COLS:
+            df[f'{col}_lag{lag}'] = df.groupby('province_id')[col].shift(lag)
+    for w in ROLLING_WINDOWS:
+        for prefix, col, agg in ROLLING_FEATURES:
+            df[f'{prefix}_{w}'] = df.groupby('province_id')[col].transform(
+                lambda x: getattr(x.rolling(w, min_periods=1), agg)()
+            )
+    return df
+
+
+def test_group_positions():
+    np.testing.assert_array_equal(group_positions([1, 1, 1, 2, 3, 3]), [0, 1, 2, 0, 0, 1])
+
+
+def test_matches_pandas_groupby_rolling():
+    df = make_panel()
+    expected = reference(df)
+    result = add_lag_rolling_features(df, LAGS, LAG_COLS, ROLLING_WINDOWS, ROLLING_FEATURES, dtype=np.float64)
+
+    assert list(result.columns) == list(expected.columns)
+    for col in expected.columns[len(df.columns):]:
+        np.testing.assert_array_equal(np.isnan(result[col]), np.isnan(expected[col]), err_msg=col)
+        if '_lag' in col or '_min_' in col or '_max_' in col:
+            np.testing.assert_array_equal(result[col], expected[col], err_msg=col)
+        elif '_std_' in col:
+            # Cả hai đều tính std từ tổng trượt, khác thứ tự cộng nên lệch ~1e-7 khi
+            # phương sai nhỏ so với trị số; cửa sổ hằng số engine kẹp về đúng 0
+            # (min == max) còn pandas có thể ra ~1e-7, nên cần atol=1e-6
+            np.testing.assert_allclose(result[col], expected[col], rtol=1e-9, atol=1e-6, err_msg=col)
+        else:
+            # sum/mean chỉ khác thứ tự cộng float64
+            np.testing.assert_allclose(result[col], expected[col], rtol=1e-12, atol=1e-12, err_msg=col)
+
+
+def test_std_exact_on_windows():
+    df = make_panel(seed=1)
+    result = add_lag_rolling_features(df, LAGS, LAG_COLS, ROLLING_WINDOWS, ROLLING_FEATURES, dtype=np.float64)
+    temps = df['temperature_2m'].to_numpy()
+    # Dòng 100 của tỉnh 1: cửa sổ 24 giờ [77, 100]
+    window = temps[77:101]
+    window = window[~np.isnan(window)]
+    assert np.isclose(result['temp_roll_std_24'].iloc[100], np.std(window, ddof=1), rtol=1e-12)
+    assert (result.loc[52:60, 'temp_roll_std_3'] == 0).all()
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from data_pipeline.data_cleaning import HOURLY_PARAMS, clean_api_data
+from data_pipeline.schema import apply_schema, db_values
+from services.forecast_ml.feature_store import compute_features
+from helpers import make_history
+
+
+def test_clean_api_data_applies_schema():
+    hourly = {'time': ['2024-06-01T00:00', '2024-06-01T01:00']}
+    hourly.update({p: [1.5, 2.25] for p in HOURLY_PARAMS})
+    hourly['weather_code'] = [3, 61]
+    df = clean_api_data({'hourly': hourly}, 7, 'Test')
+
+    assert isinstance(df['province_id'].dtype, pd.CategoricalDtype)
+    assert df['temperature_2m'].dtype == np.float32
+    assert df['weather_code'].dtype == np.int16
+    # Ghi DB: giá trị Python gọn, không lộ sai số float32
+    row = db_values(df)[1]
+    assert row[0] == 7 and type(row[0]) is int
+    assert row[2] == 2.25 and type(row[2]) is float
+
+
+def test_nullable_code_stays_float_and_db_nulls():
+    df = apply_schema(pd.DataFrame({'weather_code': [1.0, np.nan], 'temperature_2m': [25.3, np.nan]}))
+    assert df['weather_code'].dtype == np.float32
+    assert db_values(df)[1].tolist() == [None, None]
+    assert db_values(df)[0].tolist() == [1.0, 25.3]
+
+
+def test_features_are_float32_and_match_float64_path():
+    raw = pd.concat([make_history(100, seed=p).assign(province_id=p) for p in (1, 2)], ignore_index=True)
+    raw['weather_code'] = raw['weather_code'].round()
+    compact = compute_features(apply_schema(raw.copy()))
+    wide = compute_features(raw.copy(), dtype=np.float64)
+
+    assert compact['temperature_2m_lag24'].dtype == np.float32
+    assert compact['hour'].dtype == np.int8
+    cols = [c for c in compact.columns if c not in ('timestamp', 'province_id')]
+    np.testing.assert_allclose(compact[cols].to_numpy(float), wide[cols].to_numpy(float), rtol=1e-6, atol=1e-4)
+    assert compact.memory_usage(deep=True).sum() < 0.6 * wide.memory_usage(deep=True).sum()
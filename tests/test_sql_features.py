@@ -0,0 +1,51 @@
+import os
+import re
+import sys
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import model_training
+from services.forecast_ml.feature_spec import FEATURE_NAMES, MIN_HISTORY, ROLLING_WINDOWS
+from services.forecast_ml.feature_store import compute_features
+from services.forecast_ml.sql_features import feature_query
+from helpers import FakeConn, make_history
+
+
+def output_columns(sql):
+    """Tên cột của SELECT ngoài cùng (theo thứ tự)."""
+    body = sql[sql.rindex('SELECT') + len('SELECT'):sql.rindex('FROM windowed')]
+    return [re.findall(r'"([^"]+)"\s*$', item.strip())[0] for item in body.split(',\n')]
+
+
+def test_query_columns_follow_feature_spec():
+    sql = feature_query(model_training.SQL_FEATURE_COLUMNS, limit=1000)
+    assert output_columns(sql) == ['province_id', 'timestamp'] + model_training.SQL_FEATURE_COLUMNS + FEATURE_NAMES
+    assert 'LAG("temperature_2m", 24) OVER w AS "temperature_2m_lag24"' in sql
+    assert 'STDDEV_SAMP("temperature_2m") OVER w6 AS "temp_roll_std_6"' in sql
+    for w in ROLLING_WINDOWS:
+        assert f'w{w} AS (w ROWS BETWEEN {w - 1} PRECEDING AND CURRENT ROW)' in sql
+    # Điền giá trị thiếu như compute_features, lọc dòng chưa đủ lịch sử
+    assert 'COALESCE("cloud_cover"::double precision, 50)' in sql
+    assert f'_row >= {MIN_HISTORY}' in sql
+    assert sql.count('%s') == 1
+
+
+def test_load_data_for_training_sql_features():
+    raw = pd.concat([make_history(80, seed=p).assign(province_id=p) for p in (1, 2)], ignore_index=True)
+    expected = compute_features(raw.copy())
+    expected = expected[expected.groupby('province_id').cumcount() >= MIN_HISTORY - 1]
+    # "Server" trả về đúng các cột của feature_query
+    conn = FakeConn(expected[['province_id', 'timestamp'] + model_training.SQL_FEATURE_COLUMNS + FEATURE_NAMES])
+
+    df = model_training.load_data_for_training(conn, province_id=2, limit=None, features=True)
+    assert 'WINDOW w AS (PARTITION BY province_id' in conn.statements[0]
+    assert 'province_id = 2' in conn.statements[0]
+    assert df['hour'].dtype == 'int8' and df['temp_roll_mean_3'].dtype == 'float32'
+
+    X, y, feature_cols = model_training.make_training_set(df)
+    X_ref, y_ref, ref_cols = model_training.feature_engineering(raw.copy())
+    assert feature_cols == ref_cols
+    assert len(X) == len(X_ref)
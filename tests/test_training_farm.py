@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from services.forecast_ml import model_training, training_farm
+from services.forecast_ml.feature_store import compute_features
+from helpers import make_history
+
+
+def test_plan_threads_bounded_by_cores():
+    for cores in (1, 2, 8, 16):
+        for workers in (None, 1, 3, 64):
+            w, t = training_farm.plan_threads(workers, n_jobs=64, cores=cores)
+            assert w >= 1 and t >= 1
+            assert w * t <= cores
+    assert training_farm.plan_threads(None, n_jobs=2, cores=8) == (2, 4)
+
+
+def test_shared_data_and_global_rows(tmp_path, monkeypatch):
+    frames = {pid: make_history(1200, seed=pid).assign(province_id=pid) for pid in (1, 2)}
+    monkeypatch.setattr(training_farm, 'load_training_frame',
+                        lambda conn, province_id, **kw: (compute_features(frames[province_id].copy()), True))
+
+    meta = training_farm.prepare_shared_data(None, [1, 2], str(tmp_path))
+    assert set(meta['provinces']) == {1, 2}
+    X1 = np.load(tmp_path / 'X_1.npy', mmap_mode='r')
+    assert isinstance(X1, np.memmap) and X1.dtype == np.float32
+    assert X1.shape == (meta['provinces'][1], len(meta['feature_cols']))
+
+    # Mô hình chung: chỉ giữ các dòng mới nhất của mọi tỉnh
+    X, y = training_farm._global_rows(str(tmp_path), meta['provinces'], limit=1000)
+    ts = np.concatenate([np.load(tmp_path / f'ts_{pid}.npy') for pid in (1, 2)])
+    cutoff = np.sort(ts)[-1000]
+    assert len(X) == len(y) == (ts >= cutoff).sum() >= 1000
+    # Sắp theo thời gian: 20% cuối (tập test) gồm giờ mới nhất của cả hai tỉnh
+    tail = {row.tobytes() for row in y[int(len(y) * 0.8):]}
+    for pid in (1, 2):
+        assert tail & {row.tobytes() for row in np.load(tmp_path / f'y_{pid}.npy')}
+
+
+def test_train_job_saves_model(tmp_path, monkeypatch):
+    df = compute_features(make_history(400).assign(province_id=1))
+    X = df[['temperature_2m_lag1', 'temperature_2m_lag2', 'hour']].dropna()
+    np.save(tmp_path / 'X_1.npy', X.to_numpy(np.float32))
+    np.save(tmp_path / 'y_1.npy', np.random.default_rng(0).normal(size=(len(X), 6)).astype(np.float32))
+    monkeypatch.setitem(model_training.XGB_PARAMS, 'n_estimators', 5)
+
+    result = training_farm.train_job({
+        'name': 'province_1', 'province_id': 1, 'data_dir': str(tmp_path),
+        'feature_cols': list(X.columns), 'mode': 'recursive', 'horizons': None,
+        'model_format': 'native', 'save_path': str(tmp_path / 'model.pkl'),
+        'publish': False, 'nthread': 1,
+    })
+    assert 'error' not in result, result.get('error')
+    assert result['n_train'] == int(len(X) * 0.8)
+    assert set(result['metrics']) == set(training_farm.TARGET_COLS)
+    assert os.path.isdir(tmp_path / 'model')